@@ -0,0 +1,312 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import glob
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from builtins import object
+from contextlib import contextmanager
+
+from typing import Any, Callable, Iterator, List, Optional, Text, Tuple
+
+from rasa_nlu import metrics, utils
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # no locking between processes (e.g. on windows)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# maximum size of all cached model archives in bytes
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+ARCHIVE_EXTENSION = ".tar.gz"
+
+BLOB_EXTENSION = ".blob"
+
+CHECKSUM_EXTENSION = ".md5"
+
+LOCK_EXTENSION = ".lock"
+
+
+class ChecksumMismatch(Exception):
+    """Raised if a downloaded archive doesn't match its expected checksum."""
+
+
+def file_digest(f, algorithm="md5", chunk_size=1024 * 1024):
+    # type: (Any, Text, int) -> Text
+    """Returns the hash (as hex string) of the content of a file object."""
+
+    digest = hashlib.new(algorithm)
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def md5_checksum(f, chunk_size=1024 * 1024):
+    # type: (Any, int) -> Text
+    """Returns the md5 checksum (as hex string) of a file object."""
+
+    return file_digest(f, "md5", chunk_size)
+
+
+class ChecksumWriter(object):
+    """Writes to a file while computing the checksum of the content."""
+
+    def __init__(self, f, algorithm="md5"):
+        self._file = f
+        self._digest = hashlib.new(algorithm)
+
+    def write(self, data):
+        self._digest.update(data)
+        self._file.write(data)
+
+    def hexdigest(self):
+        # type: () -> Text
+        return self._digest.hexdigest()
+
+
+class ArtifactCache(object):
+    """Local directory of downloaded model archives.
+
+    Archives are stored under their project, model name and checksum, so
+    a retrained model never hits a stale entry. The directory can be
+    shared by all server processes of a host: a lock file per archive
+    makes sure every archive is only downloaded once. Archives are
+    verified against their checksum before they are used and the least
+    recently used ones are removed once the cache exceeds `max_bytes`.
+
+    Files of models stored as content addressed blobs are cached the same
+    way, under their sha256 hash."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        # type: (Text, int) -> None
+
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        utils.create_dir(self.cache_dir)
+
+    def _path(self, project, model_name, checksum):
+        # type: (Text, Text, Optional[Text]) -> Text
+
+        name = "{}___{}.{}{}".format(project, model_name,
+                                     checksum or "unknown",
+                                     ARCHIVE_EXTENSION)
+        return os.path.join(self.cache_dir, name)
+
+    def _blob_path(self, digest):
+        # type: (Text) -> Text
+        return os.path.join(self.cache_dir, digest + BLOB_EXTENSION)
+
+    @contextmanager
+    def _lock(self, path, blocking=True):
+        # type: (Text, bool) -> Iterator[bool]
+        """Locks an archive, across all processes sharing the cache.
+
+        Yields whether the lock was acquired: without `blocking`, it isn't
+        if someone else holds it. Evicting an archive removes its lock
+        file, a lock taken on a removed file is taken again."""
+
+        if fcntl is None:
+            yield True
+            return
+
+        lock_path = path + LOCK_EXTENSION
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        while True:
+            with io.open(lock_path, "ab") as lock_file:
+                try:
+                    fcntl.flock(lock_file.fileno(), flags)
+                except (IOError, OSError):
+                    if blocking:
+                        raise
+                    yield False
+                    return
+                try:
+                    if self._is_current(lock_file, lock_path):
+                        yield True
+                        return
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _is_current(lock_file, lock_path):
+        # type: (Any, Text) -> bool
+        """Checks if a lock file wasn't removed while waiting for it."""
+
+        try:
+            return (os.fstat(lock_file.fileno()).st_ino ==
+                    os.stat(lock_path).st_ino)
+        except OSError:
+            return False
+
+    def open(self,
+             project,  # type: Text
+             model_name,  # type: Text
+             checksum,  # type: Optional[Text]
+             download  # type: Callable[[Any], None]
+             ):
+        # type: (...) -> Any
+        """Returns the cached archive of a model, opened for reading.
+
+        Missing or corrupted archives are downloaded by calling `download`
+        with a file object to write the archive to. `checksum` is the
+        expected md5 checksum of the archive, if it is known."""
+
+        path = self._path(project, model_name, checksum)
+        return self._open(path, checksum, download, "md5")
+
+    def open_blob(self, digest, download):
+        # type: (Text, Callable[[Any], None]) -> Any
+        """Returns a cached blob, opened for reading.
+
+        Missing or corrupted blobs are downloaded by calling `download`
+        with a file object to write to. `digest` is the sha256 hash of
+        the blob."""
+
+        return self._open(self._blob_path(digest), digest, download,
+                          "sha256")
+
+    def _open(self, path, checksum, download, algorithm):
+        # type: (Text, Optional[Text], Callable[[Any], None], Text) -> Any
+
+        with self._lock(path):
+            cached = self._open_verified(path, checksum, algorithm)
+            if cached is not None:
+                metrics.registry.inc(metrics.MODEL_CACHE_REQUESTS,
+                                     labels={"result": "hit"})
+                os.utime(path, None)
+                return cached
+
+            metrics.registry.inc(metrics.MODEL_CACHE_REQUESTS,
+                                 labels={"result": "miss"})
+            self._download(path, checksum, download, algorithm)
+            # opened before evicting, so it can't be removed under our feet
+            f = io.open(path, "rb")
+
+        self.evict(keep=path)
+        return f
+
+    def _open_verified(self, path, checksum, algorithm):
+        # type: (Text, Optional[Text], Text) -> Optional[Any]
+        """Opens a cached archive if it is complete and not corrupted."""
+
+        try:
+            f = io.open(path, "rb")
+        except (IOError, OSError):
+            return None
+
+        try:
+            expected = checksum or self._stored_checksum(path)
+            if (expected is not None and
+                    file_digest(f, algorithm) == expected):
+                f.seek(0)
+                return f
+        except (IOError, OSError) as e:
+            logger.debug("Failed to verify '{}'. {}".format(path, e))
+
+        f.close()
+        logger.warning("Cached model archive '{}' is corrupted, "
+                       "downloading it again.".format(path))
+        self._remove(path)
+        return None
+
+    @staticmethod
+    def _stored_checksum(path):
+        # type: (Text) -> Optional[Text]
+
+        try:
+            with io.open(path + CHECKSUM_EXTENSION, "r") as f:
+                return f.read().strip()
+        except (IOError, OSError):
+            return None
+
+    def _download(self, path, checksum, download, algorithm):
+        # type: (Text, Optional[Text], Callable[[Any], None], Text) -> None
+
+        fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".part",
+                                         dir=self.cache_dir)
+        try:
+            with io.open(fd, "wb") as f:
+                writer = ChecksumWriter(f, algorithm)
+                download(writer)
+            actual = writer.hexdigest()
+            if checksum is not None and actual != checksum:
+                raise ChecksumMismatch(
+                        "Downloaded file '{}' has checksum {}, "
+                        "expected {}.".format(os.path.basename(path),
+                                              actual, checksum))
+            with io.open(path + CHECKSUM_EXTENSION, "w") as f:
+                f.write(actual)
+            os.rename(temp_path, path)
+        except Exception:
+            self._remove_quietly(temp_path)
+            raise
+
+    @staticmethod
+    def _remove_quietly(path):
+        # type: (Text) -> None
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _remove(self, path):
+        # type: (Text) -> None
+
+        # lock files are only removed by `evict`, while holding the lock
+        for p in (path, path + CHECKSUM_EXTENSION):
+            self._remove_quietly(p)
+
+    def _archives(self):
+        # type: () -> List[Tuple[float, int, Text]]
+        """Lists the cached archives and blobs as (last use, size, path)."""
+
+        archives = []
+        paths = []
+        for extension in (ARCHIVE_EXTENSION, BLOB_EXTENSION):
+            paths.extend(glob.glob(os.path.join(self.cache_dir,
+                                                "*" + extension)))
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            archives.append((stat.st_mtime, stat.st_size, path))
+        return sorted(archives)
+
+    def size(self):
+        # type: () -> int
+        """Returns the size of all cached archives in bytes."""
+
+        return sum(size for _, size, _ in self._archives())
+
+    def evict(self, keep=None):
+        # type: (Optional[Text]) -> None
+        """Removes the least recently used archives until the cache is
+        within `max_bytes`. Archives that are in use stay readable,
+        archives that are being downloaded or verified are skipped."""
+
+        archives = self._archives()
+        used = sum(size for _, size, _ in archives)
+        for _, size, path in archives:
+            if used <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            with self._lock(path, blocking=False) as locked:
+                if not locked:
+                    continue
+                logger.debug("Removing cached model archive '{}'."
+                             "".format(path))
+                self._remove(path)
+                self._remove_quietly(path + LOCK_EXTENSION)
+            used -= size
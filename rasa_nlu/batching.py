@@ -0,0 +1,124 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import logging
+from builtins import object
+from threading import Event, Lock
+
+from typing import Any, Callable, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch(object):
+    """Items queued for the same key and their results."""
+
+    def __init__(self):
+        self.items = []  # type: List[Any]
+        self.results = []  # type: List[Any]
+        self.errors = []  # type: List[Optional[Exception]]
+        self.closed = Event()
+        self.done = Event()
+
+    def add(self, item):
+        # type: (Any) -> int
+        self.items.append(item)
+        return len(self.items) - 1
+
+    def result(self, idx):
+        # type: (int) -> Any
+        if self.errors[idx] is not None:
+            raise self.errors[idx]
+        return self.results[idx]
+
+
+class MicroBatcher(object):
+    """Collects concurrent requests for the same key and processes
+    them as one batch.
+
+    The first thread submitting an item for a key waits until either
+    `max_batch_size` items have been queued for that key or `max_wait`
+    milliseconds passed. It then processes all queued items with a single
+    call to `process_batch(key, items)`, which has to return one result
+    per item. Every thread receives the result of its own item.
+
+    If the batch fails, each item gets processed on its own, so a single
+    bad item does not fail the requests of other threads."""
+
+    def __init__(self,
+                 process_batch,  # type: Callable[[Hashable, List], List]
+                 max_batch_size=32,  # type: int
+                 max_wait=5  # type: float
+                 ):
+        # type: (...) -> None
+
+        self._process_batch = process_batch
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait, 0) / 1000.0
+        self._pending = {}
+        self._lock = Lock()
+
+    def process(self, key, item):
+        # type: (Hashable, Any) -> Any
+        """Queue an item, wait for its batch to be processed and
+        return the item's result."""
+
+        with self._lock:
+            batch = self._pending.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = _Batch()
+                self._pending[key] = batch
+
+            idx = batch.add(item)
+
+            if len(batch.items) >= self.max_batch_size:
+                # no more items can be added, the leader can start right away
+                del self._pending[key]
+                batch.closed.set()
+
+        if is_leader:
+            batch.closed.wait(self.max_wait)
+            with self._lock:
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+            self._run(key, batch)
+        else:
+            batch.done.wait()
+
+        return batch.result(idx)
+
+    def _run(self, key, batch):
+        # type: (Hashable, _Batch) -> None
+
+        try:
+            try:
+                results = self._process_batch(key, batch.items)
+                batch.errors = [None] * len(batch.items)
+                batch.results = results
+            except Exception as e:
+                if len(batch.items) == 1:
+                    batch.errors = [e]
+                    batch.results = [None]
+                else:
+                    logger.warning("Failed to process batch of {} items. "
+                                   "Processing them one by one. "
+                                   "Error: {}".format(len(batch.items), e))
+                    self._run_one_by_one(key, batch)
+        finally:
+            batch.done.set()
+
+    def _run_one_by_one(self, key, batch):
+        # type: (Hashable, _Batch) -> None
+
+        batch.results = []
+        batch.errors = []
+        for item in batch.items:
+            try:
+                batch.results.append(self._process_batch(key, [item])[0])
+                batch.errors.append(None)
+            except Exception as e:
+                batch.results.append(None)
+                batch.errors.append(e)
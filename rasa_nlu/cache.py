@@ -0,0 +1,183 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import copy
+import logging
+import time
+from builtins import object
+from collections import OrderedDict
+from threading import Lock
+
+from typing import Any, Dict, Hashable, Optional, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ParseCache(object):
+    """LRU cache for parse results.
+
+    Entries are keyed by project, the name of the model that created the
+    response, the text and - if the model's output depends on the time,
+    e.g. when extracting dates with duckling - the time bucket of the
+    request. Hence, responses of time dependent models are only reused
+    for requests within the same `time_bucket` (in seconds).
+
+    Entries expire after `ttl` seconds (if set) and the least recently used
+    entries get evicted if there are more than `max_size` entries."""
+
+    def __init__(self, max_size, ttl=None, time_bucket=60):
+        # type: (int, Optional[float], float) -> None
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.time_bucket = time_bucket
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _time_bucket_for(self, time_dependent, request_time):
+        # type: (bool, Any) -> Optional[Hashable]
+
+        if not time_dependent:
+            return None
+        elif request_time is None:
+            # components use the current time if no time is passed
+            return int(time.time() // self.time_bucket)
+
+        try:
+            # request times are unix timestamps in milliseconds
+            return int(float(request_time) / 1000 // self.time_bucket)
+        except (TypeError, ValueError):
+            # only reuse the response for exactly the same time
+            return "{}".format(request_time)
+
+    def _key(self, project, model, text, request_time, time_dependent):
+        # type: (Text, Text, Text, Any, bool) -> Tuple
+        return (project, model, text,
+                self._time_bucket_for(time_dependent, request_time))
+
+    def get(self, project, model, text, request_time=None,
+            time_dependent=False):
+        # type: (Text, Text, Text, Any, bool) -> Optional[Dict[Text, Any]]
+        """Returns a copy of the cached response or `None`."""
+
+        key = self._key(project, model, text, request_time, time_dependent)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry):
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            # move the entry to the end, it is the most recently used now
+            del self._entries[key]
+            self._entries[key] = entry
+
+        return copy.deepcopy(entry[1])
+
+    def put(self, project, model, text, response, request_time=None,
+            time_dependent=False):
+        # type: (Text, Text, Text, Dict[Text, Any], Any, bool) -> None
+
+        key = self._key(project, model, text, request_time, time_dependent)
+        entry = (time.time(), copy.deepcopy(response))
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, project, model=None):
+        # type: (Text, Optional[Text]) -> None
+        """Removes all entries of a model (or of all models of a project)."""
+
+        with self._lock:
+            keys = [k for k in self._entries
+                    if k[0] == project and (model is None or k[1] == model)]
+            for k in keys:
+                del self._entries[k]
+
+        if keys:
+            logger.debug("Removed {} cached parse results of project '{}' "
+                         "(model: {}).".format(len(keys), project, model))
+
+    def _is_expired(self, entry):
+        # type: (Tuple[float, Any]) -> bool
+        return self.ttl is not None and time.time() - entry[0] > self.ttl
+
+    def as_dict(self):
+        # type: () -> Dict[Text, Any]
+
+        return {"size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "time_bucket": self.time_bucket,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions}
+
+
+class NegativeCache(object):
+    """Remembers names that could not be found for `ttl` seconds.
+
+    Looking up unknown project or model names requires listing the
+    project directory and the remote storage, which is too expensive to
+    repeat for every request using the same bogus name. At most
+    `max_size` names are remembered, the oldest ones are dropped first."""
+
+    def __init__(self, ttl, max_size=10000):
+        # type: (float, int) -> None
+
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __contains__(self, key):
+        # type: (Hashable) -> bool
+
+        with self._lock:
+            added = self._entries.get(key)
+            if added is None:
+                return False
+            elif time.time() - added > self.ttl:
+                del self._entries[key]
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, key):
+        # type: (Hashable) -> None
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = time.time()
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        # type: (Hashable) -> None
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def as_dict(self):
+        # type: () -> Dict[Text, Any]
+
+        return {"size": len(self._entries),
+                "ttl": self.ttl,
+                "hits": self.hits}
@@ -0,0 +1,163 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import logging
+import sys
+import time
+from builtins import object
+from threading import Lock, Thread
+
+import six
+from typing import Any, Callable, Dict, Optional, Text
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreakerError(Exception):
+    """Raised if a call was rejected or didn't finish in time."""
+
+
+class CircuitOpenError(CircuitBreakerError):
+    """Raised if a call is rejected because the breaker is open."""
+
+
+class CallTimeoutError(CircuitBreakerError):
+    """Raised if a call didn't finish within its timeout."""
+
+
+def call_with_timeout(func, timeout):
+    # type: (Callable[[], Any], float) -> Any
+    """Runs `func` on a separate thread and waits at most `timeout` seconds.
+
+    A call that times out keeps running in the background, its result is
+    discarded."""
+
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = func()
+        except BaseException:
+            outcome["error"] = sys.exc_info()
+
+    thread = Thread(target=run, name="timed-call")
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+
+    if thread.is_alive():
+        raise CallTimeoutError("Call didn't finish within {} seconds."
+                               "".format(timeout))
+    if "error" in outcome:
+        six.reraise(*outcome["error"])
+    return outcome["result"]
+
+
+class CircuitBreaker(object):
+    """Stops calling a failing dependency for a while.
+
+    After `failure_threshold` consecutive failures (errors or timeouts)
+    the breaker opens and rejects all calls right away. After
+    `reset_timeout` seconds a single trial call is let through, which
+    closes the breaker again if it succeeds."""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        # type: (Text, int, float) -> None
+
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = None  # type: Optional[float]
+        self.rejected = 0
+        self.timeouts = 0
+        self._trial_running = False
+        self._lock = Lock()
+
+    def call(self, func, timeout=None):
+        # type: (Callable[[], Any], Optional[float]) -> Any
+        """Calls `func` unless the breaker is open.
+
+        Raises a `CircuitOpenError` if the call is rejected and a
+        `CallTimeoutError` if it takes longer than `timeout` seconds."""
+
+        self._before_call()
+        try:
+            if timeout:
+                result = call_with_timeout(func, timeout)
+            else:
+                result = func()
+        except CallTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            self._on_failure()
+            raise
+        except Exception:
+            self._on_failure()
+            raise
+        self._on_success()
+        return result
+
+    def _before_call(self):
+        # type: () -> None
+
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return
+
+            if (self.state == STATE_OPEN and
+                    time.time() - self.opened_at >= self.reset_timeout):
+                self.state = STATE_HALF_OPEN
+
+            if self.state == STATE_HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+
+            self.rejected += 1
+        raise CircuitOpenError("{} is unavailable, calls are rejected for "
+                               "{} seconds after {} failures."
+                               "".format(self.name, self.reset_timeout,
+                                         self.failure_threshold))
+
+    def _on_success(self):
+        # type: () -> None
+
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                logger.info("{} is available again.".format(self.name))
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def _on_failure(self):
+        # type: () -> None
+
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if (self.state == STATE_HALF_OPEN or
+                    self.failures >= self.failure_threshold):
+                if self.state != STATE_OPEN:
+                    logger.warning("{} failed {} times, rejecting calls "
+                                   "for {} seconds."
+                                   "".format(self.name, self.failures,
+                                             self.reset_timeout))
+                self.state = STATE_OPEN
+                self.opened_at = time.time()
+
+    def as_dict(self):
+        # type: () -> Dict[Text, Any]
+        with self._lock:
+            return {"state": self.state,
+                    "failures": self.failures,
+                    "opened_at": self.opened_at,
+                    "rejected": self.rejected,
+                    "timeouts": self.timeouts}
@@ -529,16 +529,23 @@ class EmbeddingIntentClassifier(Component):
                            loss, is_training, train_op)
 
     # process helpers
-    def _calculate_message_sim(self, X, all_Y):
-        """Load tf graph and calculate message similarities"""
+    def _calculate_message_sims(self, X, all_Y):
+        """Load tf graph and calculate the similarities of a batch
+        of messages with a single session run"""
 
-        message_sim = self.session.run(self.sim_op,
-                                       feed_dict={self.a_in: X,
-                                                  self.b_in: all_Y})
-        message_sim = message_sim.flatten()  # sim is a matrix
+        message_sims = self.session.run(self.sim_op,
+                                        feed_dict={self.a_in: X,
+                                                   self.b_in: all_Y})
+
+        # sim is a matrix with one row per message
+        return [self._sort_message_sim(message_sim)
+                for message_sim in message_sims.reshape(X.shape[0], -1)]
+
+    def _sort_message_sim(self, message_sim):
+        """Sort the similarities of a single message"""
 
         intent_ids = message_sim.argsort()[::-1]
-        message_sim[::-1].sort()
+        message_sim = message_sim[intent_ids]
 
         if self.similarity_type == 'cosine':
             # clip negative values to zero
@@ -555,27 +562,44 @@ class EmbeddingIntentClassifier(Component):
         # type: (Message, **Any) -> None
         """Return the most likely intent and its similarity to the input."""
 
-        intent = {"name": None, "confidence": 0.0}
-        intent_ranking = []
+        self.process_batch([message], **kwargs)
+
+    def process_batch(self, messages, **kwargs):
+        # type: (List[Message], **Any) -> None
+        """Return the most likely intents and their similarities for a batch
+        of messages using a single run of the tf session."""
+
+        if not messages:
+            return
 
         if self.session is None:
             logger.error("There is no trained tf.session: "
                          "component is either not trained or "
                          "didn't receive enough training data")
+            for message in messages:
+                message.set("intent", {"name": None, "confidence": 0.0},
+                            add_to_output=True)
+                message.set("intent_ranking", [], add_to_output=True)
+            return
 
-        else:
-            # get features (bag of words) for a message
-            X = message.get("text_features").reshape(1, -1)
+        # get features (bag of words) for the messages
+        X = np.stack([message.get("text_features").reshape(-1)
+                      for message in messages])
+
+        # stack encoded_all_intents on top of each other
+        # to create candidates for test examples
+        all_Y = self._create_all_Y(X.shape[0])
 
-            # stack encoded_all_intents on top of each other
-            # to create candidates for test examples
-            all_Y = self._create_all_Y(X.shape[0])
+        # load tf graph and session
+        message_sims = self._calculate_message_sims(X, all_Y)
 
-            # load tf graph and session
-            intent_ids, message_sim = self._calculate_message_sim(X, all_Y)
+        for message, x, (intent_ids, message_sim) in zip(messages, X,
+                                                         message_sims):
+            intent = {"name": None, "confidence": 0.0}
+            intent_ranking = []
 
-            # if X contains all zeros do not predict some label
-            if X.any() and intent_ids.size > 0:
+            # if x contains all zeros do not predict some label
+            if x.any() and intent_ids.size > 0:
                 intent = {"name": self.inv_intent_dict[intent_ids[0]],
                           "confidence": message_sim[0]}
 
@@ -585,8 +609,8 @@ class EmbeddingIntentClassifier(Component):
                                    "confidence": score}
                                   for intent_idx, score in ranking]
 
-        message.set("intent", intent, add_to_output=True)
-        message.set("intent_ranking", intent_ranking, add_to_output=True)
+            message.set("intent", intent, add_to_output=True)
+            message.set("intent_ranking", intent_ranking, add_to_output=True)
 
     def persist(self, model_dir):
         # type: (Text) -> Dict[Text, Any]
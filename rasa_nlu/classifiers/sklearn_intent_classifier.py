@@ -161,24 +161,39 @@ class SklearnIntentClassifier(Component):
         # type: (Message, **Any) -> None
         """Return the most likely intent and its probability for a message."""
 
+        self.process_batch([message], **kwargs)
+
+    def process_batch(self, messages, **kwargs):
+        # type: (List[Message], **Any) -> None
+        """Return the most likely intents and their probabilities for
+        a batch of messages using a single call to the classifier."""
+
+        if not messages:
+            return
+
         if not self.clf:
             # component is either not trained or didn't
             # receive enough training data
-            intent = None
-            intent_ranking = []
-        else:
-            X = message.get("text_features").reshape(1, -1)
-            intent_ids, probabilities = self.predict(X)
-            intents = self.transform_labels_num2str(intent_ids)
-            # `predict` returns a matrix as it is supposed
-            # to work for multiple examples as well, hence we need to flatten
-            intents, probabilities = intents.flatten(), probabilities.flatten()
-
-            if intents.size > 0 and probabilities.size > 0:
-                ranking = list(zip(list(intents),
-                                   list(probabilities)))[:INTENT_RANKING_LENGTH]
-
-                intent = {"name": intents[0], "confidence": probabilities[0]}
+            for message in messages:
+                message.set("intent", None, add_to_output=True)
+                message.set("intent_ranking", [], add_to_output=True)
+            return
+
+        X = np.stack([message.get("text_features").reshape(-1)
+                      for message in messages])
+        intent_ids, probabilities = self.predict(X)
+        intents = self.transform_labels_num2str(
+                intent_ids.flatten()).reshape(intent_ids.shape)
+
+        for message, message_intents, message_probabilities in zip(
+                messages, intents, probabilities):
+            if message_intents.size > 0 and message_probabilities.size > 0:
+                ranking = list(zip(list(message_intents),
+                                   list(message_probabilities)))
+                ranking = ranking[:INTENT_RANKING_LENGTH]
+
+                intent = {"name": message_intents[0],
+                          "confidence": message_probabilities[0]}
 
                 intent_ranking = [{"name": intent_name, "confidence": score}
                                   for intent_name, score in ranking]
@@ -186,8 +201,8 @@ class SklearnIntentClassifier(Component):
                 intent = {"name": None, "confidence": 0.0}
                 intent_ranking = []
 
-        message.set("intent", intent, add_to_output=True)
-        message.set("intent_ranking", intent_ranking, add_to_output=True)
+            message.set("intent", intent, add_to_output=True)
+            message.set("intent_ranking", intent_ranking, add_to_output=True)
 
     def predict_prob(self, X):
         # type: (np.ndarray) -> np.ndarray
@@ -214,7 +229,10 @@ class SklearnIntentClassifier(Component):
         # sort the probabilities retrieving the indices of
         # the elements in sorted order
         sorted_indices = np.fliplr(np.argsort(pred_result, axis=1))
-        return sorted_indices, pred_result[:, sorted_indices]
+        # pick the sorted probabilities row by row, so this works
+        # for a batch of examples as well
+        rows = np.arange(pred_result.shape[0])[:, np.newaxis]
+        return sorted_indices, pred_result[rows, sorted_indices]
 
     @classmethod
     def load(cls,
@@ -7,6 +7,7 @@ import logging
 
 import typing
 from builtins import object
+from threading import Lock
 from typing import Any
 from typing import Dict
 from typing import List
@@ -177,6 +178,12 @@ class Component(object):
     # This is an important feature for backwards compatibility of components.
     language_list = None
 
+    # Defines whether the output of the component depends on the time of
+    # the message (or on the current time, if the message has none), e.g.
+    # when resolving relative dates like "tomorrow". Parse results of
+    # pipelines containing such a component are only cached per time bucket.
+    time_dependent = False
+
     def __init__(self, component_config=None):
         if not component_config:
             component_config = {}
@@ -286,6 +293,19 @@ class Component(object):
         of components previous to this one."""
         pass
 
+    def process_batch(self, messages, **kwargs):
+        # type: (List[Message], **Any) -> None
+        """Process a batch of incoming messages.
+
+        The default implementation calls `process` for every message.
+        Components that can vectorize their work (e.g. run a single
+        sklearn or tensorflow call for all messages) should override
+        this method. The messages of the batch need to be processed
+        exactly as if `process` had been called for each of them."""
+
+        for message in messages:
+            self.process(message, **kwargs)
+
     def persist(self, model_dir):
         # type: (Text) -> Optional[Dict[Text, Any]]
         """Persist this component to disk for future loading."""
@@ -349,6 +369,16 @@ class Component(object):
         return language in cls.language_list
 
 
+class _NoLock(object):
+    """Stands in for a lock if no locking is necessary."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
 class ComponentBuilder(object):
     """Creates trainers and interpreters based on configurations.
 
@@ -359,6 +389,20 @@ class ComponentBuilder(object):
         # Reuse nlp and featurizers where possible to save memory,
         # every component that implements a cache-key will be cached
         self.component_cache = {}
+        # models are loaded in parallel, cached components with the same
+        # key are only loaded once
+        self._load_locks = {}  # type: Dict[Text, Lock]
+        self._load_locks_lock = Lock()
+
+    def _load_lock(self, cache_key):
+        # type: (Optional[Text]) -> Any
+        """Returns the lock guarding the loading of a cached component."""
+
+        if cache_key is None or not self.use_cache:
+            return _NoLock()
+
+        with self._load_locks_lock:
+            return self._load_locks.setdefault(cache_key, Lock())
 
     def __get_cached_component(self, component_name, model_metadata):
         # type: (Text, Metadata) -> Tuple[Optional[Component], Optional[Text]]
@@ -398,15 +442,18 @@ class ComponentBuilder(object):
         from rasa_nlu.model import Metadata
 
         try:
-            cached_component, cache_key = self.__get_cached_component(
-                    component_name, model_metadata)
-            component = registry.load_component_by_name(
-                    component_name, model_dir, model_metadata,
-                    cached_component, **context)
-            if not cached_component:
-                # If the component wasn't in the cache,
-                # let us add it if possible
-                self.__add_to_cache(component, cache_key)
+            _, cache_key = self.__get_cached_component(component_name,
+                                                       model_metadata)
+            with self._load_lock(cache_key):
+                cached_component, cache_key = self.__get_cached_component(
+                        component_name, model_metadata)
+                component = registry.load_component_by_name(
+                        component_name, model_dir, model_metadata,
+                        cached_component, **context)
+                if not cached_component:
+                    # If the component wasn't in the cache,
+                    # let us add it if possible
+                    self.__add_to_cache(component, cache_key)
             return component
         except MissingArgumentError as e:  # pragma: no cover
             raise Exception("Failed to load component '{}'. "
@@ -4,29 +4,39 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import glob
-import io
 import logging
 import tempfile
+import time
+from threading import Event, Lock, Thread
 
 import datetime
 import os
 from builtins import object
+from concurrent.futures import CancelledError
 from concurrent.futures import ProcessPoolExecutor as ProcessPool
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from future.utils import PY3
 from rasa_nlu.training_data import Message
 
-from rasa_nlu import utils, config
+from rasa_nlu import utils, config, metrics
+from rasa_nlu.batching import MicroBatcher
+from rasa_nlu.cache import NegativeCache, ParseCache
+from rasa_nlu.circuit_breaker import CircuitBreakerError
 from rasa_nlu.components import ComponentBuilder
 from rasa_nlu.config import RasaNLUModelConfig
 from rasa_nlu.evaluate import get_evaluation_metrics, clean_intent_labels
+from rasa_nlu.jobs import Job, JobStore, STATUS_QUEUED
 from rasa_nlu.model import InvalidProjectError
+from rasa_nlu.model_manager import ModelManager
+from rasa_nlu.model_uploader import ModelUploader
+from rasa_nlu.persistor import GuardedPersistor
 from rasa_nlu.project import Project
-from rasa_nlu.train import do_train_in_worker
+from rasa_nlu.query_logger import QueryLogger
+from rasa_nlu.train import TrainingProgress, do_train_in_worker
 from rasa_nlu.training_data.loading import load_data
 from twisted.internet import reactor
 from twisted.internet.defer import Deferred
-from twisted.logger import jsonFileLogObserver, Logger
-from typing import Text, Dict, Any, Optional, List
+from typing import Any, Callable, Dict, List, Optional, Text, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +52,12 @@ logger = logging.getLogger(__name__)
 # of wrapping them in `callFromThread`.
 DEFERRED_RUN_IN_REACTOR_THREAD = True
 
+# number of examples parsed with a single call during evaluations
+EVALUATION_BATCH_SIZE = 256
+
+# number of projects between two progress messages during startup
+STARTUP_PROGRESS_INTERVAL = 25
+
 
 class AlreadyTrainingError(Exception):
     """Raised when a training is requested for a project that is
@@ -69,7 +85,10 @@ def deferred_from_future(future):
     d = Deferred()
 
     def callback(future):
-        e = future.exception()
+        if future.cancelled():
+            e = CancelledError()
+        else:
+            e = future.exception()
         if e:
             if DEFERRED_RUN_IN_REACTOR_THREAD:
                 reactor.callFromThread(d.errback, e)
@@ -92,27 +111,83 @@ class DataRouter(object):
                  response_log=None,
                  emulation_mode=None,
                  remote_storage=None,
-                 component_builder=None):
+                 component_builder=None,
+                 max_batch_size=1,
+                 max_batch_wait=5,
+                 parse_cache_size=0,
+                 parse_cache_ttl=None,
+                 parse_cache_time_bucket=60,
+                 response_log_buffer_size=10000,
+                 response_log_flush_interval=1,
+                 response_log_max_bytes=None,
+                 response_log_rotate_interval=None,
+                 response_log_compress=False,
+                 max_loaded_models=None,
+                 max_model_bytes=None,
+                 unknown_name_ttl=30,
+                 min_refresh_interval=5,
+                 model_refresh_interval=None,
+                 startup_threads=8,
+                 prefetch_models=False,
+                 warm_up_prefetched=False,
+                 upload_workers=2,
+                 upload_retries=3,
+                 storage_timeout=10,
+                 storage_download_timeout=None,
+                 storage_failure_threshold=5,
+                 storage_reset_timeout=30):
         self._training_processes = max(max_training_processes, 1)
+        self._query_logger_config = {
+            "buffer_size": response_log_buffer_size,
+            "flush_interval": response_log_flush_interval,
+            "max_bytes": response_log_max_bytes,
+            "rotate_interval": response_log_rotate_interval,
+            "compress": response_log_compress
+        }
         self.responses = self._create_query_logger(response_log)
         self.project_dir = config.make_path_absolute(project_dir)
         self.emulator = self._create_emulator(emulation_mode)
         self.remote_storage = remote_storage
+        self.guarded_persistor = self._create_guarded_persistor(
+                storage_timeout, storage_download_timeout,
+                storage_failure_threshold, storage_reset_timeout)
 
         if component_builder:
             self.component_builder = component_builder
         else:
             self.component_builder = ComponentBuilder(use_cache=True)
 
+        self.parse_cache = self._create_parse_cache(parse_cache_size,
+                                                    parse_cache_ttl,
+                                                    parse_cache_time_bucket)
+        self.model_manager = self._create_model_manager(max_loaded_models,
+                                                        max_model_bytes)
+        self.unknown_names = self._create_negative_cache(unknown_name_ttl)
+        self.min_refresh_interval = min_refresh_interval
+        self._listed_projects = None  # type: Optional[List[Text]]
+        self._listed_projects_at = 0.0
+        self._listing_lock = Lock()
+        self.startup_threads = max(startup_threads, 1)
         self.project_store = self._create_project_store(project_dir)
         self.pool = ProcessPool(self._training_processes)
+        self.batcher = self._create_batcher(max_batch_size, max_batch_wait)
+        self.jobs = JobStore()
+        self._upload_config = (upload_workers, upload_retries)
+        self.uploader = self._create_uploader(upload_workers, upload_retries)
+        self.model_refresh_interval = model_refresh_interval
+        self.prefetch_models = prefetch_models
+        self.warm_up_prefetched = warm_up_prefetched
+        self._refresh_stopped = Event()
+        self._start_model_refresh()
 
     def __del__(self):
         """Terminates workers pool processes"""
         self.pool.shutdown()
+        self.stop_model_refresh()
+        if self.responses:
+            self.responses.close()
 
-    @staticmethod
-    def _create_query_logger(response_log):
+    def _create_query_logger(self, response_log):
         """Create a logger that will persist incoming query results."""
 
         # Ensures different log files for different
@@ -124,15 +199,13 @@ class DataRouter(object):
             log_file_name = "rasa_nlu_log-{}-{}.log".format(timestamp,
                                                             os.getpid())
             response_logfile = os.path.join(response_log, log_file_name)
-            # Instantiate a standard python logger,
-            # which we are going to use to log requests
-            utils.create_dir_for_file(response_logfile)
-            out_file = io.open(response_logfile, 'a', encoding='utf8')
-            query_logger = Logger(
-                    observer=jsonFileLogObserver(out_file, recordSeparator=''),
-                    namespace='query-logger')
-            # Prevents queries getting logged with parent logger
-            # --> might log them to stdout
+            # Responses are written by a background thread, so logging
+            # doesn't add any latency to the requests
+            query_logger = QueryLogger(response_logfile,
+                                       **self._query_logger_config)
+            # Write the buffered responses before the server stops
+            reactor.addSystemEventTrigger('before', 'shutdown',
+                                          query_logger.close)
             logger.info("Logging requests to '{}'.".format(response_logfile))
             return query_logger
         else:
@@ -141,48 +214,262 @@ class DataRouter(object):
                         "(No 'request_log' directory configured)")
             return None
 
-    def _collect_projects(self, project_dir):
+    def _create_guarded_persistor(self, timeout, download_timeout,
+                                  failure_threshold, reset_timeout):
+        # type: (...) -> Optional[GuardedPersistor]
+        """Create the persistor used while handling requests.
+
+        Calls to the remote storage time out and are rejected right away
+        while the storage keeps failing, so a slow or unavailable storage
+        doesn't block requests."""
+
+        if not self.remote_storage:
+            return None
+
+        return GuardedPersistor(self.remote_storage, timeout,
+                                download_timeout, failure_threshold,
+                                reset_timeout)
+
+    def _create_uploader(self, workers, retries):
+        # type: (int, int) -> Optional[ModelUploader]
+        """Create the uploader storing trained models remotely.
+
+        Models are uploaded in the background after the training, so the
+        training worker is free again right away."""
+
+        if not self.remote_storage:
+            return None
+
+        uploader = ModelUploader(self.remote_storage, workers, retries)
+        # finish running uploads before the server stops
+        reactor.addSystemEventTrigger('before', 'shutdown',
+                                      uploader.shutdown)
+        return uploader
+
+    def _start_model_refresh(self):
+        """Start the thread that periodically looks for new models."""
+
+        if not self.model_refresh_interval:
+            if self.prefetch_models:
+                logger.warning("Models are only prefetched if a model "
+                               "refresh interval is set.")
+            return
+
+        thread = Thread(target=self._refresh_models_periodically,
+                        name="model-refresh")
+        thread.daemon = True
+        thread.start()
+        reactor.addSystemEventTrigger('before', 'shutdown',
+                                      self.stop_model_refresh)
+        logger.info("Looking for new models every {} seconds{}."
+                    "".format(self.model_refresh_interval,
+                              " and prefetching them"
+                              if self.prefetch_models else ""))
+
+    def stop_model_refresh(self):
+        self._refresh_stopped.set()
+
+    def restart_after_fork(self):
+        """Restart the background tasks in a forked worker process.
+
+        Threads don't survive a fork and the worker's reactor doesn't
+        know the shutdown triggers registered by the master, so every
+        worker starts its own model refresh and uploader."""
+
+        self._refresh_stopped = Event()
+        self._start_model_refresh()
+        self.uploader = self._create_uploader(*self._upload_config)
+
+    def _refresh_models_periodically(self):
+        while not self._refresh_stopped.wait(self.model_refresh_interval):
+            for name, project in list(self.project_store.items()):
+                try:
+                    if self.prefetch_models:
+                        project.sync_models(self.warm_up_prefetched)
+                    else:
+                        project.refresh_models()
+                except Exception:
+                    logger.exception("Failed to refresh the models of "
+                                     "project '{}'.".format(name))
+
+    def _create_batcher(self, max_batch_size, max_batch_wait):
+        # type: (int, float) -> Optional[MicroBatcher]
+        """Create the batcher that combines concurrent parse requests.
+
+        Micro batching is only enabled if more than one query can be
+        part of a batch. `max_batch_wait` is given in milliseconds."""
+
+        if max_batch_size > 1:
+            logger.info("Batching up to {} concurrent parse requests "
+                        "within {}ms.".format(max_batch_size, max_batch_wait))
+            return MicroBatcher(self._parse_queued_batch,
+                                max_batch_size, max_batch_wait)
+        else:
+            return None
+
+    @staticmethod
+    def _create_parse_cache(max_size, ttl, time_bucket):
+        # type: (int, Optional[float], float) -> Optional[ParseCache]
+        """Create the cache for parse results.
+
+        Caching is disabled if the cache can't hold any entries."""
+
+        if max_size > 0:
+            logger.info("Caching up to {} parse results.".format(max_size))
+            return ParseCache(max_size, ttl, time_bucket)
+        else:
+            return None
+
+    @staticmethod
+    def _create_model_manager(max_models, max_bytes):
+        # type: (Optional[int], Optional[int]) -> Optional[ModelManager]
+        """Create the manager that limits the loaded models.
+
+        Models are only unloaded automatically if a limit is set."""
+
+        if max_models or max_bytes:
+            logger.info("Keeping at most {} models / {} bytes of models "
+                        "loaded.".format(max_models or "unlimited",
+                                         max_bytes or "unlimited"))
+            return ModelManager(max_models or None, max_bytes or None)
+        else:
+            return None
+
+    @staticmethod
+    def _create_negative_cache(ttl):
+        # type: (Optional[float]) -> Optional[NegativeCache]
+        """Create the cache for unknown project and model names.
+
+        Unknown names are looked up on every request if the ttl is 0."""
+
+        if ttl:
+            return NegativeCache(ttl)
+        else:
+            return None
+
+    def _create_project(self, project, cloud_models=None):
+        # type: (Text, Optional[List[Text]]) -> Project
+        return Project(self.component_builder, project, self.project_dir,
+                       self.remote_storage, self.parse_cache,
+                       self.model_manager, self.unknown_names,
+                       self.min_refresh_interval, cloud_models,
+                       self.guarded_persistor)
+
+    @staticmethod
+    def _collect_projects(project_dir, cloud_models):
+        # type: (Text, Optional[Dict[Text, List[Text]]]) -> List[Text]
+
         if project_dir and os.path.isdir(project_dir):
             projects = os.listdir(project_dir)
         else:
             projects = []
 
-        projects.extend(self._list_projects_in_cloud())
-        return projects
+        projects.extend(cloud_models or [])
+        return sorted(set(projects))
 
     def _create_project_store(self, project_dir):
-        projects = self._collect_projects(project_dir)
+        # the cloud storage is listed once for all projects
+        cloud_models = self._list_models_in_cloud()
+        projects = self._collect_projects(project_dir, cloud_models)
 
-        project_store = {}
+        def create_project(project):
+            if cloud_models is None:
+                # listing all models failed, each project tries again
+                return self._create_project(project)
+            return self._create_project(project,
+                                        cloud_models.get(project, []))
 
-        for project in projects:
-            project_store[project] = Project(self.component_builder,
-                                             project,
-                                             self.project_dir,
-                                             self.remote_storage)
+        created = self._run_in_parallel(create_project, projects,
+                                        "Discovered")
+        project_store = dict(zip(projects, created))
 
         if not project_store:
             default_model = RasaNLUModelConfig.DEFAULT_PROJECT_NAME
-            project_store[default_model] = Project(
-                    project=RasaNLUModelConfig.DEFAULT_PROJECT_NAME,
-                    project_dir=self.project_dir,
-                    remote_storage=self.remote_storage)
+            project_store[default_model] = self._create_project(default_model)
         return project_store
 
-    def _pre_load(self, projects):
+    def _pre_load(self, projects, max_projects=None):
+        # type: (List[Text], Optional[int]) -> None
+        """Loads the latest models of the projects in parallel.
+
+        If `max_projects` is set, only the projects with the most
+        recently trained models are loaded."""
+
         logger.debug("loading %s", projects)
-        for project in self.project_store:
-            if project in projects:
+        to_load = [p for p in self.project_store if p in projects]
+
+        if max_projects is not None:
+            def trained_at(project):
+                latest = self.project_store[project].latest_model_trained_at()
+                return latest is not None, latest
+
+            to_load = sorted(to_load, key=trained_at,
+                             reverse=True)[:max_projects]
+
+        def load_model(project):
+            try:
                 self.project_store[project].load_model()
+            except Exception:
+                logger.exception("Failed to preload the model of project "
+                                 "'{}'.".format(project))
+
+        self._run_in_parallel(load_model, to_load, "Preloaded")
+
+    def _run_in_parallel(self, func, projects, action):
+        # type: (Callable[[Text], Any], List[Text], Text) -> List[Any]
+        """Calls `func` for each project on a bounded thread pool.
+
+        Returns the results in the order of the projects."""
+
+        results = [None] * len(projects)
+        if not projects:
+            return results
+
+        workers = min(self.startup_threads, len(projects))
+        with ThreadPoolExecutor(workers) as pool:
+            futures = {pool.submit(func, project): idx
+                       for idx, project in enumerate(projects)}
+            for done, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if (done % STARTUP_PROGRESS_INTERVAL == 0 or
+                        done == len(projects)):
+                    logger.info("{} {}/{} projects.".format(
+                            action, done, len(projects)))
+        return results
+
+    def _list_models_in_cloud(self):
+        # type: () -> Optional[Dict[Text, List[Text]]]
+        """Lists the models of all projects in the cloud storage.
+
+        Returns `None` if the models couldn't be listed."""
 
-    def _list_projects_in_cloud(self):
         try:
             from rasa_nlu.persistor import get_persistor
             p = get_persistor(self.remote_storage)
+            if p is not None:
+                return p.list_models_by_project()
+            else:
+                return {}
+        except Exception:
+            logger.exception("Failed to list models. Make sure you have "
+                             "correctly configured your cloud storage "
+                             "settings.")
+            return None
+
+    def _list_projects_in_cloud(self):
+        try:
+            if self.guarded_persistor is not None:
+                p = self.guarded_persistor
+            else:
+                from rasa_nlu.persistor import get_persistor
+                p = get_persistor(self.remote_storage)
             if p is not None:
                 return p.list_projects()
             else:
                 return []
+        except CircuitBreakerError as e:
+            logger.warning("Not listing projects. {}".format(e))
+            return []
         except Exception:
             logger.exception("Failed to list projects. Make sure you have "
                              "correctly configured your cloud storage "
@@ -213,39 +500,148 @@ class DataRouter(object):
     def extract(self, data):
         return self.emulator.normalise_request_json(data)
 
-    def parse(self, data):
-        project = data.get("project", RasaNLUModelConfig.DEFAULT_PROJECT_NAME)
-        model = data.get("model")
+    def _ensure_project_exists(self, project):
+        # type: (Text) -> None
+        """Adds the project to the project store if it is not part of it yet.
+
+        Raises an `InvalidProjectError` if the project can't be found."""
 
         if project not in self.project_store:
-            projects = self._list_projects(self.project_dir)
+            unknown_key = (project, None)
+            if (self.unknown_names is not None and
+                    unknown_key in self.unknown_names):
+                raise InvalidProjectError(
+                        "No project found with name '{}'.".format(project))
 
-            cloud_provided_projects = self._list_projects_in_cloud()
-            projects.extend(cloud_provided_projects)
+            projects = self._available_projects()
 
             if project not in projects:
+                if self.unknown_names is not None:
+                    self.unknown_names.add(unknown_key)
                 raise InvalidProjectError(
                         "No project found with name '{}'.".format(project))
             else:
                 try:
-                    self.project_store[project] = Project(
-                            self.component_builder, project,
-                            self.project_dir, self.remote_storage)
+                    self.project_store[project] = self._create_project(
+                            project)
                 except Exception as e:
                     raise InvalidProjectError(
                             "Unable to load project '{}'. "
                             "Error: {}".format(project, e))
 
-        time = data.get('time')
-        response = self.project_store[project].parse(data['text'], time,
-                                                     model)
+    def _available_projects(self):
+        # type: () -> List[Text]
+        """Lists the projects on disk and in the cloud storage.
+
+        The listing is reused for `min_refresh_interval` seconds, so
+        requests for many different unknown projects don't list the
+        storage over and over again."""
+
+        with self._listing_lock:
+            age = time.time() - self._listed_projects_at
+            if (self._listed_projects is None or
+                    age >= self.min_refresh_interval):
+                projects = self._list_projects(self.project_dir)
+                projects.extend(self._list_projects_in_cloud())
+                self._listed_projects = projects
+                self._listed_projects_at = time.time()
+            return self._listed_projects
+
+    def _log_response(self, response, project):
+        # type: (Dict[Text, Any], Text) -> None
 
         if self.responses:
-            self.responses.info('', user_input=response, project=project,
-                                model=response.get('model'))
+            self.responses.log(response, project, response.get('model'))
+
+    def parse(self, data):
+        project = data.get("project", RasaNLUModelConfig.DEFAULT_PROJECT_NAME)
+        model = data.get("model")
+
+        self._ensure_project_exists(project)
+
+        time = data.get('time')
+        if self.batcher is not None:
+            response = self.batcher.process((project, model),
+                                            (data['text'], time))
+        else:
+            response = self.project_store[project].parse(data['text'], time,
+                                                         model)
+
+        self._log_response(response, project)
 
         return self.format_response(response)
 
+    def _parse_queued_batch(self, key, items):
+        # type: (Tuple[Text, Optional[Text]], List[Tuple]) -> List[Dict]
+        """Parses the queries the batcher collected for a project / model."""
+
+        project, model = key
+        texts = [text for text, _ in items]
+        times = [time for _, time in items]
+        return self.project_store[project].parse_batch(texts, times, model)
+
+    def parse_batch(self, queries):
+        # type: (List[Dict[Text, Any]]) -> List[Dict[Text, Any]]
+        """Parses a list of (already extracted) queries.
+
+        Queries are grouped by project and model and each group is parsed
+        using a single batch call to the interpreter. The responses are
+        returned in the order of the queries. If a query fails, its response
+        only contains an `error` instead of failing the whole batch."""
+
+        responses = [None] * len(queries)  # type: List[Dict[Text, Any]]
+
+        groups = {}
+        for idx, data in enumerate(queries):
+            project = data.get("project",
+                               RasaNLUModelConfig.DEFAULT_PROJECT_NAME)
+            groups.setdefault((project, data.get("model")), []).append(idx)
+
+        for (project, model), indices in groups.items():
+            try:
+                self._ensure_project_exists(project)
+            except InvalidProjectError as e:
+                for idx in indices:
+                    responses[idx] = {"error": "{}".format(e)}
+                continue
+
+            for idx, response in zip(indices, self._parse_group(
+                    project, model, [queries[i] for i in indices])):
+                if "error" not in response:
+                    self._log_response(response, project)
+                    response = self.format_response(response)
+                responses[idx] = response
+
+        return responses
+
+    def _parse_group(self, project, model, queries):
+        # type: (Text, Optional[Text], List[Dict]) -> List[Dict[Text, Any]]
+        """Parses queries for the same project and model as a batch.
+
+        If the batch fails, the queries get parsed one by one to
+        figure out which of them caused the failure."""
+
+        texts = [data['text'] for data in queries]
+        times = [data.get('time') for data in queries]
+
+        try:
+            return self.project_store[project].parse_batch(texts, times,
+                                                           model)
+        except Exception as e:
+            logger.warning("Failed to parse batch of {} queries for project "
+                           "'{}'. Parsing them one by one. "
+                           "Error: {}".format(len(queries), project, e))
+
+        responses = []
+        for text, time in zip(texts, times):
+            try:
+                responses.append(
+                        self.project_store[project].parse(text, time, model))
+            except Exception as e:
+                logger.exception("Failed to parse '{}'.".format(text))
+                responses.append({"error": "{}".format(e)})
+        return responses
+
     @staticmethod
     def _list_projects(path):
         """List the projects in the path, ignoring hidden directories."""
@@ -256,14 +652,15 @@ class DataRouter(object):
         # type: (Optional[List[Message]], Text, Text) -> List[Dict[Text, Text]]
         """Parses a list of training examples to the project interpreter"""
 
+        texts = [ex.text for ex in examples]
+        logger.debug("Going to parse {} examples.".format(len(texts)))
+
         predictions = []
-        for ex in examples:
-            logger.debug("Going to parse: {}".format(ex.as_dict()))
-            response = self.project_store[project].parse(ex.text,
-                                                         None,
-                                                         model)
-            logger.debug("Received response: {}".format(response))
-            predictions.append(response)
+        for start in range(0, len(texts), EVALUATION_BATCH_SIZE):
+            batch = texts[start:start + EVALUATION_BATCH_SIZE]
+            predictions.extend(
+                    self.project_store[project].parse_batch(batch, None,
+                                                            model))
 
         return predictions
 
@@ -275,64 +672,158 @@ class DataRouter(object):
         # process, if run in multi worker mode, there might
         # be other trainings run in different processes we don't know about.
 
-        return {
+        status = {
             "available_projects": {
                 name: project.as_dict()
                 for name, project in self.project_store.items()
             }
         }
 
+        if self.parse_cache is not None:
+            status["parse_cache"] = self.parse_cache.as_dict()
+
+        if self.unknown_names is not None:
+            status["unknown_names"] = self.unknown_names.as_dict()
+
+        if self.model_manager is not None:
+            status["model_manager"] = self.model_manager.as_dict()
+
+        if self.uploader is not None:
+            status["model_uploads"] = self.uploader.as_dict()
+
+        if self.guarded_persistor is not None:
+            status["storage"] = self.guarded_persistor.as_dict()
+
+        if self.responses:
+            status["response_log"] = self.responses.as_dict()
+
+        return status
+
     def start_train_process(self,
                             data_file,  # type: Text
                             project,  # type: Text
                             train_config,  # type: RasaNLUModelConfig
-                            model_name=None  # type: Optional[Text]
+                            model_name=None,  # type: Optional[Text]
+                            job=None  # type: Optional[Job]
                             ):
         # type: (...) -> Deferred
-        """Start a model training."""
+        """Start a model training.
+
+        If a job is passed, it reports the progress of the training
+        and can be used to cancel it."""
 
         if not project:
             raise InvalidProjectError("Missing project name to train")
 
+        # failed trainings of new projects aren't labelled with the name
+        known_projects = [project] if project in self.project_store else []
+
         if project in self.project_store:
             if self.project_store[project].status == 1:
                 raise AlreadyTrainingError
             else:
                 self.project_store[project].status = 1
         elif project not in self.project_store:
-            self.project_store[project] = Project(
-                    self.component_builder, project,
-                    self.project_dir, self.remote_storage)
+            self.project_store[project] = self._create_project(project)
             self.project_store[project].status = 1
+            if self.unknown_names is not None:
+                self.unknown_names.discard((project, None))
+
+        start = time.time()
+
+        def observe_training_duration(status):
+            labels = {"project": metrics.known_label(project, known_projects),
+                      "status": status}
+            metrics.registry.observe(metrics.TRAINING_DURATION,
+                                     time.time() - start, labels)
 
         def training_callback(model_path):
+            known_projects.append(project)
+            observe_training_duration("success")
             model_dir = os.path.basename(os.path.normpath(model_path))
             self.project_store[project].update(model_dir)
+            if self.uploader is not None:
+                self.uploader.submit(project, model_dir, model_path)
             return model_dir
 
         def training_errback(failure):
+            observe_training_duration("failure")
             logger.warn(failure)
-            target_project = self.project_store.get(
-                    failure.value.failed_target_project)
+            target_project = self.project_store.get(project)
             if target_project:
                 target_project.status = 0
             return failure
 
         logger.debug("New training queued")
 
-        result = self.pool.submit(do_train_in_worker,
+        if job is not None:
+            progress = TrainingProgress(
+                    tempfile.mkdtemp(prefix="rasa_nlu_training_"))
+        else:
+            progress = None
+
+        future = self.pool.submit(do_train_in_worker,
                                   train_config,
                                   data_file,
                                   path=self.project_dir,
                                   project=project,
                                   fixed_model_name=model_name,
-                                  storage=self.remote_storage)
-        result = deferred_from_future(result)
+                                  # uploaded by `self.uploader` instead
+                                  storage=None,
+                                  progress=progress)
+        result = deferred_from_future(future)
         result.addCallback(training_callback)
         result.addErrback(training_errback)
 
+        if job is not None:
+            self._attach_training_job(job, future, progress, result)
+
         return result
 
+    @staticmethod
+    def _attach_training_job(job, future, progress, result):
+        # type: (Job, Any, TrainingProgress, Deferred) -> None
+
+        def read_progress():
+            current = progress.read()
+            if current and job.status == STATUS_QUEUED:
+                job.start(current["started_at"])
+            return current
+
+        def cancel():
+            # trainings that didn't start yet are removed from the pool's
+            # queue, running ones stop before the next component
+            return future.cancel() or progress.request_cancel()
+
+        def cleanup(result):
+            read_progress()
+            progress.cleanup()
+            return result
+
+        job.set_progress_source(read_progress)
+        job.set_canceller(cancel)
+        result.addBoth(cleanup)
+
+    def start_train_job(self,
+                        data_file,  # type: Text
+                        project,  # type: Text
+                        train_config,  # type: RasaNLUModelConfig
+                        model_name=None  # type: Optional[Text]
+                        ):
+        # type: (...) -> Job
+        """Start a model training in the background and return its job."""
+
+        job = self.jobs.create("training", project=project, model=model_name)
+        try:
+            result = self.start_train_process(data_file, project,
+                                              train_config, model_name, job)
+        except Exception:
+            self.jobs.remove(job.id)
+            raise
+
+        self.jobs.track(job, result)
+        return job
+
     def evaluate(self, data, project=None, model=None):
         # type: (Text, Optional[Text], Optional[Text]) -> Dict[Text, Any]
         """Perform a model evaluation."""
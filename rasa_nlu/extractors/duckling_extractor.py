@@ -74,6 +74,8 @@ class DucklingExtractor(EntityExtractor):
 
     provides = ["entities"]
 
+    time_dependent = True
+
     defaults = {
         # by default all dimensions recognized by duckling are returned
         # dimensions can be configured to contain an array of strings
@@ -30,6 +30,8 @@ class DucklingHTTPExtractor(EntityExtractor):
 
     provides = ["entities"]
 
+    time_dependent = True
+
     defaults = {
         # by default all dimensions recognized by duckling are returned
         # dimensions can be configured to contain an array of strings
@@ -55,6 +55,8 @@ class LingExtractor(EntityExtractor):
 
     provides = ["entities"]
 
+    time_dependent = True
+
     defaults = {
         # by default all dimensions recognized by duckling are returned
         # dimensions can be configured to contain an array of strings
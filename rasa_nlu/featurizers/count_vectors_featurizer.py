@@ -238,6 +238,25 @@ class CountVectorsFeaturizer(Featurizer):
                         self._combine_with_existing_text_features(message,
                                                                   bag))
 
+    def process_batch(self, messages, **kwargs):
+        # type: (List[Message], **Any) -> None
+        """Creates the bags of words of all messages with a single
+        call to the vectorizer."""
+
+        if self.vect is None:
+            logger.error("There is no trained CountVectorizer: "
+                         "component is either not trained or "
+                         "didn't receive enough training data")
+        elif messages:
+            message_texts = [self._get_message_text(message)
+                             for message in messages]
+
+            bags = self.vect.transform(message_texts).toarray()
+            for message, bag in zip(messages, bags):
+                message.set("text_features",
+                            self._combine_with_existing_text_features(message,
+                                                                      bag))
+
     @classmethod
     def load(cls,
              model_dir=None,  # type: Text
@@ -0,0 +1,186 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import logging
+import time
+import uuid
+from builtins import object
+from collections import OrderedDict
+from threading import Lock
+
+from typing import Any, Callable, Dict, List, Optional, Text
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+FINISHED_STATUSES = {STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED}
+
+
+class Job(object):
+    """A long running task (e.g. an evaluation) clients can poll for."""
+
+    def __init__(self, job_id, job_type, **info):
+        # type: (Text, Text, **Any) -> None
+
+        self.id = job_id
+        self.type = job_type
+        self.info = info
+        self.status = STATUS_QUEUED
+        self.result = None  # type: Any
+        self.error = None  # type: Optional[Text]
+        self.created_at = time.time()
+        self.started_at = None  # type: Optional[float]
+        self.finished_at = None  # type: Optional[float]
+        self.cancel_requested = False
+        self._canceller = None  # type: Optional[Callable[[], bool]]
+        self._progress = None  # type: Optional[Callable[[], Any]]
+
+    def set_canceller(self, canceller):
+        # type: (Callable[[], bool]) -> None
+        """Makes the job cancellable.
+
+        `canceller` returns `True` if the job got cancelled right away and
+        `False` if it will only stop later on (the job then fails)."""
+
+        self._canceller = canceller
+
+    def set_progress_source(self, progress):
+        # type: (Callable[[], Any]) -> None
+        """Sets the function returning the current progress of the job."""
+
+        self._progress = progress
+
+    @property
+    def is_finished(self):
+        # type: () -> bool
+        return self.status in FINISHED_STATUSES
+
+    def start(self, started_at=None):
+        # type: (Optional[float]) -> None
+        self.status = STATUS_RUNNING
+        self.started_at = started_at or time.time()
+
+    def cancel(self):
+        # type: () -> bool
+        """Cancels the job. Returns `False` if it can't be cancelled."""
+
+        if self.is_finished or self._canceller is None:
+            return False
+
+        self.cancel_requested = True
+        if self._canceller():
+            self._finish(STATUS_CANCELLED)
+        return True
+
+    def complete(self, result):
+        # type: (Any) -> Any
+        self.result = result
+        self._finish(STATUS_COMPLETED)
+        return result
+
+    def fail(self, error):
+        # type: (Any) -> None
+        self.error = "{}".format(error)
+        if self.cancel_requested:
+            self._finish(STATUS_CANCELLED)
+        else:
+            self._finish(STATUS_FAILED)
+
+    def _finish(self, status):
+        # type: (Text) -> None
+        if self.is_finished:
+            return
+        self.status = status
+        self.finished_at = time.time()
+        if self.started_at is None:
+            self.started_at = self.finished_at
+
+    def elapsed_time(self):
+        # type: () -> Optional[float]
+        """Seconds the job has been running (or ran) for."""
+
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def as_dict(self, include_result=True):
+        # type: (bool) -> Dict[Text, Any]
+
+        job = {"id": self.id,
+               "type": self.type,
+               "status": self.status,
+               "created_at": self.created_at,
+               "started_at": self.started_at,
+               "finished_at": self.finished_at,
+               "elapsed_time": self.elapsed_time()}
+        job.update(self.info)
+        if self._progress is not None:
+            job["progress"] = self._progress()
+        if self.status == STATUS_COMPLETED and include_result:
+            job["result"] = self.result
+        elif self.status == STATUS_FAILED:
+            job["error"] = self.error
+        return job
+
+
+class JobStore(object):
+    """Keeps track of the jobs of the server.
+
+    Only the last `max_finished_jobs` finished jobs are kept,
+    older ones are forgotten."""
+
+    def __init__(self, max_finished_jobs=100):
+        # type: (int) -> None
+
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs = OrderedDict()  # type: Dict[Text, Job]
+        self._lock = Lock()
+
+    def create(self, job_type, **info):
+        # type: (Text, **Any) -> Job
+
+        job = Job(uuid.uuid4().hex, job_type, **info)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished_jobs()
+        return job
+
+    def get(self, job_id):
+        # type: (Text) -> Optional[Job]
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        # type: () -> List[Job]
+        with self._lock:
+            return list(self._jobs.values())
+
+    def remove(self, job_id):
+        # type: (Text) -> None
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def track(self, job, deferred):
+        """Finishes the job once the deferred fires."""
+
+        def errback(failure):
+            logger.warning("Job {} ({}) failed: {}".format(
+                    job.id, job.type, failure.getErrorMessage()))
+            job.fail(failure.getErrorMessage())
+
+        deferred.addCallbacks(job.complete, errback)
+        return deferred
+
+    def _forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.is_finished]
+        for job_id in finished[:max(len(finished) -
+                                    self.max_finished_jobs, 0)]:
+            del self._jobs[job_id]
@@ -0,0 +1,226 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import logging
+import time
+from builtins import object
+from contextlib import contextmanager
+from threading import Lock
+
+from typing import (
+    Any, Container, Dict, Iterator, List, Optional, Text, Tuple)
+
+logger = logging.getLogger(__name__)
+
+# upper bounds (in seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0,
+                   900.0, 3600.0)
+
+COMPONENT_DURATION = "rasa_nlu_component_duration_seconds"
+COMPONENT_BATCH_DURATION = "rasa_nlu_component_batch_duration_seconds"
+MODEL_LOAD_DURATION = "rasa_nlu_model_load_duration_seconds"
+MODEL_EVICTIONS = "rasa_nlu_model_evictions_total"
+MODEL_CACHE_REQUESTS = "rasa_nlu_model_cache_requests_total"
+MODEL_UPLOADS = "rasa_nlu_model_uploads_total"
+MODEL_PREFETCHES = "rasa_nlu_model_prefetches_total"
+TRAINING_DURATION = "rasa_nlu_training_duration_seconds"
+PARSE_QUEUE_IN_FLIGHT = "rasa_nlu_parse_queue_in_flight"
+PARSE_QUEUE_QUEUED = "rasa_nlu_parse_queue_queued"
+PARSE_QUEUE_REJECTED = "rasa_nlu_parse_requests_rejected_total"
+
+DESCRIPTIONS = {
+    COMPONENT_DURATION: "Time a component needed to process a message.",
+    COMPONENT_BATCH_DURATION: "Time a component needed to process a batch "
+                              "of messages.",
+    MODEL_LOAD_DURATION: "Time needed to load the interpreter of a model.",
+    MODEL_EVICTIONS: "Models unloaded to stay within the model budget.",
+    MODEL_CACHE_REQUESTS: "Model archives requested from the local "
+                          "model cache.",
+    MODEL_UPLOADS: "Uploads of trained models to the remote storage.",
+    MODEL_PREFETCHES: "Models downloaded from the remote storage before "
+                      "they were requested.",
+    TRAINING_DURATION: "Time needed to train a model.",
+    PARSE_QUEUE_IN_FLIGHT: "Parse requests currently being processed.",
+    PARSE_QUEUE_QUEUED: "Parse requests waiting to be processed.",
+    PARSE_QUEUE_REJECTED: "Parse requests rejected because the queue "
+                          "was full.",
+}
+
+# label value of projects and models the server doesn't know
+UNKNOWN_LABEL = "unknown"
+
+
+def known_label(value, known_values):
+    # type: (Text, Container[Text]) -> Text
+    """Returns `value` if it is one of `known_values`, `UNKNOWN_LABEL`
+    otherwise. Names taken from requests are only used as label values
+    once they are known, so requests can't create unbounded series."""
+
+    return value if value in known_values else UNKNOWN_LABEL
+
+
+def _escape(value):
+    # type: (Any) -> Text
+    return ("{}".format(value)
+            .replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace("\"", "\\\""))
+
+
+def _format_labels(labels):
+    # type: (Tuple[Tuple[Text, Any], ...]) -> Text
+    if not labels:
+        return ""
+    return "{" + ",".join("{}=\"{}\"".format(k, _escape(v))
+                          for k, v in labels) + "}"
+
+
+def _format_value(value):
+    # type: (float) -> Text
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram(object):
+    """Counts observations in cumulative buckets."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        # type: (Tuple[float, ...]) -> None
+
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # type: (float) -> None
+
+        for idx, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[idx] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        # type: (Text, Tuple) -> List[Text]
+
+        lines = []
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            bucket_labels = labels + (("le", _format_value(upper_bound)),)
+            lines.append("{}_bucket{} {}".format(
+                    name, _format_labels(bucket_labels), cumulative))
+        lines.append("{}_sum{} {}".format(name, _format_labels(labels),
+                                          _format_value(self.sum)))
+        lines.append("{}_count{} {}".format(name, _format_labels(labels),
+                                            self.count))
+        return lines
+
+
+class MetricsRegistry(object):
+    """Thread safe store of counters, gauges and histograms.
+
+    Every metric is identified by its name and a set of labels. The
+    registry can be rendered in the Prometheus text exposition format."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        # type: (Tuple[float, ...]) -> None
+
+        self.buckets = buckets
+        self._types = {}  # type: Dict[Text, Text]
+        self._values = {}  # type: Dict[Text, Dict[Tuple, Any]]
+        self._lock = Lock()
+
+    @staticmethod
+    def _label_key(labels):
+        # type: (Optional[Dict[Text, Any]]) -> Tuple[Tuple[Text, Any], ...]
+        return tuple(sorted(labels.items())) if labels else ()
+
+    def _series(self, name, metric_type):
+        # type: (Text, Text) -> Dict[Tuple, Any]
+
+        known_type = self._types.setdefault(name, metric_type)
+        if known_type != metric_type:
+            raise ValueError("Metric '{}' is a {}, not a {}."
+                             "".format(name, known_type, metric_type))
+        return self._values.setdefault(name, {})
+
+    def inc(self, name, amount=1, labels=None):
+        # type: (Text, float, Optional[Dict[Text, Any]]) -> None
+        """Increases a counter."""
+
+        key = self._label_key(labels)
+        with self._lock:
+            series = self._series(name, "counter")
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, labels=None):
+        # type: (Text, float, Optional[Dict[Text, Any]]) -> None
+        """Sets the value of a gauge."""
+
+        key = self._label_key(labels)
+        with self._lock:
+            self._series(name, "gauge")[key] = value
+
+    def observe(self, name, value, labels=None):
+        # type: (Text, float, Optional[Dict[Text, Any]]) -> None
+        """Adds an observation to a histogram."""
+
+        key = self._label_key(labels)
+        with self._lock:
+            series = self._series(name, "histogram")
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = Histogram(self.buckets)
+                series[key] = histogram
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name, labels=None):
+        # type: (Text, Optional[Dict[Text, Any]]) -> Iterator[None]
+        """Observes the time spent in the `with` block in a histogram.
+
+        Nothing is observed if the block raises an exception."""
+
+        start = time.time()
+        yield
+        self.observe(name, time.time() - start, labels)
+
+    def get(self, name, labels=None):
+        # type: (Text, Optional[Dict[Text, Any]]) -> Any
+        """Returns the current value of a metric (or `None`)."""
+
+        with self._lock:
+            return self._values.get(name, {}).get(self._label_key(labels))
+
+    def exposition(self):
+        # type: () -> Text
+        """Renders all metrics in the Prometheus text format."""
+
+        lines = []
+        with self._lock:
+            for name in sorted(self._values):
+                metric_type = self._types[name]
+                if name in DESCRIPTIONS:
+                    lines.append("# HELP {} {}".format(name,
+                                                       DESCRIPTIONS[name]))
+                lines.append("# TYPE {} {}".format(name, metric_type))
+
+                for labels, value in sorted(self._values[name].items()):
+                    if metric_type == "histogram":
+                        lines.extend(value.samples(name, labels))
+                    else:
+                        lines.append("{}{} {}".format(name,
+                                                      _format_labels(labels),
+                                                      _format_value(value)))
+        return "\n".join(lines) + "\n"
+
+
+# process wide registry used by interpreters, projects and the server
+registry = MetricsRegistry()
@@ -10,13 +10,14 @@ import os
 
 from builtins import object
 from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Text
 
 import rasa_nlu
-from rasa_nlu import components, utils, config
+from rasa_nlu import components, utils, config, metrics
 from rasa_nlu.components import Component, ComponentBuilder
 from rasa_nlu.config import RasaNLUModelConfig, override_defaults
 from rasa_nlu.persistor import Persistor
@@ -160,9 +161,12 @@ class Trainer(object):
 
         return pipeline
 
-    def train(self, data, **kwargs):
-        # type: (TrainingData) -> Interpreter
-        """Trains the underlying pipeline using the provided training data."""
+    def train(self, data, progress_callback=None, **kwargs):
+        # type: (TrainingData, Optional[Callable], **Any) -> Interpreter
+        """Trains the underlying pipeline using the provided training data.
+
+        If passed, `progress_callback(index, component, total)` gets called
+        before each component is trained."""
 
         self.training_data = data
 
@@ -181,6 +185,8 @@ class Trainer(object):
         working_data = copy.deepcopy(data)
 
         for i, component in enumerate(self.pipeline):
+            if progress_callback is not None:
+                progress_callback(i, component, len(self.pipeline))
             logger.info("Starting to train component {}"
                         "".format(component.name))
             component.prepare_partial_processing(self.pipeline[:i], context)
@@ -317,6 +323,27 @@ class Interpreter(object):
         self.context = context if context is not None else {}
         self.model_metadata = model_metadata
 
+        # labels of the latency metrics recorded for this interpreter,
+        # the project sets them when it loads the model
+        model_dir = model_metadata.model_dir if model_metadata else None
+        self.metric_labels = {
+            "project": "",
+            "model": os.path.basename(model_dir) if model_dir else ""
+        }
+
+    def _timed(self, metric, component):
+        """Records the duration of a component call in a histogram."""
+
+        labels = dict(self.metric_labels, component=component.name)
+        return metrics.registry.time(metric, labels)
+
+    @property
+    def is_time_dependent(self):
+        # type: () -> bool
+        """Whether the parse result depends on the time of the request."""
+
+        return any(component.time_dependent for component in self.pipeline)
+
     def parse(self, text, time=None, only_output_properties=True):
         # type: (Text) -> Dict[Text, Any]
         """Parse the input text, classify it and return pipeline result.
@@ -328,14 +355,55 @@ class Interpreter(object):
             # to prevent that... This default return will not contain all
             # output attributes of all components, but in the end, no one
             # should pass an empty string in the first place.
-            output = self.default_output_attributes()
-            output["text"] = ""
-            return output
+            return self._empty_output()
 
         message = Message(text, self.default_output_attributes(), time=time)
 
         for component in self.pipeline:
-            component.process(message, **self.context)
+            with self._timed(metrics.COMPONENT_DURATION, component):
+                component.process(message, **self.context)
+
+        return self._output_for_message(message, only_output_properties)
+
+    def parse_batch(self, texts, times=None, only_output_properties=True):
+        # type: (List[Text], Optional[List[Any]], bool) -> List[Dict[Text, Any]]
+        """Parse a batch of input texts and return the pipeline results.
+
+        Each component processes all messages of the batch at once using
+        `Component.process_batch`, which allows components to vectorize
+        their work. The results are returned in the order of `texts`."""
+
+        if times is None:
+            times = [None] * len(texts)
+        elif len(times) != len(texts):
+            raise ValueError("Number of times ({}) does not match the number "
+                             "of texts ({}).".format(len(times), len(texts)))
+
+        # empty strings are not passed through the pipeline, see `parse`
+        messages = [Message(text, self.default_output_attributes(), time=time)
+                    if text else None
+                    for text, time in zip(texts, times)]
+        to_process = [m for m in messages if m is not None]
+
+        if to_process:
+            for component in self.pipeline:
+                with self._timed(metrics.COMPONENT_BATCH_DURATION,
+                                 component):
+                    component.process_batch(to_process, **self.context)
+
+        return [self._output_for_message(m, only_output_properties)
+                if m is not None else self._empty_output()
+                for m in messages]
+
+    def _empty_output(self):
+        # type: () -> Dict[Text, Any]
+
+        output = self.default_output_attributes()
+        output["text"] = ""
+        return output
+
+    def _output_for_message(self, message, only_output_properties=True):
+        # type: (Message, bool) -> Dict[Text, Any]
 
         output = self.default_output_attributes()
         output.update(message.as_dict(
@@ -0,0 +1,172 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import logging
+import os
+import time
+from builtins import object
+from threading import Lock
+
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+from rasa_nlu import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_interpreter_size(interpreter):
+    # type: (Any) -> int
+    """Estimates the memory used by an interpreter in bytes.
+
+    Models are loaded more or less completely into memory, so the size of
+    the persisted model directory is used as an estimate."""
+
+    metadata = interpreter.model_metadata
+    model_dir = metadata.model_dir if metadata else None
+    if not model_dir or not os.path.isdir(model_dir):
+        return 0
+
+    size = 0
+    for root, _, files in os.walk(model_dir):
+        for f in files:
+            try:
+                size += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return size
+
+
+class ModelManager(object):
+    """Limits the interpreters loaded by all projects of the server.
+
+    If more than `max_models` interpreters are loaded or their estimated
+    size exceeds `max_bytes`, the least recently used interpreters are
+    unloaded. Projects load them again on the next request."""
+
+    def __init__(self, max_models=None, max_bytes=None):
+        # type: (Optional[int], Optional[int]) -> None
+
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._projects = {}  # type: Dict[Tuple[Text, Text], Any]
+        self._sizes = {}  # type: Dict[Tuple[Text, Text], int]
+        # written without locking, so parse requests don't need a lock
+        self._last_used = {}  # type: Dict[Tuple[Text, Text], float]
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(project, model_name):
+        # type: (Any, Text) -> Tuple[Text, Text]
+        return project.name, model_name
+
+    def touch(self, project, model_name):
+        # type: (Any, Text) -> None
+        """Marks a loaded model as used."""
+
+        key = self._key(project, model_name)
+        if key in self._sizes:
+            self._last_used[key] = time.time()
+
+    def register(self, project, model_name, interpreter):
+        # type: (Any, Text, Any) -> None
+        """Tracks a newly loaded model and evicts models if necessary."""
+
+        key = self._key(project, model_name)
+        size = estimate_interpreter_size(interpreter)
+
+        with self._lock:
+            self._projects[key] = project
+            self._sizes[key] = size
+            self._last_used[key] = time.time()
+            victims = self._select_victims(key)
+
+        for victim in victims:
+            self._evict(victim)
+
+    def forget(self, project, model_name):
+        # type: (Any, Text) -> None
+        """Stops tracking a model that got unloaded."""
+
+        key = self._key(project, model_name)
+        with self._lock:
+            self._projects.pop(key, None)
+            self._sizes.pop(key, None)
+            self._last_used.pop(key, None)
+
+    def _is_over_budget(self, count, size):
+        # type: (int, int) -> bool
+
+        if self.max_models is not None and count > self.max_models:
+            return True
+        return self.max_bytes is not None and size > self.max_bytes
+
+    def _select_victims(self, keep):
+        # type: (Tuple[Text, Text]) -> List[Tuple[Text, Text]]
+        """Picks the least recently used models to get below the budget.
+
+        The model that just got loaded is never evicted."""
+
+        count = len(self._sizes)
+        size = self.used_bytes()
+        candidates = sorted((k for k in self._sizes if k != keep),
+                            key=lambda k: self._last_used.get(k, 0))
+
+        victims = []
+        for key in candidates:
+            if not self._is_over_budget(count, size):
+                break
+            victims.append(key)
+            count -= 1
+            size -= self._sizes[key]
+
+        if self._is_over_budget(count, size):
+            logger.warning("Loaded models exceed the budget of {} models / "
+                           "{} bytes, model '{}' of project '{}' alone "
+                           "needs about {} bytes."
+                           "".format(self.max_models, self.max_bytes,
+                                     keep[1], keep[0], self._sizes[keep]))
+        return victims
+
+    def _evict(self, key):
+        # type: (Tuple[Text, Text]) -> None
+
+        project = self._projects.get(key)
+        if project is None:
+            return
+
+        logger.info("Unloading least recently used model '{}' of project "
+                    "'{}'.".format(key[1], key[0]))
+        try:
+            # unloading the model makes the project call `forget`
+            project.unload(key[1])
+        except KeyError:
+            self.forget(project, key[1])
+        self.evictions += 1
+        metrics.registry.inc(metrics.MODEL_EVICTIONS,
+                             labels={"project": key[0]})
+
+    def used_bytes(self):
+        # type: () -> int
+        return sum(self._sizes.values())
+
+    def as_dict(self):
+        # type: () -> Dict[Text, Any]
+
+        with self._lock:
+            residents = sorted(self._sizes,
+                               key=lambda k: self._last_used.get(k, 0),
+                               reverse=True)
+            return {"max_models": self.max_models,
+                    "max_bytes": self.max_bytes,
+                    "loaded_models": len(residents),
+                    "used_bytes": self.used_bytes(),
+                    "evictions": self.evictions,
+                    "residents": [{"project": project,
+                                   "model": model,
+                                   "bytes": self._sizes[(project, model)],
+                                   "last_used": self._last_used.get(
+                                           (project, model))}
+                                  for project, model in residents]}
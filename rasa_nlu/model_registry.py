@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import logging
+from builtins import object
+
+import six
+
+from typing import Iterable, List, Optional, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME_PREFIX = "model_"
+
+MODEL_TIMESTAMP_FORMAT = '%Y%m%d-%H%M%S'
+
+
+def model_timestamp(model_name):
+    # type: (Text) -> Optional[datetime.datetime]
+    """Returns the training time encoded in a model name (or `None`)."""
+
+    if (not isinstance(model_name, six.string_types) or
+            not model_name.startswith(MODEL_NAME_PREFIX)):
+        return None
+
+    try:
+        return datetime.datetime.strptime(model_name[len(MODEL_NAME_PREFIX):],
+                                          MODEL_TIMESTAMP_FORMAT)
+    except ValueError:
+        logger.debug("Model '{}' doesn't contain a valid timestamp."
+                     "".format(model_name))
+        return None
+
+
+class ModelRegistry(object):
+    """Index of the models of a project, sorted by their training time.
+
+    Model names are only parsed once, when they are added. Registries
+    are never changed, adding models returns a new registry. Hence, they
+    can be used by parse requests without any locking."""
+
+    def __init__(self, model_names=(), entries=None):
+        # type: (Iterable[Text], Optional[List[Tuple]]) -> None
+
+        self.names = frozenset(model_names)
+        if entries is None:
+            entries = sorted(self._entries_for(self.names))
+        self.entries = entries  # type: List[Tuple[datetime.datetime, Text]]
+        # name of the most recently trained model (or `None`)
+        self.latest = entries[-1][1] if entries else None
+
+    @staticmethod
+    def _entries_for(model_names):
+        # type: (Iterable[Text]) -> List[Tuple[datetime.datetime, Text]]
+
+        entries = []
+        for name in model_names:
+            timestamp = model_timestamp(name)
+            if timestamp is not None:
+                entries.append((timestamp, name))
+        return entries
+
+    def with_models(self, model_names):
+        # type: (Iterable[Text]) -> ModelRegistry
+        """Returns a registry that additionally contains the models."""
+
+        new_names = set(model_names) - self.names
+        if not new_names:
+            return self
+        entries = sorted(self.entries + self._entries_for(new_names))
+        return ModelRegistry(self.names | new_names, entries)
+
+    @staticmethod
+    def is_newer(model_name, than):
+        # type: (Text, Optional[Text]) -> bool
+        """Checks if a model got trained after another one."""
+
+        timestamp = model_timestamp(model_name)
+        other = model_timestamp(than) if than else None
+        if timestamp is None:
+            return False
+        return other is None or timestamp > other
+
+    def __contains__(self, model_name):
+        # type: (Text) -> bool
+        return model_name in self.names
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.names)
@@ -0,0 +1,178 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import logging
+import time
+from builtins import object
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+
+from typing import Any, Dict, List, Optional, Text
+
+from rasa_nlu import metrics
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_QUEUED = "queued"
+UPLOAD_RUNNING = "uploading"
+UPLOAD_COMPLETED = "completed"
+UPLOAD_FAILED = "failed"
+
+# finished uploads that are still reported by `as_dict`
+MAX_FINISHED_UPLOADS = 100
+
+
+class Upload(object):
+    """Upload of a trained model to the remote storage."""
+
+    def __init__(self, project, model_name, model_dir):
+        # type: (Text, Text, Text) -> None
+
+        self.project = project
+        self.model_name = model_name
+        self.model_dir = model_dir
+        self.status = UPLOAD_QUEUED
+        self.attempts = 0
+        self.error = None  # type: Optional[Text]
+        self.queued_at = time.time()
+        self.finished_at = None  # type: Optional[float]
+
+    def as_dict(self):
+        # type: () -> Dict[Text, Any]
+        return {"project": self.project,
+                "model": self.model_name,
+                "status": self.status,
+                "attempts": self.attempts,
+                "error": self.error,
+                "queued_at": self.queued_at,
+                "finished_at": self.finished_at}
+
+
+class ModelUploader(object):
+    """Uploads trained models to the remote storage in the background.
+
+    Compressing and uploading a model can take a while, so it is done on
+    a small thread pool after the training finished instead of inside
+    the training worker. Failed uploads are retried with an exponential
+    backoff."""
+
+    def __init__(self,
+                 storage,  # type: Text
+                 max_workers=2,  # type: int
+                 max_retries=3,  # type: int
+                 retry_delay=1.0  # type: float
+                 ):
+        # type: (...) -> None
+
+        self.storage = storage
+        self.max_retries = max(max_retries, 0)
+        self.retry_delay = retry_delay
+        self._pool = ThreadPoolExecutor(max(max_workers, 1))
+        self._stopped = Event()
+        self._uploads = OrderedDict()  # type: OrderedDict
+        self._lock = Lock()
+
+    def submit(self, project, model_name, model_dir):
+        # type: (Text, Text, Text) -> Any
+        """Queues the upload of a model, returns its future."""
+
+        upload = Upload(project, model_name, model_dir)
+        key = (project, model_name)
+        with self._lock:
+            # a model that is uploaded again moves to the end
+            self._uploads.pop(key, None)
+            self._uploads[key] = upload
+            self._forget_finished()
+        logger.debug("Queued upload of model '{}' of project '{}'."
+                     "".format(model_name, project))
+        return self._pool.submit(self._upload, upload)
+
+    def _upload(self, upload):
+        # type: (Upload) -> None
+
+        upload.status = UPLOAD_RUNNING
+        while True:
+            upload.attempts += 1
+            try:
+                self._persist(upload)
+            except Exception as e:
+                upload.error = str(e)
+                if (upload.attempts > self.max_retries or
+                        self._stopped.is_set()):
+                    self._finish(upload, UPLOAD_FAILED)
+                    logger.exception("Failed to upload model '{}' of "
+                                     "project '{}' after {} attempts."
+                                     "".format(upload.model_name,
+                                               upload.project,
+                                               upload.attempts))
+                    return
+                delay = self.retry_delay * 2 ** (upload.attempts - 1)
+                logger.warning("Failed to upload model '{}' of project "
+                               "'{}', retrying in {} seconds. {}"
+                               "".format(upload.model_name, upload.project,
+                                         delay, e))
+                # a shutdown only interrupts the waiting, not the upload
+                self._stopped.wait(delay)
+            else:
+                upload.error = None
+                self._finish(upload, UPLOAD_COMPLETED)
+                logger.info("Uploaded model '{}' of project '{}'."
+                            "".format(upload.model_name, upload.project))
+                return
+
+    def _persist(self, upload):
+        # type: (Upload) -> None
+
+        from rasa_nlu.persistor import get_persistor
+
+        p = get_persistor(self.storage)
+        if p is None:
+            raise ValueError("Unknown storage '{}'.".format(self.storage))
+        p.persist(upload.model_dir, upload.model_name, upload.project)
+
+    @staticmethod
+    def _finish(upload, status):
+        # type: (Upload, Text) -> None
+
+        upload.status = status
+        upload.finished_at = time.time()
+        metrics.registry.inc(metrics.MODEL_UPLOADS,
+                             labels={"status": status})
+
+    def _forget_finished(self):
+        # type: () -> None
+
+        finished = [key for key, upload in self._uploads.items()
+                    if upload.finished_at is not None]
+        for key in finished[:len(finished) - MAX_FINISHED_UPLOADS]:
+            del self._uploads[key]
+
+    def uploads(self):
+        # type: () -> List[Upload]
+        with self._lock:
+            return list(self._uploads.values())
+
+    def as_dict(self):
+        # type: () -> Dict[Text, Any]
+
+        uploads = self.uploads()
+        counts = {UPLOAD_QUEUED: 0, UPLOAD_RUNNING: 0,
+                  UPLOAD_COMPLETED: 0, UPLOAD_FAILED: 0}
+        for upload in uploads:
+            counts[upload.status] += 1
+        return {"queued": counts[UPLOAD_QUEUED],
+                "uploading": counts[UPLOAD_RUNNING],
+                "completed": counts[UPLOAD_COMPLETED],
+                "failed": counts[UPLOAD_FAILED],
+                "uploads": [u.as_dict() for u in uploads
+                            if u.status != UPLOAD_COMPLETED]}
+
+    def shutdown(self, wait=True):
+        # type: (bool) -> None
+        """Stops retrying and (optionally) waits for running uploads."""
+
+        self._stopped.set()
+        self._pool.shutdown(wait=wait)
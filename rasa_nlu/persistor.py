@@ -4,26 +4,114 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import io
+import json
 import logging
 import os
 import shutil
 import tarfile
+import tempfile
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
 import botocore
+from botocore.config import Config
 from builtins import object
-from typing import Optional, Tuple, List, Text
-
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple, List, Text
+
+from rasa_nlu import utils
+from rasa_nlu.artifact_cache import (
+    ArtifactCache, ChecksumMismatch, ChecksumWriter, DEFAULT_MAX_BYTES,
+    file_digest, md5_checksum)
+from rasa_nlu.circuit_breaker import CircuitBreaker
 from rasa_nlu.config import RasaNLUModelConfig
+from rasa_nlu.model_registry import model_timestamp
 
 logger = logging.getLogger(__name__)
 
+# seconds for which listings of projects and models are reused
+LISTING_TTL = 10
+
+# maximum number of pooled connections to the storage
+MAX_POOL_CONNECTIONS = 32
+
+# models are downloaded in chunks of this many bytes, large models using
+# parallel range requests. can be changed with the environment variables
+# `PERSISTOR_DOWNLOAD_CHUNK_SIZE` and `PERSISTOR_DOWNLOAD_WORKERS`.
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_WORKERS = 4
+
+# if `PERSISTOR_CACHE_DIR` or `PERSISTOR_CACHE_MAX_BYTES` is set, downloaded
+# archives are kept in a directory shared by all processes (this one, unless
+# `PERSISTOR_CACHE_DIR` is set). a maximum size of 0 disables the cache.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache",
+                                 "rasa_nlu", "models")
+
+# name of the stored object listing all projects and models
+MANIFEST_NAME = "_rasa_manifest.json"
+
+MANIFEST_VERSION = 1
+
+# with `PERSISTOR_DEDUPLICATE` set, the files of a model are stored as blobs
+# named after their sha256 hash (below this prefix) and a manifest per model
+# listing them, so files that didn't change are only stored once.
+BLOB_PREFIX = "_blobs/"
+
+MODEL_MANIFEST_EXTENSION = ".manifest.json"
+
+# environment variables configuring the persistors
+CONFIG_VARIABLES = {
+    'aws': ("BUCKET_NAME", "AWS_ENDPOINT_URL"),
+    'gcs': ("BUCKET_NAME",),
+    'azure': ("AZURE_CONTAINER", "AZURE_ACCOUNT_NAME", "AZURE_ACCOUNT_KEY"),
+}
+
+# environment variables configuring all persistors
+PERSISTOR_VARIABLES = ("PERSISTOR_DOWNLOAD_CHUNK_SIZE",
+                       "PERSISTOR_DOWNLOAD_WORKERS",
+                       "PERSISTOR_CACHE_DIR",
+                       "PERSISTOR_CACHE_MAX_BYTES",
+                       "PERSISTOR_DEDUPLICATE")
+
+_persistors = {}  # type: Dict[Tuple, Persistor]
+_persistors_lock = Lock()
+
+# cached listings of each persistor instance
+_listings = weakref.WeakKeyDictionary()
+_listings_lock = Lock()
+
+# serializes manifest updates of this process
+_manifest_lock = Lock()
+
 
 def get_persistor(name):
     # type: (Text) -> Optional[Persistor]
-    """Returns an instance of the requested persistor.
+    """Returns the shared instance of the requested persistor.
+
+    Currently, `aws`, `gcs` and `azure` are supported. Persistors are
+    created once per process and configuration, so their clients,
+    connection pools and bucket checks are reused by all threads."""
+
+    if name not in CONFIG_VARIABLES:
+        return None
+
+    variables = CONFIG_VARIABLES[name] + PERSISTOR_VARIABLES
+    key = ((name, os.getpid()) +
+           tuple(os.environ.get(v) for v in variables))
+
+    with _persistors_lock:
+        persistor = _persistors.get(key)
+        if persistor is None:
+            persistor = _create_persistor(name)
+            _persistors[key] = persistor
+        return persistor
 
-    Currently, `aws`, `gcs` and `azure` are supported"""
+
+def _create_persistor(name):
+    # type: (Text) -> Optional[Persistor]
 
     if name == 'aws':
         return AWSPersistor(os.environ.get("BUCKET_NAME"),
@@ -39,9 +127,130 @@ def get_persistor(name):
     return None
 
 
+class GuardedPersistor(object):
+    """Calls the persistor of a storage through a circuit breaker.
+
+    Used where calls to the storage would otherwise block requests: calls
+    that take longer than their timeout fail, and if the storage keeps
+    failing, calls are rejected right away for a while."""
+
+    def __init__(self,
+                 storage,  # type: Text
+                 timeout=None,  # type: Optional[float]
+                 download_timeout=None,  # type: Optional[float]
+                 failure_threshold=5,  # type: int
+                 reset_timeout=30  # type: float
+                 ):
+        # type: (...) -> None
+
+        self.storage = storage
+        self.timeout = timeout
+        self.download_timeout = download_timeout
+        self.breaker = CircuitBreaker("Storage '{}'".format(storage),
+                                      failure_threshold, reset_timeout)
+
+    def _persistor(self):
+        # type: () -> Persistor
+
+        p = get_persistor(self.storage)
+        if p is None:
+            raise RuntimeError("Unable to initialize persistor")
+        return p
+
+    def list_models(self, project):
+        # type: (Text) -> List[Text]
+        return self.breaker.call(
+                lambda: self._persistor().list_models(project,
+                                                      raise_errors=True),
+                self.timeout)
+
+    def list_projects(self):
+        # type: () -> List[Text]
+        return self.breaker.call(
+                lambda: self._persistor().list_projects(raise_errors=True),
+                self.timeout)
+
+    def has_model(self, model_name, project):
+        # type: (Text, Text) -> bool
+        return self.breaker.call(
+                lambda: self._persistor().has_model(model_name, project),
+                self.timeout)
+
+    def retrieve(self, model_name, project, target_path):
+        # type: (Text, Text, Text) -> None
+        self.breaker.call(
+                lambda: self._persistor().retrieve(model_name, project,
+                                                   target_path),
+                self.download_timeout)
+
+    def as_dict(self):
+        # type: () -> Dict[Text, Any]
+
+        status = self.breaker.as_dict()
+        status.update({"timeout": self.timeout,
+                       "download_timeout": self.download_timeout})
+        return status
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    # type: (Text, int) -> Text
+    """Returns the md5 checksum of a file (as hex string)."""
+
+    with io.open(path, "rb") as f:
+        return md5_checksum(f, chunk_size)
+
+
 class Persistor(object):
     """Store models in cloud and fetch them when needed"""
 
+    # seconds for which listings of projects and models are reused
+    listing_ttl = LISTING_TTL
+
+    download_chunk_size = DOWNLOAD_CHUNK_SIZE
+
+    download_workers = DOWNLOAD_WORKERS
+
+    # local cache of downloaded archives (or `None`)
+    artifact_cache = None  # type: Optional[ArtifactCache]
+
+    # store models as content addressed blobs instead of archives
+    deduplicate = False
+
+    def __init__(self):
+        self.download_chunk_size = int(os.environ.get(
+                "PERSISTOR_DOWNLOAD_CHUNK_SIZE", DOWNLOAD_CHUNK_SIZE))
+        self.download_workers = int(os.environ.get(
+                "PERSISTOR_DOWNLOAD_WORKERS", DOWNLOAD_WORKERS))
+        self.artifact_cache = self._create_artifact_cache()
+        self.deduplicate = (os.environ.get("PERSISTOR_DEDUPLICATE", "")
+                            .lower() in {"true", "1", "yes"})
+
+    @staticmethod
+    def _create_artifact_cache():
+        # type: () -> Optional[ArtifactCache]
+        """Creates the local cache of downloaded archives, if configured.
+
+        Without the cache, archives are streamed into the target
+        directory without being written to disk first."""
+
+        cache_dir = os.environ.get("PERSISTOR_CACHE_DIR")
+        max_bytes = os.environ.get("PERSISTOR_CACHE_MAX_BYTES")
+        if not cache_dir and not max_bytes:
+            return None
+
+        max_bytes = int(max_bytes) if max_bytes else DEFAULT_MAX_BYTES
+        if max_bytes <= 0:
+            return None
+
+        cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        try:
+            return ArtifactCache(cache_dir, max_bytes)
+        except (IOError, OSError) as e:
+            logger.warning("Failed to create the model cache in '{}', "
+                           "models will always be downloaded. {}"
+                           "".format(cache_dir, e))
+            return None
+
     def persist(self, model_directory, model_name, project):
         # type: (Text) -> None
         """Uploads a model persisted in the `target_dir` to cloud storage."""
@@ -50,36 +259,511 @@ class Persistor(object):
             raise ValueError("Target directory '{}' not "
                              "found.".format(model_directory))
 
-        file_key, tar_path = self._compress(
-                model_directory, model_name, project)
-        self._persist_tar(file_key, tar_path)
+        if self.deduplicate:
+            files = self._persist_blobs(model_directory, model_name, project)
+            entry = self._manifest_entry(model_name)
+            entry["size"] = sum(f["size"] for f in files.values())
+            entry["format"] = "blobs"
+        else:
+            file_key, tar_path = self._compress(
+                    model_directory, model_name, project)
+            try:
+                self._persist_tar(file_key, tar_path)
+                entry = self._manifest_entry(model_name, tar_path)
+            finally:
+                # every (retried) upload compresses the model again
+                shutil.rmtree(os.path.dirname(tar_path), ignore_errors=True)
+        self._add_to_manifest(model_name, project, entry)
+        self._invalidate_listings()
+
+    def _persist_blobs(self, model_directory, model_name, project):
+        # type: (Text, Text, Text) -> Dict[Text, Dict[Text, Any]]
+        """Uploads the files of a model that aren't stored yet as blobs
+        and stores the manifest of the model. Returns the model's files."""
+
+        files = {}
+        paths = {}
+        for root, _, filenames in os.walk(model_directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                relative = os.path.relpath(path, model_directory)
+                with io.open(path, "rb") as f:
+                    digest = file_digest(f, "sha256")
+                files[relative.replace(os.sep, "/")] = {
+                    "sha256": digest, "size": os.path.getsize(path)}
+                paths[digest] = path
+
+        missing = [digest for digest in paths
+                   if not self._object_exists(self._blob_key(digest))]
+        for digest in missing:
+            self._persist_tar(self._blob_key(digest), paths[digest])
+        logger.info("Uploaded {} of {} files of model '{}'."
+                    "".format(len(missing), len(files), model_name))
+
+        # written last, the model is only listed once all blobs exist
+        data = json.dumps({"version": MANIFEST_VERSION, "files": files},
+                          indent=2, sort_keys=True)
+        self._write_object(self._model_manifest_name(model_name, project),
+                           data.encode("utf-8"))
+        return files
+
+    @staticmethod
+    def _blob_key(digest):
+        # type: (Text) -> Text
+        return BLOB_PREFIX + digest
+
+    @staticmethod
+    def _model_manifest_name(model_name, project):
+        # type: (Text, Text) -> Text
+        return (Persistor._tar_name(model_name, project,
+                                    include_extension=False) +
+                MODEL_MANIFEST_EXTENSION)
+
+    def _object_exists(self, filename):
+        # type: (Text) -> bool
+        """Checks if a file is stored."""
+
+        raise NotImplementedError
 
     def retrieve(self, model_name, project, target_path):
-        # type: (Text) -> None
-        """Downloads a model that has been persisted to cloud storage."""
+        # type: (Text, Text, Text) -> None
+        """Downloads a model that has been persisted to cloud storage.
+
+        The local model cache is checked first. The archive (or the blobs
+        of a deduplicated model) are extracted into a temporary directory
+        next to `target_path`, which is renamed to `target_path` once the
+        model is complete. Partial downloads are removed."""
 
         tar_name = self._tar_name(model_name, project)
+        target_path = os.path.abspath(target_path)
+        parent_dir = os.path.dirname(target_path)
+        utils.create_dir(parent_dir)
+
+        # hidden, so the partial model isn't listed as a model
+        temp_dir = tempfile.mkdtemp(
+                prefix=".{}.".format(os.path.basename(target_path)),
+                suffix=".part", dir=parent_dir)
+        try:
+            files = None
+            if self.deduplicate:
+                files = self._read_model_manifest(model_name, project)
+            if files is not None:
+                self._retrieve_blobs(files, temp_dir)
+            else:
+                archive = self._open_archive(model_name, project, tar_name)
+                try:
+                    self._decompress(archive, temp_dir)
+                finally:
+                    archive.close()
+            self._move_into_place(temp_dir, target_path)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
 
-        self._retrieve_tar(tar_name)
-        self._decompress(tar_name, target_path)
+    def _read_model_manifest(self, model_name, project):
+        # type: (Text, Text) -> Optional[Dict[Text, Dict[Text, Any]]]
+        """Returns the files of a model stored as blobs (or `None`).
 
-    def list_models(self, project):
-        # type: (Text) -> List[Text]
-        """Lists all the trained models of a project."""
+        Errors are treated like a missing manifest, e.g. S3 denies access
+        to missing files if listing the bucket isn't allowed."""
+
+        try:
+            data = self._read_object(self._model_manifest_name(model_name,
+                                                               project))
+        except NotImplementedError:
+            return None
+        except Exception as e:
+            logger.debug("Failed to read the manifest of model '{}', "
+                         "retrieving its archive instead. {}"
+                         "".format(model_name, e))
+            return None
+        if data is None:
+            return None
+        return json.loads(data.decode("utf-8"))["files"]
+
+    def _retrieve_blobs(self, files, target_dir):
+        # type: (Dict[Text, Dict[Text, Any]], Text) -> None
+        """Downloads the files of a model, blobs in the local cache are
+        not downloaded again."""
+
+        for relative in files:
+            path = os.path.normpath(os.path.join(target_dir, relative))
+            if not path.startswith(os.path.join(target_dir, "")):
+                raise ValueError("Invalid file '{}' in model manifest."
+                                 "".format(relative))
+            utils.create_dir_for_file(path)
+
+        workers = max(min(self.download_workers, len(files)), 1)
+        with ThreadPoolExecutor(workers) as pool:
+            downloads = [pool.submit(self._retrieve_blob, info["sha256"],
+                                     os.path.join(target_dir, relative))
+                         for relative, info in files.items()]
+            for download in downloads:
+                download.result()
+
+    def _retrieve_blob(self, digest, path):
+        # type: (Text, Text) -> None
+
+        key = self._blob_key(digest)
+        with io.open(path, "wb") as f:
+            if self.artifact_cache is not None:
+                cached = self.artifact_cache.open_blob(
+                        digest, lambda blob: self._download(key, blob))
+                with cached:
+                    shutil.copyfileobj(cached, f)
+                return
+
+            writer = ChecksumWriter(f, "sha256")
+            self._download(key, writer)
+        if writer.hexdigest() != digest:
+            raise ChecksumMismatch("Downloaded blob '{}' has checksum {}."
+                                   "".format(digest, writer.hexdigest()))
+
+    @staticmethod
+    def _move_into_place(temp_dir, target_path):
+        # type: (Text, Text) -> None
+
+        try:
+            os.rename(temp_dir, target_path)
+        except OSError:
+            if not os.path.isdir(target_path):
+                raise
+            # someone else retrieved the model in the meantime
+            logger.debug("Model '{}' was already retrieved."
+                         "".format(target_path))
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _open_archive(self, model_name, project, tar_name):
+        # type: (Text, Text, Text) -> Any
+        """Opens the archive of a model from the local cache, downloading
+        it if necessary. Without cache, the download is streamed."""
+
+        if self.artifact_cache is None:
+            return self._open_stream(tar_name)
+
+        project = project or RasaNLUModelConfig.DEFAULT_PROJECT_NAME
+        return self.artifact_cache.open(
+                project, model_name,
+                self._model_checksum(model_name, project),
+                lambda f: self._download(tar_name, f))
+
+    def _download(self, filename, f):
+        # type: (Text, Any) -> None
+        """Writes a stored file to a file object."""
+
+        stream = self._open_stream(filename)
+        try:
+            shutil.copyfileobj(stream, f, self.download_chunk_size)
+        finally:
+            stream.close()
+
+    def _model_checksum(self, model_name, project):
+        # type: (Text, Text) -> Optional[Text]
+        """Returns the checksum of a model's archive from the manifest."""
+
+        manifest = self._load_manifest()
+        if manifest is None:
+            return None
+        entry = manifest.get(project, {}).get(model_name) or {}
+        return entry.get("checksum")
+
+    def _open_stream(self, filename):
+        # type: (Text) -> RangeReader
+        """Opens a stored file for reading, large files are downloaded
+        using parallel range requests."""
+
+        size = self._object_size(filename)
+        return RangeReader(lambda start, end: self._read_range(filename,
+                                                               start, end),
+                           size, self.download_chunk_size,
+                           self.download_workers)
+
+    def _object_size(self, filename):
+        # type: (Text) -> int
+        """Returns the size of a stored file in bytes."""
 
         raise NotImplementedError
 
-    def list_projects(self):
+    def _read_range(self, filename, start, end):
+        # type: (Text, int, int) -> bytes
+        """Downloads the bytes `start` to `end` (inclusive) of a file."""
+
+        raise NotImplementedError
+
+    def list_models(self, project, raise_errors=False):
+        # type: (Text, bool) -> List[Text]
+        """Lists all the trained models of a project.
+
+        The listing is reused for `listing_ttl` seconds."""
+
+        return self._cached_listing(
+                ("models", project), lambda: self._list_models(project),
+                "models of project '{}'".format(project), raise_errors)
+
+    def list_projects(self, raise_errors=False):
+        # type: (bool) -> List[Text]
+        """Lists all projects.
+
+        The listing is reused for `listing_ttl` seconds."""
+
+        return self._cached_listing(("projects",), self._list_projects,
+                                    "projects", raise_errors)
+
+    def _cached_listing(self, key, list_func, description,
+                        raise_errors=False):
+        # type: (Tuple, Callable[[], List[Text]], Text, bool) -> List[Text]
+        """Returns a cached listing or lists the storage.
+
+        Failed listings are not cached. They are logged and treated as
+        empty unless `raise_errors` is set."""
+
+        with _listings_lock:
+            cached = _listings.get(self, {}).get(key)
+        if cached is not None and time.time() - cached[0] < self.listing_ttl:
+            return list(cached[1])
+
+        listed_at = time.time()
+        try:
+            result = list_func()
+        except NotImplementedError:
+            raise
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.warning("Failed to list {} in {}. {}"
+                           "".format(description, type(self).__name__, e))
+            return []
+
+        with _listings_lock:
+            _listings.setdefault(self, {})[key] = (listed_at, result)
+        return list(result)
+
+    def _invalidate_listings(self):
+        # type: () -> None
+
+        with _listings_lock:
+            _listings.pop(self, None)
+
+    def _list_models(self, project):
+        # type: (Text) -> List[Text]
+
+        manifest = self._load_manifest()
+        if manifest is None:
+            return self._scan_models(project)
+        return sorted(manifest.get(project, {}))
+
+    def _list_projects(self):
         # type: () -> List[Text]
-        """Lists all projects."""
+
+        manifest = self._load_manifest()
+        if manifest is None:
+            return list({self._project_and_model_from_filename(filename)[0]
+                         for filename in self._list_filenames()
+                         if self._is_model_file(filename)})
+        return sorted(manifest)
+
+    def list_models_by_project(self):
+        # type: () -> Dict[Text, List[Text]]
+        """Lists the models of all projects with a single listing."""
+
+        manifest = self._load_manifest()
+        if manifest is None:
+            return self._scan_models_by_project()
+        return {project: sorted(models)
+                for project, models in manifest.items() if models}
+
+    def _scan_models(self, project):
+        # type: (Text) -> List[Text]
+        """Lists the models of a project without using the manifest."""
 
         raise NotImplementedError
 
-    def _retrieve_tar(self, filename):
-        # type: (Text) -> Text
-        """Downloads a model previously persisted to cloud storage."""
+    def _scan_models_by_project(self):
+        # type: () -> Dict[Text, List[Text]]
+        """Lists all stored models without using the manifest."""
 
-        raise NotImplementedError("")
+        models = {}
+        for filename in self._list_filenames():
+            if not self._is_model_file(filename):
+                continue
+            project, model = self._project_and_model_from_filename(filename)
+            if model:
+                models.setdefault(project, []).append(model)
+        return models
+
+    @staticmethod
+    def _is_model_file(filename):
+        # type: (Text) -> bool
+        """Checks if a stored file is a model archive or manifest."""
+
+        return (filename != MANIFEST_NAME and
+                not filename.startswith(BLOB_PREFIX))
+
+    def _load_manifest(self):
+        # type: () -> Optional[Dict[Text, Dict[Text, Dict]]]
+        """Returns the models of all projects listed in the manifest.
+
+        A missing or broken manifest is replaced by a full listing, which
+        isn't stored: the manifest is only written by `persist` and
+        `rebuild_manifest`, so read-only credentials are enough to list
+        models. Returns `None` if the storage can't be listed this way,
+        callers then list it themselves. The result is reused for
+        `listing_ttl`."""
+
+        with _listings_lock:
+            cached = _listings.get(self, {}).get(("manifest",))
+        if cached is not None and time.time() - cached[0] < self.listing_ttl:
+            return cached[1]
+
+        read_at = time.time()
+        try:
+            manifest = self._read_manifest()
+            if manifest is None:
+                manifest = self._scan_manifest()
+        except NotImplementedError:
+            return None
+        except Exception as e:
+            logger.warning("Failed to read the model manifest of {}, "
+                           "listing the storage instead. {}"
+                           "".format(type(self).__name__, e))
+            return None
+
+        with _listings_lock:
+            _listings.setdefault(self, {})[("manifest",)] = (read_at,
+                                                             manifest)
+        return manifest
+
+    def _read_manifest(self):
+        # type: () -> Optional[Dict[Text, Dict[Text, Dict]]]
+        """Reads the stored manifest, `None` if it is missing or broken."""
+
+        data = self._read_object(MANIFEST_NAME)
+        if data is None:
+            return None
+
+        try:
+            manifest = json.loads(data.decode("utf-8"))
+            if manifest.get("version") != MANIFEST_VERSION:
+                raise ValueError("unsupported version {}"
+                                 "".format(manifest.get("version")))
+            return manifest["projects"]
+        except (ValueError, KeyError, AttributeError) as e:
+            logger.warning("Ignoring broken model manifest. {}".format(e))
+            return None
+
+    def _write_manifest(self, manifest):
+        # type: (Dict[Text, Dict[Text, Dict]]) -> None
+
+        data = json.dumps({"version": MANIFEST_VERSION,
+                           "projects": manifest},
+                          indent=2, sort_keys=True)
+        self._write_object(MANIFEST_NAME, data.encode("utf-8"))
+
+    def rebuild_manifest(self):
+        # type: () -> Dict[Text, Dict[Text, Dict]]
+        """Lists all stored models and replaces the manifest.
+
+        Sizes and checksums are only known for models that got
+        persisted while the manifest existed."""
+
+        with _manifest_lock:
+            manifest = self._scan_manifest()
+            self._write_manifest(manifest)
+        logger.info("Rebuilt the model manifest of {} ({} projects)."
+                    "".format(type(self).__name__, len(manifest)))
+        return manifest
+
+    def _scan_manifest(self):
+        # type: () -> Dict[Text, Dict[Text, Dict]]
+
+        return {project: {model: self._manifest_entry(model)
+                          for model in models}
+                for project, models
+                in self._scan_models_by_project().items()}
+
+    def _add_to_manifest(self, model_name, project, entry):
+        # type: (Text, Text, Dict[Text, Any]) -> None
+        """Adds a persisted model to the manifest.
+
+        Failures are logged, the model has been stored nevertheless.
+        Persistors of other hosts might update the manifest at the same
+        time, models missing from it are found by `has_model`."""
+
+        project = project or RasaNLUModelConfig.DEFAULT_PROJECT_NAME
+        try:
+            with _manifest_lock:
+                manifest = self._read_manifest()
+                if manifest is None:
+                    # the full listing already contains the new model
+                    manifest = self._scan_manifest()
+                manifest.setdefault(project, {})[model_name] = entry
+                self._write_manifest(manifest)
+        except NotImplementedError:
+            pass
+        except Exception as e:
+            logger.warning("Failed to add model '{}' of project '{}' to the "
+                           "model manifest of {}. Call `rebuild_manifest` "
+                           "to list it. {}".format(model_name, project,
+                                                   type(self).__name__, e))
+
+    def has_model(self, model_name, project):
+        # type: (Text, Text) -> bool
+        """Checks if a model is stored.
+
+        A model the manifest doesn't list, e.g. because two hosts
+        updated the manifest at the same time, is looked up in the
+        storage and added to the manifest again."""
+
+        if model_name in self.list_models(project):
+            return True
+
+        try:
+            stored = (self._object_exists(self._tar_name(model_name,
+                                                         project)) or
+                      self._object_exists(self._model_manifest_name(
+                              model_name, project)))
+        except NotImplementedError:
+            return False
+
+        if stored:
+            logger.info("Model '{}' of project '{}' is missing from the "
+                        "model manifest, adding it.".format(model_name,
+                                                            project))
+            self._add_to_manifest(model_name, project,
+                                  self._manifest_entry(model_name))
+            self._invalidate_listings()
+        return stored
+
+    @staticmethod
+    def _manifest_entry(model_name, tar_path=None):
+        # type: (Text, Optional[Text]) -> Dict[Text, Any]
+
+        trained_at = model_timestamp(model_name)
+        entry = {"size": None,
+                 "checksum": None,
+                 "trained_at": trained_at.isoformat() if trained_at else None}
+        if tar_path is not None:
+            entry["size"] = os.path.getsize(tar_path)
+            entry["checksum"] = file_checksum(tar_path)
+        return entry
+
+    def _read_object(self, filename):
+        # type: (Text) -> Optional[bytes]
+        """Downloads a small stored file, `None` if it doesn't exist."""
+
+        raise NotImplementedError
+
+    def _write_object(self, filename, data):
+        # type: (Text, bytes) -> None
+        """Stores a small file."""
+
+        raise NotImplementedError
+
+    def _list_filenames(self):
+        # type: () -> List[Text]
+        """Lists the names of all stored files."""
+
+        raise NotImplementedError
 
     def _persist_tar(self, filekey, tarname):
         # type: (Text, Text) -> None
@@ -89,15 +773,21 @@ class Persistor(object):
 
     def _compress(self, model_directory, model_name, project):
         # type: (Text) -> Tuple[Text, Text]
-        """Creates a compressed archive and returns key and tar."""
-        import tempfile
+        """Creates a compressed archive and returns key and tar.
+
+        The archive is created in a new temporary directory, which the
+        caller has to remove."""
 
         dirpath = tempfile.mkdtemp()
         base_name = self._tar_name(model_name, project, include_extension=False)
-        tar_name = shutil.make_archive(os.path.join(dirpath, base_name),
-                                       'gztar',
-                                       root_dir=model_directory,
-                                       base_dir=".")
+        try:
+            tar_name = shutil.make_archive(os.path.join(dirpath, base_name),
+                                           'gztar',
+                                           root_dir=model_directory,
+                                           base_dir=".")
+        except Exception:
+            shutil.rmtree(dirpath, ignore_errors=True)
+            raise
         file_key = os.path.basename(tar_name)
         return file_key, tar_name
 
@@ -114,7 +804,8 @@ class Persistor(object):
 
         split = filename.split("___")
         if len(split) > 1:
-            model_name = split[1].replace(".tar.gz", "")
+            model_name = split[1].replace(".tar.gz", "").replace(
+                    MODEL_MANIFEST_EXTENSION, "")
             return split[0], model_name
         else:
             return split[0], ""
@@ -128,12 +819,12 @@ class Persistor(object):
                                     m=model_name, ext=ext)
 
     @staticmethod
-    def _decompress(compressed_path, target_path):
-        # type: (Text, Text) -> None
+    def _decompress(stream, target_path):
+        # type: (Any, Text) -> None
 
-        with tarfile.open(compressed_path, "r:gz") as tar:
-            tar.extractall(
-                target_path)  # project dir will be created if it not exists
+        # the archive is read sequentially, without seeking
+        with tarfile.open(fileobj=stream, mode="r|gz") as tar:
+            tar.extractall(target_path)
 
 
 class AWSPersistor(Persistor):
@@ -144,33 +835,32 @@ class AWSPersistor(Persistor):
     def __init__(self, bucket_name, endpoint_url=None):
         # type: (Text, Optional[Text]) -> None
         super(AWSPersistor, self).__init__()
-        self.s3 = boto3.resource('s3', endpoint_url=endpoint_url)
+        # unlike boto3 resources, clients can be shared between threads
+        self.s3 = boto3.client(
+                's3', endpoint_url=endpoint_url,
+                config=Config(max_pool_connections=MAX_POOL_CONNECTIONS))
         self._ensure_bucket_exists(bucket_name)
         self.bucket_name = bucket_name
-        self.bucket = self.s3.Bucket(bucket_name)
 
-    def list_models(self, project):
+    def _list_keys(self, prefix=""):
         # type: (Text) -> List[Text]
-        try:
-            prefix = self._project_prefix(project)
-            return [self._project_and_model_from_filename(obj.key)[1]
-                    for obj in self.bucket.objects.filter(Prefix=prefix)]
-        except Exception as e:
-            logger.warn("Failed to list models for project {} in "
-                        "AWS. {}".format(project, e))
-            return []
 
-    def list_projects(self):
+        paginator = self.s3.get_paginator('list_objects_v2')
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket_name,
+                                       Prefix=prefix):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return keys
+
+    def _scan_models(self, project):
+        # type: (Text) -> List[Text]
+
+        return [self._project_and_model_from_filename(key)[1]
+                for key in self._list_keys(self._project_prefix(project))]
+
+    def _list_filenames(self):
         # type: () -> List[Text]
-        try:
-            projects_set = {self._project_and_model_from_filename(obj.key)[0]
-                            for obj in self.bucket.objects.filter()}
-            return list(projects_set)
-        except Exception:
-            logger.exception("Failed to list projects in AWS bucket {}. "
-                             "Region: {}".format(self.bucket_name,
-                                                 self.aws_region))
-            return []
+        return self._list_keys()
 
     def _ensure_bucket_exists(self, bucket_name):
         bucket_config = {
@@ -185,15 +875,43 @@ class AWSPersistor(Persistor):
         # type: (Text, Text) -> None
         """Uploads a model persisted in the `target_dir` to s3."""
 
-        with open(tar_path, 'rb') as f:
-            self.s3.Object(self.bucket_name, file_key).put(Body=f)
+        self.s3.upload_file(tar_path, self.bucket_name, file_key)
 
-    def _retrieve_tar(self, target_filename):
-        # type: (Text) -> None
-        """Downloads a model that has previously been persisted to s3."""
+    def _read_object(self, filename):
+        # type: (Text) -> Optional[bytes]
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name,
+                                          Key=filename)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return response['Body'].read()
+
+    def _write_object(self, filename, data):
+        # type: (Text, bytes) -> None
+        self.s3.put_object(Bucket=self.bucket_name, Key=filename, Body=data)
+
+    def _object_exists(self, filename):
+        # type: (Text) -> bool
+        try:
+            self.s3.head_object(Bucket=self.bucket_name, Key=filename)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return False
+            raise
+        return True
+
+    def _object_size(self, filename):
+        # type: (Text) -> int
+        return self.s3.head_object(Bucket=self.bucket_name,
+                                   Key=filename)['ContentLength']
 
-        with io.open(target_filename, 'wb') as f:
-            self.bucket.download_fileobj(target_filename, f)
+    def _read_range(self, filename, start, end):
+        # type: (Text, int, int) -> bytes
+        response = self.s3.get_object(Bucket=self.bucket_name, Key=filename,
+                                      Range="bytes={}-{}".format(start, end))
+        return response['Body'].read()
 
 
 class GCSPersistor(Persistor):
@@ -212,31 +930,17 @@ class GCSPersistor(Persistor):
         self.bucket_name = bucket_name
         self.bucket = self.storage_client.bucket(bucket_name)
 
-    def list_models(self, project):
+    def _scan_models(self, project):
         # type: (Text) -> List[Text]
 
-        try:
-            blob_iterator = self.bucket.list_blobs(
-                    prefix=self._project_prefix(project))
-            return [self._project_and_model_from_filename(b.name)[1]
-                    for b in blob_iterator]
-        except Exception as e:
-            logger.warn("Failed to list models for project {} in "
-                        "google cloud storage. {}".format(project, e))
-            return []
+        blob_iterator = self.bucket.list_blobs(
+                prefix=self._project_prefix(project))
+        return [self._project_and_model_from_filename(b.name)[1]
+                for b in blob_iterator]
 
-    def list_projects(self):
+    def _list_filenames(self):
         # type: () -> List[Text]
-
-        try:
-            blob_iterator = self.bucket.list_blobs()
-            projects_set = {self._project_and_model_from_filename(b.name)[0]
-                            for b in blob_iterator}
-            return list(projects_set)
-        except Exception as e:
-            logger.warning("Failed to list projects in "
-                           "google cloud storage. {}".format(e))
-            return []
+        return [b.name for b in self.bucket.list_blobs()]
 
     def _ensure_bucket_exists(self, bucket_name):
         from google.cloud import exceptions
@@ -254,12 +958,32 @@ class GCSPersistor(Persistor):
         blob = self.bucket.blob(file_key)
         blob.upload_from_filename(tar_path)
 
-    def _retrieve_tar(self, target_filename):
-        # type: (Text) -> None
-        """Downloads a model that has previously been persisted to GCS."""
+    def _read_object(self, filename):
+        # type: (Text) -> Optional[bytes]
+        blob = self.bucket.get_blob(filename)
+        return blob.download_as_string() if blob is not None else None
+
+    def _write_object(self, filename, data):
+        # type: (Text, bytes) -> None
+        self.bucket.blob(filename).upload_from_string(
+                data, content_type="application/json")
+
+    def _object_exists(self, filename):
+        # type: (Text) -> bool
+        return self.bucket.blob(filename).exists()
 
-        blob = self.bucket.blob(target_filename)
-        blob.download_to_filename(target_filename)
+    def _object_size(self, filename):
+        # type: (Text) -> int
+        blob = self.bucket.get_blob(filename)
+        if blob is None:
+            raise ValueError("File '{}' not found in bucket '{}'."
+                             "".format(filename, self.bucket_name))
+        return blob.size
+
+    def _read_range(self, filename, start, end):
+        # type: (Text, int, int) -> bytes
+        return self.bucket.blob(filename).download_as_string(start=start,
+                                                             end=end)
 
 
 class AzurePersistor(Persistor):
@@ -289,36 +1013,20 @@ class AzurePersistor(Persistor):
         if not exists:
             self.blob_client.create_container(container_name)
 
-    def list_models(self, project):
+    def _scan_models(self, project):
         # type: (Text) -> List[Text]
 
-        try:
-            blob_iterator = self.blob_client.list_blobs(
-                 self.container_name,
-                 prefix=self._project_prefix(project)
-            )
-            return [self._project_and_model_from_filename(b.name)[1]
-                    for b in blob_iterator]
-        except Exception as e:
-            logger.warning("Failed to list models for project {} in "
-                           "azure blob storage. {}".format(project, e))
-            return []
+        blob_iterator = self.blob_client.list_blobs(
+             self.container_name,
+             prefix=self._project_prefix(project)
+        )
+        return [self._project_and_model_from_filename(b.name)[1]
+                for b in blob_iterator]
 
-    def list_projects(self):
+    def _list_filenames(self):
         # type: () -> List[Text]
-
-        try:
-            blob_iterator = self.blob_client.list_blobs(
-                self.container_name,
-                prefix=None
-            )
-            projects_set = {self._project_and_model_from_filename(b.name)[0]
-                            for b in blob_iterator}
-            return list(projects_set)
-        except Exception as e:
-            logger.warning("Failed to list projects in "
-                           "Azure. {}".format(e))
-            return []
+        return [b.name for b in self.blob_client.list_blobs(
+                self.container_name, prefix=None)]
 
     def _persist_tar(self, file_key, tar_path):
         # type: (Text, Text) -> None
@@ -330,12 +1038,114 @@ class AzurePersistor(Persistor):
              tar_path
         )
 
-    def _retrieve_tar(self, target_filename):
-        # type: (Text) -> None
-        """Downloads a model that has previously been persisted to Azure."""
+    def _read_object(self, filename):
+        # type: (Text) -> Optional[bytes]
+        if not self.blob_client.exists(self.container_name, filename):
+            return None
+        return self.blob_client.get_blob_to_bytes(self.container_name,
+                                                  filename).content
 
-        self.blob_client.get_blob_to_path(
-             self.container_name,
-             target_filename,
-             target_filename
-        )
+    def _write_object(self, filename, data):
+        # type: (Text, bytes) -> None
+        self.blob_client.create_blob_from_bytes(self.container_name,
+                                                filename, data)
+
+    def _object_exists(self, filename):
+        # type: (Text) -> bool
+        return self.blob_client.exists(self.container_name, filename)
+
+    def _object_size(self, filename):
+        # type: (Text) -> int
+        blob = self.blob_client.get_blob_properties(self.container_name,
+                                                    filename)
+        return blob.properties.content_length
+
+    def _read_range(self, filename, start, end):
+        # type: (Text, int, int) -> bytes
+        return self.blob_client.get_blob_to_bytes(self.container_name,
+                                                  filename,
+                                                  start_range=start,
+                                                  end_range=end).content
+
+
+class RangeReader(object):
+    """Read only file object downloading a stored file in chunks.
+
+    Up to `workers` chunks are downloaded in parallel ahead of the
+    reader, so at most that many chunks are kept in memory."""
+
+    def __init__(self,
+                 read_range,  # type: Callable[[int, int], bytes]
+                 size,  # type: int
+                 chunk_size=DOWNLOAD_CHUNK_SIZE,  # type: int
+                 workers=DOWNLOAD_WORKERS  # type: int
+                 ):
+        # type: (...) -> None
+
+        chunk_size = max(chunk_size, 1)
+        self._read_range = read_range
+        self._ranges = deque((start, min(start + chunk_size, size) - 1)
+                             for start in range(0, size, chunk_size))
+        self._workers = max(min(workers, len(self._ranges)), 1)
+        if self._workers > 1:
+            self._pool = ThreadPoolExecutor(self._workers)
+        else:
+            self._pool = None
+        self._pending = deque()
+        self._chunk = b""
+        self._position = 0
+        self._schedule()
+
+    def _schedule(self):
+        if self._pool is None:
+            return
+
+        while self._ranges and len(self._pending) < self._workers:
+            start, end = self._ranges.popleft()
+            self._pending.append(self._pool.submit(self._read_range,
+                                                   start, end))
+
+    def _next_chunk(self):
+        # type: () -> bytes
+
+        if self._pool is None:
+            return self._read_range(*self._ranges.popleft())
+
+        future = self._pending.popleft()
+        self._schedule()
+        return future.result()
+
+    def _has_more(self):
+        # type: () -> bool
+        return bool(self._ranges or self._pending)
+
+    def read(self, size=-1):
+        # type: (int) -> bytes
+
+        parts = []
+        remaining = size
+        while remaining != 0:
+            if self._position >= len(self._chunk):
+                if not self._has_more():
+                    break
+                self._chunk = self._next_chunk()
+                self._position = 0
+
+            if remaining < 0:
+                end = len(self._chunk)
+            else:
+                end = min(self._position + remaining, len(self._chunk))
+                remaining -= end - self._position
+            parts.append(self._chunk[self._position:end])
+            self._position = end
+        return b"".join(parts)
+
+    def close(self):
+        # type: () -> None
+
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._ranges.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
@@ -8,71 +8,109 @@ import glob
 
 import os
 import logging
+import time
 
 from builtins import object
-from threading import Lock
+from concurrent.futures import Future
+from threading import Lock, Thread
 
-from rasa_nlu import utils
-from typing import Text, List
+from rasa_nlu import metrics, utils
+from rasa_nlu.cache import NegativeCache
+from rasa_nlu.circuit_breaker import CircuitBreakerError
+from typing import (
+    Any, Callable, Dict, List, Optional, Set, Text, Tuple)
 
 from rasa_nlu.classifiers.keyword_intent_classifier import \
     KeywordIntentClassifier
 from rasa_nlu.model import Metadata, Interpreter
+from rasa_nlu.model_registry import ModelRegistry
 
 logger = logging.getLogger(__name__)
 
-MODEL_NAME_PREFIX = "model_"
-
 FALLBACK_MODEL_NAME = "fallback"
 
+# text parsed with a newly loaded model before it serves requests
+WARM_UP_TEXT = "hello"
+
 
 class Project(object):
+    # names of models that couldn't be found (shared by all projects)
+    unknown_models = None  # type: Optional[NegativeCache]
+
+    # minimum seconds between searches for models requested by name
+    min_search_interval = 0
+
+    _last_model_search = 0.0
+
+    _warming_up = frozenset()  # type: Set[Text]
+
+    remote_storage = None
+
+    # persistor calls with timeouts and a circuit breaker (or `None`)
+    guarded_persistor = None
+
     def __init__(self,
                  component_builder=None,
                  project=None,
                  project_dir=None,
-                 remote_storage=None):
+                 remote_storage=None,
+                 parse_cache=None,
+                 model_manager=None,
+                 unknown_models=None,
+                 min_search_interval=0,
+                 cloud_models=None,
+                 guarded_persistor=None):
         self._component_builder = component_builder
-        self._models = {}
+        # the model map is never modified in place, changes replace it
+        # with an updated copy. parse requests can therefore use it
+        # without any locking.
+        self._models = {}  # type: Dict[Text, Optional[Interpreter]]
+        self._models_lock = Lock()
+        # index of the model names, replaced together with the model map
+        self._registry = ModelRegistry()
         self.status = 0
-        self._reader_lock = Lock()
         self._loader_lock = Lock()
-        self._writer_lock = Lock()
-        self._readers_count = 0
+        self._loading = {}  # type: Dict[Text, Future]
+        self._warming_up = set()
+        self._warm_up_lock = Lock()
         self._path = None
         self._project = project
         self.remote_storage = remote_storage
+        self.parse_cache = parse_cache
+        self.model_manager = model_manager
+        self.unknown_models = unknown_models
+        self.min_search_interval = min_search_interval
+        # models in the cloud, if they were already listed by the caller
+        self._cloud_models = cloud_models  # type: Optional[List[Text]]
+        self.guarded_persistor = guarded_persistor
+        # models seen by the last `sync_models` (`None` before the first)
+        self._synced_models = None  # type: Optional[Set[Text]]
 
         if project and project_dir:
             self._path = os.path.join(project_dir, project)
         self._search_for_models()
 
-    def _begin_read(self):
-        # Readers-writer lock basic double mutex implementation
-        self._reader_lock.acquire()
-        self._readers_count += 1
-        if self._readers_count == 1:
-            self._writer_lock.acquire()
-        self._reader_lock.release()
-
-    def _end_read(self):
-        self._reader_lock.acquire()
-        self._readers_count -= 1
-        if self._readers_count == 0:
-            self._writer_lock.release()
-        self._reader_lock.release()
+    @property
+    def name(self):
+        # type: () -> Optional[Text]
+        return self._project
+
+    def _set_models(self, updates):
+        # type: (Dict[Text, Optional[Interpreter]]) -> None
+        """Replaces the model map with a copy containing the updates."""
+
+        with self._models_lock:
+            models = dict(self._models)
+            models.update(updates)
+            self._models = models
+            self._registry = self._registry.with_models(models)
 
     def _load_local_model(self, requested_model_name=None):
         if requested_model_name is None:  # user want latest model
-            # NOTE: for better parse performance, currently although
-            # user may want latest model by set requested_model_name
-            # explicitly to None, we are not refresh model list
-            # from local and cloud which is pretty slow.
-            # User can specific requested_model_name to the latest model name,
-            # then model will be cached, this is a kind of workaround to
-            # refresh latest project model.
-            # BTW if refresh function is wanted, maybe add implement code to
-            # `_latest_project_model()` is a good choice.
+            # NOTE: for better parse performance, the model list is not
+            # refreshed from local and cloud here, which is pretty slow.
+            # New models are picked up when they are trained, when they
+            # are requested by name or by the periodic `refresh_models`.
 
             logger.debug("No model specified. Using default")
             return self._latest_project_model()
@@ -90,112 +128,417 @@ class Project(object):
         if local_model:
             return local_model
 
+        # a model that is warming up (e.g. it was just trained) is known,
+        # the request waits until it is loaded
+        if requested_model_name in self._warming_up:
+            return requested_model_name
+
+        # the model was requested before and couldn't be found
+        if self._is_unknown_model(requested_model_name):
+            logger.debug("Unknown model requested. Using default")
+            return self._latest_project_model()
+
         # now model not exists in model list cache
-        # refresh model list from local and cloud
+        # refresh model list from local and cloud. as listing the cloud
+        # storage is slow, the search is rate limited.
+        if time.time() - self._last_model_search >= self.min_search_interval:
+            self.refresh_models()
 
-        # NOTE: if a malicious user sent lots of requests
-        # with not existing model will cause performance issue.
-        # because get anything from cloud is a time-consuming task
-        self._search_for_models()
+            # retry after re-fresh model cache
+            local_model = self._load_local_model(requested_model_name)
+            if local_model:
+                return local_model
 
-        # retry after re-fresh model cache
-        local_model = self._load_local_model(requested_model_name)
-        if local_model:
-            return local_model
+            if self._find_model_in_cloud(requested_model_name):
+                return requested_model_name
+
+            if self.unknown_models is not None:
+                self.unknown_models.add((self._project, requested_model_name))
 
         # still not found user specified model
         logger.warn("Invalid model requested. Using default")
         return self._latest_project_model()
 
-    def parse(self, text, time=None, requested_model_name=None):
-        self._begin_read()
+    def _is_unknown_model(self, model_name):
+        # type: (Text) -> bool
+        return (self.unknown_models is not None and
+                (self._project, model_name) in self.unknown_models)
 
-        model_name = self._dynamic_load_model(requested_model_name)
+    def _ensure_model_loaded(self, model_name):
+        # type: (Text) -> bool
+        """Loads the interpreter of a model if it isn't loaded yet.
+
+        Returns `True` if the model got loaded by this call."""
+
+        return self._loaded_interpreter(model_name)[1]
+
+    def _loaded_interpreter(self, model_name):
+        # type: (Text) -> Tuple[Interpreter, bool]
+        """Returns the interpreter of a model, loads it if necessary.
+
+        Loaded models don't require any locking. The returned flag is
+        `True` if the model got loaded by this call."""
+
+        interpreter = self._models.get(model_name)
+        if interpreter is not None:
+            if self.model_manager is not None:
+                self.model_manager.touch(self, model_name)
+            return interpreter, False
+
+        return self._load_once(model_name, self._load_interpreter)
+
+    def _load_once(self, model_name, load):
+        # type: (Text, Callable[[Text], Any]) -> Tuple[Interpreter, bool]
+        """Loads a model by calling `load` unless it is loaded already.
+
+        Concurrent calls for a model that is being loaded (by a request or
+        a warm-up) wait for that load instead of loading the model again.
+        The returned flag is `True` if the model got loaded by this call."""
+
+        with self._loader_lock:
+            interpreter = self._models.get(model_name)
+            if interpreter is not None:
+                return interpreter, False
+
+            future = self._loading.get(model_name)
+            is_loader = future is None
+            if is_loader:
+                future = Future()
+                self._loading[model_name] = future
+
+        if not is_loader:
+            # raises the error of the load we waited for
+            return future.result(), False
 
-        self._loader_lock.acquire()
         try:
-            if not self._models.get(model_name):
-                interpreter = self._interpreter_for_model(model_name)
-                self._models[model_name] = interpreter
+            interpreter = load(model_name)
+            future.set_result(interpreter)
+            return interpreter, True
+        except Exception as e:
+            future.set_exception(e)
+            raise
         finally:
-            self._loader_lock.release()
+            with self._loader_lock:
+                del self._loading[model_name]
+
+    def _load_interpreter(self, model_name):
+        # type: (Text) -> Interpreter
+
+        interpreter = self._interpreter_for_model(model_name)
+        self._set_models({model_name: interpreter})
+        self._register_loaded_model(model_name, interpreter)
+        return interpreter
+
+    def _cached_response(self, interpreter, model_name, text, time):
+        # type: (Interpreter, Text, Text, Any) -> Optional[Dict[Text, Any]]
+
+        if self.parse_cache is None:
+            return None
+
+        return self.parse_cache.get(self._project, model_name, text, time,
+                                    interpreter.is_time_dependent)
+
+    def _cache_response(self, interpreter, model_name, text, time, response):
+        # type: (Interpreter, Text, Text, Any, Dict[Text, Any]) -> None
 
-        response = self._models[model_name].parse(text, time)
-        response['project'] = self._project
-        response['model'] = model_name
+        if self.parse_cache is not None:
+            self.parse_cache.put(self._project, model_name, text, response,
+                                 time, interpreter.is_time_dependent)
 
-        self._end_read()
+    def _serving_interpreter(self, model_name):
+        # type: (Text) -> Tuple[Text, Interpreter]
+        """Returns the name and interpreter of the model to use.
+
+        If the model needs to be downloaded but the storage is unavailable,
+        the latest model that is available locally is used instead."""
+
+        try:
+            return model_name, self._loaded_interpreter(model_name)[0]
+        except CircuitBreakerError as e:
+            local_model = self._latest_local_model()
+            if local_model is None or local_model == model_name:
+                raise
+            logger.warning("Using model '{}' of project '{}' instead of "
+                           "'{}'. {}".format(local_model, self._project,
+                                             model_name, e))
+            return local_model, self._loaded_interpreter(local_model)[0]
+
+    def _latest_local_model(self):
+        # type: () -> Optional[Text]
+        """Returns the latest model that is loaded or stored locally."""
+
+        models = self._models
+        for _, model_name in reversed(self._registry.entries):
+            if models.get(model_name) is not None:
+                return model_name
+            if self._path and os.path.isdir(os.path.join(self._path,
+                                                         model_name)):
+                return model_name
+        return None
+
+    def parse(self, text, time=None, requested_model_name=None):
+        model_name = self._dynamic_load_model(requested_model_name)
+
+        model_name, interpreter = self._serving_interpreter(model_name)
+
+        response = self._cached_response(interpreter, model_name, text, time)
+        if response is None:
+            response = interpreter.parse(text, time)
+            response['project'] = self._project
+            response['model'] = model_name
+            self._cache_response(interpreter, model_name, text, time,
+                                 response)
 
         return response
 
+    def parse_batch(self, texts, times=None, requested_model_name=None):
+        # type: (List[Text], Optional[List[Any]], Optional[Text]) -> List[Dict]
+        """Parses a list of texts with a single batch call to the
+        interpreter of the requested model."""
+
+        if times is None:
+            times = [None] * len(texts)
+        elif len(times) != len(texts):
+            raise ValueError("Number of times ({}) does not match the number "
+                             "of texts ({}).".format(len(times), len(texts)))
+
+        model_name = self._dynamic_load_model(requested_model_name)
+
+        model_name, interpreter = self._serving_interpreter(model_name)
+
+        responses = [self._cached_response(interpreter, model_name, text, time)
+                     for text, time in zip(texts, times)]
+
+        # only texts without a cached response need to be parsed
+        missing = [idx for idx, r in enumerate(responses) if r is None]
+        if missing:
+            parsed = interpreter.parse_batch([texts[idx] for idx in missing],
+                                             [times[idx] for idx in missing])
+
+            for idx, response in zip(missing, parsed):
+                response['project'] = self._project
+                response['model'] = model_name
+                self._cache_response(interpreter, model_name, texts[idx],
+                                     times[idx], response)
+                responses[idx] = response
+
+        return responses
+
     def load_model(self):
-        self._begin_read()
-        status = False
         model_name = self._dynamic_load_model()
         logger.debug('Loading model %s', model_name)
 
-        self._loader_lock.acquire()
-        try:
-            if not self._models.get(model_name):
-                interpreter = self._interpreter_for_model(model_name)
-                self._models[model_name] = interpreter
-                status = True
-        finally:
-            self._loader_lock.release()
+        return self._ensure_model_loaded(model_name)
 
-        self._end_read()
+    def update(self, model_name):
+        """Adds a newly trained model to the project.
 
-        return status
+        The model is loaded in the background, until it is ready requests
+        are served by the previous model."""
 
-    def update(self, model_name):
-        self._writer_lock.acquire()
-        self._models[model_name] = None
-        self._writer_lock.release()
+        self._warm_up_in_background(model_name)
         self.status = 0
 
-    def unload(self, model_name):
-        self._writer_lock.acquire()
+    def _warm_up_in_background(self, model_name):
+        # type: (Text) -> None
+
+        with self._warm_up_lock:
+            if model_name in self._warming_up:
+                return
+            self._warming_up.add(model_name)
+
+        # the model might have been requested before it existed
+        if self.unknown_models is not None:
+            self.unknown_models.discard((self._project, model_name))
+
+        thread = Thread(target=self._warm_up, args=(model_name,),
+                        name="warm-up-{}".format(model_name))
+        thread.daemon = True
+        thread.start()
+
+    def _warm_up(self, model_name):
+        # type: (Text) -> None
+        """Loads a model and switches to it once it is ready."""
+
         try:
-            del self._models[model_name]
-            self._models[model_name] = None
-            return model_name
+            _, loaded = self._load_once(model_name,
+                                        self._warmed_up_interpreter)
+            if loaded:
+                logger.info("Loaded model '{}' of project '{}'."
+                            "".format(model_name, self._project))
+        except Exception:
+            logger.exception("Failed to load model '{}' of project '{}'. "
+                             "Still using the previous model."
+                             "".format(model_name, self._project))
         finally:
-            self._writer_lock.release()
+            with self._warm_up_lock:
+                self._warming_up.discard(model_name)
+
+    def _warmed_up_interpreter(self, model_name):
+        # type: (Text) -> Interpreter
+
+        interpreter = self._interpreter_for_model(model_name)
+        # the first parse initializes lazily loaded resources
+        interpreter.parse(WARM_UP_TEXT)
+        self._activate_model(model_name, interpreter)
+        return interpreter
+
+    def _activate_model(self, model_name, interpreter):
+        # type: (Text, Interpreter) -> None
+
+        self._set_models({model_name: interpreter})
+        self._invalidate_cached_responses(model_name)
+        self._register_loaded_model(model_name, interpreter)
+
+    def _register_loaded_model(self, model_name, interpreter):
+        # type: (Text, Interpreter) -> None
+
+        if self.model_manager is not None:
+            self.model_manager.register(self, model_name, interpreter)
+
+    def unload(self, model_name):
+        with self._models_lock:
+            if model_name not in self._models:
+                raise KeyError(model_name)
+            models = dict(self._models)
+            models[model_name] = None
+            self._models = models
+
+        self._invalidate_cached_responses(model_name)
+        if self.model_manager is not None:
+            self.model_manager.forget(self, model_name)
+        return model_name
+
+    def _invalidate_cached_responses(self, model_name):
+        # type: (Text) -> None
+
+        if self.parse_cache is not None:
+            self.parse_cache.invalidate(self._project, model_name)
 
     def _latest_project_model(self):
         """Retrieves the latest trained model for an project"""
 
-        models = {model[len(MODEL_NAME_PREFIX):]: model
-                  for model in self._models.keys()
-                  if model.startswith(MODEL_NAME_PREFIX)}
-        if models:
-            time_list = [datetime.datetime.strptime(time, '%Y%m%d-%H%M%S')
-                         for time, model in models.items()]
-            return models[max(time_list).strftime('%Y%m%d-%H%M%S')]
-        else:
-            return FALLBACK_MODEL_NAME
+        return self._registry.latest or FALLBACK_MODEL_NAME
+
+    def latest_model_trained_at(self):
+        # type: () -> Optional[datetime.datetime]
+        """Training time of the latest model (`None` if there is none)."""
+
+        entries = self._registry.entries
+        return entries[-1][0] if entries else None
 
     def _fallback_model(self):
         meta = Metadata({"pipeline": [{
             "name": "intent_classifier_keyword",
             "class": utils.module_path_from_object(KeywordIntentClassifier())
         }]}, "")
-        return Interpreter.create(meta, self._component_builder)
+        interpreter = Interpreter.create(meta, self._component_builder)
+        self._set_metric_labels(interpreter, FALLBACK_MODEL_NAME)
+        return interpreter
+
+    def _set_metric_labels(self, interpreter, model_name):
+        # type: (Interpreter, Text) -> None
+        interpreter.metric_labels = self._metric_labels(model_name)
+
+    def _metric_labels(self, model_name):
+        # type: (Text) -> Dict[Text, Text]
+
+        known_models = set(self._models) | self._warming_up
+        known_models.add(FALLBACK_MODEL_NAME)
+        return {"project": self._project or "",
+                "model": metrics.known_label(model_name, known_models)}
+
+    def refresh_models(self):
+        # type: () -> None
+        """Searches the project directory and the cloud for new models."""
+
+        self._last_model_search = time.time()
+        self._search_for_models()
+
+    def sync_models(self, warm_up=False):
+        # type: (bool) -> List[Text]
+        """Downloads new models from the cloud storage to the project dir.
+
+        Models that appeared since the last sync and the latest model
+        are downloaded, so requests don't have to wait for them. With
+        `warm_up`, a downloaded latest model that isn't loaded yet gets
+        loaded as well. Returns the names of the downloaded models."""
+
+        self.refresh_models()
+        if not self.remote_storage or not self._path:
+            return []
+
+        registry = self._registry
+        if self._synced_models is None:
+            candidates = set()
+        else:
+            candidates = set(registry.names - self._synced_models)
+        self._synced_models = registry.names
+        if registry.latest:
+            candidates.add(registry.latest)
+
+        downloaded = []
+        failed = []
+        for model_name in sorted(candidates):
+            path = os.path.join(self._path, model_name)
+            # models that are warming up are downloaded by their loader
+            if os.path.isdir(path) or model_name in self._warming_up:
+                continue
+            try:
+                self._load_model_from_cloud(model_name, path)
+            except Exception:
+                logger.exception("Failed to download model '{}' of project "
+                                 "'{}'.".format(model_name, self._project))
+                metrics.registry.inc(metrics.MODEL_PREFETCHES,
+                                     labels={"status": "failed"})
+                failed.append(model_name)
+                continue
+            logger.info("Downloaded model '{}' of project '{}'."
+                        "".format(model_name, self._project))
+            metrics.registry.inc(metrics.MODEL_PREFETCHES,
+                                 labels={"status": "downloaded"})
+            downloaded.append(model_name)
+
+        # failed downloads are retried by the next sync
+        self._synced_models = self._synced_models.difference(failed)
+
+        if (warm_up and registry.latest in downloaded and
+                self._models.get(registry.latest) is None):
+            self._warm_up_in_background(registry.latest)
+        return downloaded
 
     def _search_for_models(self):
         model_names = (self._list_models_in_dir(self._path) +
                        self._list_models_in_cloud())
         if not model_names:
             if FALLBACK_MODEL_NAME not in self._models:
-                self._models[FALLBACK_MODEL_NAME] = self._fallback_model()
+                self._set_models({FALLBACK_MODEL_NAME: self._fallback_model()})
         else:
+            models = self._models
+            latest = self._latest_project_model()
+            new_models = {}
             for model in set(model_names):
-                if model not in self._models:
-                    self._models[model] = None
+                if model in models or model in self._warming_up:
+                    continue
+                if (models.get(latest) is not None and
+                        ModelRegistry.is_newer(model, latest)):
+                    # a newer model appeared, keep using the loaded one
+                    # until the new one is ready
+                    self._warm_up_in_background(model)
+                else:
+                    new_models[model] = None
+            if new_models:
+                self._set_models(new_models)
 
     def _interpreter_for_model(self, model_name):
-        metadata = self._read_model_metadata(model_name)
-        return Interpreter.create(metadata, self._component_builder)
+        labels = self._metric_labels(model_name)
+        with metrics.registry.time(metrics.MODEL_LOAD_DURATION, labels):
+            metadata = self._read_model_metadata(model_name)
+            interpreter = Interpreter.create(metadata,
+                                             self._component_builder)
+
+        self._set_metric_labels(interpreter, model_name)
+        return interpreter
 
     def _read_model_metadata(self, model_name):
         if model_name is None:
@@ -216,7 +559,9 @@ class Project(object):
     def as_dict(self):
         return {'status': 'training' if self.status else 'ready',
                 'available_models': list(self._models.keys()),
-                'loaded_models': self._list_loaded_models()}
+                'latest_model': self._latest_project_model(),
+                'loaded_models': self._list_loaded_models(),
+                'loading_models': list(self._warming_up)}
 
     def _list_loaded_models(self):
         models = []
@@ -228,22 +573,57 @@ class Project(object):
     def _list_models_in_cloud(self):
         # type: () -> List[Text]
 
+        if self._cloud_models is not None:
+            # only the first search uses the models listed by the caller
+            models, self._cloud_models = self._cloud_models, None
+            return models
+
         try:
-            from rasa_nlu.persistor import get_persistor
-            p = get_persistor(self.remote_storage)
+            p = self._persistor()
             if p is not None:
                 return p.list_models(self._project)
             else:
                 return []
+        except CircuitBreakerError as e:
+            logger.debug("Not listing models of project {}. "
+                         "{}".format(self._project, e))
+            return []
         except Exception as e:
             logger.warn("Failed to list models of project {}. "
                         "{}".format(self._project, e))
             return []
 
+    def _find_model_in_cloud(self, model_name):
+        # type: (Text) -> bool
+        """Looks up a model that wasn't listed by the storage."""
+
+        if self.remote_storage is None and self.guarded_persistor is None:
+            return False
+
+        try:
+            p = self._persistor()
+            if p is None or not p.has_model(model_name, self._project):
+                return False
+        except Exception as e:
+            logger.debug("Failed to look up model '{}' of project {}. "
+                         "{}".format(model_name, self._project, e))
+            return False
+
+        self._set_models({model_name: None})
+        return True
+
+    def _persistor(self):
+        # type: () -> Any
+
+        if self.guarded_persistor is not None:
+            return self.guarded_persistor
+
+        from rasa_nlu.persistor import get_persistor
+        return get_persistor(self.remote_storage)
+
     def _load_model_from_cloud(self, model_name, target_path):
         try:
-            from rasa_nlu.persistor import get_persistor
-            p = get_persistor(self.remote_storage)
+            p = self._persistor()
             if p is not None:
                 p.retrieve(model_name, self._project, target_path)
             else:
@@ -0,0 +1,212 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import gzip
+import io
+import logging
+import os
+import shutil
+import time
+from builtins import object
+from collections import deque
+from threading import Condition, Event, Lock, Thread
+
+import simplejson
+from typing import Any, Dict, List, Optional, Text
+
+from rasa_nlu import utils
+
+logger = logging.getLogger(__name__)
+
+
+class QueryLogger(object):
+    """Logs parse responses to a file without blocking the caller.
+
+    Records are appended to an in memory buffer and written in batches by a
+    background thread every `flush_interval` seconds. If the buffer holds
+    `buffer_size` records, new records are dropped (and counted) instead of
+    blocking the request.
+
+    The log file gets rotated once it is larger than `max_bytes` or older
+    than `rotate_interval` seconds. Rotated files are gzipped if
+    `compress` is set."""
+
+    def __init__(self,
+                 log_file,  # type: Text
+                 buffer_size=10000,  # type: int
+                 flush_interval=1.0,  # type: float
+                 max_bytes=None,  # type: Optional[int]
+                 rotate_interval=None,  # type: Optional[float]
+                 compress=False  # type: bool
+                 ):
+        # type: (...) -> None
+
+        self.log_file = log_file
+        self.buffer_size = max(buffer_size, 1)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.compress = compress
+
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+        self._buffer = deque()
+        self._buffer_lock = Lock()
+        self._flush_requested = Event()
+        # flush requests are numbered, the writer tracks up to which
+        # request all records have been written
+        self._flushes = Condition()
+        self._requested_flush = 0
+        self._completed_flush = 0
+        self._stopped = Event()
+
+        utils.create_dir_for_file(log_file)
+        self._open()
+
+        self._writer = Thread(target=self._write_loop,
+                              name="query-logger")
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _open(self):
+        self._file = io.open(self.log_file, 'a', encoding='utf8')
+        self._opened_at = time.time()
+
+    def log(self, user_input, project, model):
+        # type: (Dict[Text, Any], Text, Optional[Text]) -> bool
+        """Queues a response to be logged.
+
+        Returns `False` if the record got dropped as the buffer is full."""
+
+        record = {"log_time": time.time(),
+                  "user_input": user_input,
+                  "project": project,
+                  "model": model}
+
+        with self._buffer_lock:
+            if len(self._buffer) >= self.buffer_size:
+                self.dropped += 1
+                return False
+            self._buffer.append(record)
+        return True
+
+    def flush(self, timeout=None):
+        # type: (Optional[float]) -> None
+        """Blocks until all queued records are written."""
+
+        with self._flushes:
+            self._requested_flush += 1
+            flush_id = self._requested_flush
+            self._flush_requested.set()
+
+            deadline = time.time() + timeout if timeout is not None else None
+            while self._completed_flush < flush_id and self._writer.is_alive():
+                remaining = deadline - time.time() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    break
+                self._flushes.wait(remaining)
+
+    def close(self):
+        # type: () -> None
+        """Writes all queued records and stops the writer."""
+
+        if self._stopped.is_set():
+            return
+
+        self._stopped.set()
+        self._flush_requested.set()
+        self._writer.join()
+        self._file.close()
+
+    def _take_records(self):
+        # type: () -> List[Dict[Text, Any]]
+
+        with self._buffer_lock:
+            records = list(self._buffer)
+            self._buffer.clear()
+        return records
+
+    def _write_loop(self):
+        while not self._stopped.is_set():
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            self._write_and_notify()
+
+        # write whatever got queued while stopping
+        self._write_and_notify()
+
+    def _write_and_notify(self):
+        with self._flushes:
+            flush_id = self._requested_flush
+
+        self._write_records()
+
+        with self._flushes:
+            self._completed_flush = flush_id
+            self._flushes.notify_all()
+
+    def _write_records(self):
+        records = self._take_records()
+        try:
+            if records:
+                lines = [simplejson.dumps(r, ensure_ascii=False) + "\n"
+                         for r in records]
+                self._file.write("".join(lines))
+                self._file.flush()
+                self.written += len(records)
+
+            if self._should_rotate():
+                self._rotate()
+        except Exception as e:
+            logger.error("Failed to write {} records to the query log "
+                         "'{}'. Error: {}".format(len(records),
+                                                  self.log_file, e))
+
+    def _should_rotate(self):
+        # type: () -> bool
+
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        return bool(self.rotate_interval and
+                    time.time() - self._opened_at >= self.rotate_interval)
+
+    def _rotated_file_name(self):
+        # type: () -> Text
+
+        # microseconds keep the names unique and in chronological order
+        timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        return "{}.{}".format(self.log_file, timestamp)
+
+    def _rotate(self):
+        if self._file.tell() == 0:
+            # nothing got logged, just restart the interval
+            self._opened_at = time.time()
+            return
+
+        self._file.close()
+        rotated = self._rotated_file_name()
+        os.rename(self.log_file, rotated)
+        self._open()
+        self.rotations += 1
+
+        if self.compress:
+            with io.open(rotated, 'rb') as f_in:
+                with gzip.open(rotated + ".gz", 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+            os.remove(rotated)
+
+        logger.debug("Rotated query log to '{}'.".format(rotated))
+
+    def as_dict(self):
+        # type: () -> Dict[Text, Any]
+
+        return {"file": self.log_file,
+                "queued": len(self._buffer),
+                "written": self.written,
+                "dropped": self.dropped,
+                "rotations": self.rotations}
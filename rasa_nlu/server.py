@@ -5,16 +5,25 @@ from __future__ import unicode_literals
 
 import argparse
 import logging
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
 from functools import wraps
 
 import simplejson
 import six
 from builtins import str
 from klein import Klein
-from twisted.internet import reactor, threads
-from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet import default, reactor, threads
+from twisted.internet.defer import (
+    Deferred, DeferredSemaphore, inlineCallbacks, maybeDeferred, returnValue)
+from twisted.web.server import Site
+from typing import Any, Callable, Dict, Optional, Text
 
-from rasa_nlu import utils, config
+from rasa_nlu import metrics, utils, config
 from rasa_nlu.config import RasaNLUModelConfig
 from rasa_nlu.data_router import (
     DataRouter, InvalidProjectError,
@@ -25,6 +34,12 @@ from rasa_nlu.version import __version__
 
 logger = logging.getLogger(__name__)
 
+# backlog of the listening socket shared by the worker processes
+WORKER_LISTEN_BACKLOG = 128
+
+# seconds to wait before a worker process that died gets replaced
+WORKER_RESTART_DELAY = 1
+
 
 def create_argument_parser():
     parser = argparse.ArgumentParser(description='parse incoming text')
@@ -45,6 +60,18 @@ def create_argument_parser():
                              ' will be loaded.\nElse you can specify a list of'
                              ' specific project names.\n Eg: python -m rasa_'
                              'nlu.server -p project1 project2 --path projects')
+    parser.add_argument('--pre_load_max',
+                        type=int,
+                        default=None,
+                        help='Only preload the models of this many of the '
+                             '`pre_load` projects, the ones with the most '
+                             'recently trained models are loaded first.')
+    parser.add_argument('--startup_threads',
+                        type=int,
+                        default=8,
+                        help='Number of threads used to discover the '
+                             'projects and preload their models when the '
+                             'server starts.')
     parser.add_argument('-t', '--token',
                         help="auth token. If set, reject requests which don't "
                              "provide this token as a query parameter")
@@ -74,10 +101,170 @@ def create_argument_parser():
                         default=1,
                         help='Number of parallel threads to use for '
                              'handling parse requests.')
+    parser.add_argument('--workers',
+                        type=int,
+                        default=1,
+                        help='Number of worker processes serving requests. '
+                             'Projects are loaded once before the workers '
+                             'are forked, so they share the preloaded models. '
+                             'Only available on unix systems.')
+    parser.add_argument('--max_parse_in_flight',
+                        type=int,
+                        default=None,
+                        help='Maximum number of parse requests processed '
+                             'at the same time. Defaults to the size of the '
+                             'thread pool (`num_threads` * 5).')
+    parser.add_argument('--max_parse_queue',
+                        type=int,
+                        default=None,
+                        help='Maximum number of parse requests waiting to be '
+                             'processed. If the queue is full, requests are '
+                             'rejected with a 503 status code. By default '
+                             'the queue is unbounded.')
+    parser.add_argument('--retry_after',
+                        type=int,
+                        default=1,
+                        help='Seconds a client should wait before retrying a '
+                             'rejected parse request (`Retry-After` header).')
+    parser.add_argument('--max_batch_size',
+                        type=int,
+                        default=1,
+                        help='Maximum number of concurrent parse requests '
+                             'for the same project and model that are '
+                             'combined into a single batch. Batching is '
+                             'disabled if set to 1.')
+    parser.add_argument('--max_batch_wait',
+                        type=float,
+                        default=5,
+                        help='Maximum time in milliseconds a parse request '
+                             'waits for other requests to join its batch. '
+                             'Only used if `max_batch_size` is larger '
+                             'than 1.')
+    parser.add_argument('--parse_cache_size',
+                        type=int,
+                        default=0,
+                        help='Maximum number of parse results kept in the '
+                             'parse cache. Caching is disabled if set to 0.')
+    parser.add_argument('--parse_cache_ttl',
+                        type=float,
+                        default=None,
+                        help='Seconds after which a cached parse result '
+                             'expires. By default results only get removed '
+                             'when the cache is full or the model changes.')
+    parser.add_argument('--parse_cache_time_bucket',
+                        type=float,
+                        default=60,
+                        help='Parse results of models with time dependent '
+                             'components (e.g. duckling) are only reused '
+                             'for requests within the same time bucket of '
+                             'this many seconds.')
+    parser.add_argument('--max_loaded_models',
+                        type=int,
+                        default=None,
+                        help='Maximum number of models kept in memory. '
+                             'The least recently used models are unloaded '
+                             'and loaded again on the next request.')
+    parser.add_argument('--max_model_bytes',
+                        type=int,
+                        default=None,
+                        help='Maximum estimated memory (in bytes) used by '
+                             'loaded models. The size of a model is '
+                             'estimated from the size of its files.')
+    parser.add_argument('--unknown_name_ttl',
+                        type=float,
+                        default=30,
+                        help='Seconds for which requests for a project or '
+                             'model that could not be found are answered '
+                             'without searching for it again. Set to 0 to '
+                             'search on every request.')
+    parser.add_argument('--min_refresh_interval',
+                        type=float,
+                        default=5,
+                        help='Minimum seconds between two listings of the '
+                             'projects or models of a project when unknown '
+                             'names are requested.')
+    parser.add_argument('--model_refresh_interval',
+                        type=float,
+                        default=None,
+                        help='Seconds between two searches for new models '
+                             'in the `path` and the remote storage. By '
+                             'default new models are only picked up when '
+                             'they are trained or requested by name.')
+    parser.add_argument('--prefetch_models',
+                        action='store_true',
+                        default=False,
+                        help='Download new models from the remote storage '
+                             'in the background every '
+                             '`model_refresh_interval` seconds, instead of '
+                             'when they are first requested.')
+    parser.add_argument('--warm_up_prefetched',
+                        action='store_true',
+                        default=False,
+                        help='Also load the latest model of a project once '
+                             'it has been prefetched.')
+    parser.add_argument('--upload_workers',
+                        type=int,
+                        default=2,
+                        help='Number of threads compressing and uploading '
+                             'trained models to the remote storage.')
+    parser.add_argument('--upload_retries',
+                        type=int,
+                        default=3,
+                        help='Number of times a failed upload of a trained '
+                             'model is retried.')
+    parser.add_argument('--storage_timeout',
+                        type=float,
+                        default=10,
+                        help='Seconds after which listing projects or models '
+                             'of the remote storage fails while handling a '
+                             'request.')
+    parser.add_argument('--storage_download_timeout',
+                        type=float,
+                        default=None,
+                        help='Seconds after which downloading a model from '
+                             'the remote storage fails. By default there is '
+                             'no timeout.')
+    parser.add_argument('--storage_failure_threshold',
+                        type=int,
+                        default=5,
+                        help='Number of consecutive failed calls to the '
+                             'remote storage after which calls are rejected '
+                             'right away.')
+    parser.add_argument('--storage_reset_timeout',
+                        type=float,
+                        default=30,
+                        help='Seconds for which calls to a failing remote '
+                             'storage are rejected before it is tried '
+                             'again.')
     parser.add_argument('--response_log',
                         help='Directory where logs will be saved '
                              '(containing queries and responses).'
                              'If set to ``null`` logging will be disabled.')
+    parser.add_argument('--response_log_buffer_size',
+                        type=int,
+                        default=10000,
+                        help='Maximum number of responses buffered before '
+                             'they are written to the response log. If the '
+                             'buffer is full, responses are not logged.')
+    parser.add_argument('--response_log_flush_interval',
+                        type=float,
+                        default=1,
+                        help='Seconds between writes of the buffered '
+                             'responses to the response log.')
+    parser.add_argument('--response_log_max_bytes',
+                        type=int,
+                        default=None,
+                        help='Rotate the response log once it is larger '
+                             'than this many bytes.')
+    parser.add_argument('--response_log_rotate_interval',
+                        type=float,
+                        default=None,
+                        help='Rotate the response log after this many '
+                             'seconds.')
+    parser.add_argument('--response_log_compress',
+                        action='store_true',
+                        default=False,
+                        help='Gzip rotated response logs.')
     parser.add_argument('--storage',
                         help='Set the remote location where models are stored. '
                              'E.g. on AWS. If nothing is configured, the '
@@ -167,6 +354,126 @@ def is_yaml_request(request):
             iter(request.requestHeaders.getRawHeaders("Content-Type", [])), "")
 
 
+def is_async_request(request):
+    """Whether the client wants a job id instead of waiting for the result."""
+
+    value = parameter_or_default(request, "async", default="false")
+    return value.lower() in {"true", "1", "yes"}
+
+
+class ServerOverloadedError(Exception):
+    """Raised when a parse request is rejected because too many requests
+    are already waiting to be processed.
+
+    Attributes:
+        message -- explanation of why the request is rejected
+    """
+
+    def __init__(self):
+        self.message = 'The server is overloaded, please retry later.'
+
+    def __str__(self):
+        return self.message
+
+
+class ParseQueue(object):
+    """Admission control for the parse work run on the reactor thread pool.
+
+    At most `max_in_flight` parse calls are handed to the thread pool at
+    the same time, further calls wait in a queue. If `max_queued` is set
+    and the queue is full, new calls are rejected right away with a
+    `ServerOverloadedError` instead of waiting until the client times out.
+
+    Must only be used from the reactor thread."""
+
+    # number of recent queue wait times used to compute the average
+    WAIT_TIME_WINDOW = 100
+
+    def __init__(self,
+                 max_in_flight,  # type: int
+                 max_queued=None,  # type: Optional[int]
+                 retry_after=1,  # type: int
+                 run_in_thread=True  # type: bool
+                 ):
+        # type: (...) -> None
+
+        self._semaphore = DeferredSemaphore(max(max_in_flight, 1))
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+        self.rejected = 0
+        self._wait_times = deque(maxlen=self.WAIT_TIME_WINDOW)
+        self._run_in_thread = run_in_thread
+
+    @property
+    def max_in_flight(self):
+        # type: () -> int
+        return self._semaphore.limit
+
+    @property
+    def in_flight(self):
+        # type: () -> int
+        return self._semaphore.limit - self._semaphore.tokens
+
+    @property
+    def queued(self):
+        # type: () -> int
+        return len(self._semaphore.waiting)
+
+    def is_full(self):
+        # type: () -> bool
+        """Returns `True` if new calls would be rejected."""
+
+        return (self.max_queued is not None and
+                self._semaphore.tokens == 0 and
+                self.queued >= self.max_queued)
+
+    def average_wait_time(self):
+        # type: () -> float
+        """Average time (in seconds) recent calls waited in the queue."""
+
+        if self._wait_times:
+            return sum(self._wait_times) / len(self._wait_times)
+        else:
+            return 0.0
+
+    def run(self, f, *args, **kwargs):
+        # type: (Callable, *Any, **Any) -> Deferred
+        """Run `f` as soon as there is a free slot.
+
+        Raises a `ServerOverloadedError` if the queue is full."""
+
+        if self.is_full():
+            self.rejected += 1
+            metrics.registry.inc(metrics.PARSE_QUEUE_REJECTED)
+            raise ServerOverloadedError()
+
+        enqueued_at = time.time()
+
+        def run_with_slot(_):
+            self._wait_times.append(time.time() - enqueued_at)
+            if self._run_in_thread:
+                d = threads.deferToThread(f, *args, **kwargs)
+            else:
+                d = maybeDeferred(f, *args, **kwargs)
+            return d.addBoth(release_slot)
+
+        def release_slot(result):
+            self._semaphore.release()
+            return result
+
+        return self._semaphore.acquire().addCallback(run_with_slot)
+
+    def as_dict(self):
+        # type: () -> Dict[Text, Any]
+
+        return {"in_flight": self.in_flight,
+                "queued": self.queued,
+                "max_in_flight": self.max_in_flight,
+                "max_queued": self.max_queued,
+                "average_wait_time": self.average_wait_time(),
+                "rejected": self.rejected}
+
+
 class RasaNLU(object):
     """Class representing Rasa NLU http server"""
 
@@ -180,7 +487,10 @@ class RasaNLU(object):
                  token=None,
                  cors_origins=None,
                  testing=False,
-                 default_config_path=None):
+                 default_config_path=None,
+                 max_parse_in_flight=None,
+                 max_parse_queue=None,
+                 retry_after=1):
 
         self._configure_logging(loglevel, logfile)
 
@@ -192,6 +502,10 @@ class RasaNLU(object):
         self.cors_origins = cors_origins if cors_origins else ["*"]
         self.access_token = token
         reactor.suggestThreadPoolSize(num_threads * 5)
+        self.parse_queue = ParseQueue(max_parse_in_flight or num_threads * 5,
+                                      max_parse_queue,
+                                      retry_after,
+                                      run_in_thread=not testing)
 
     @staticmethod
     def _load_default_config(path):
@@ -206,6 +520,10 @@ class RasaNLU(object):
                             level=loglevel)
         logging.captureWarnings(True)
 
+    def _reject_overloaded(self, request):
+        request.setResponseCode(503)
+        request.setHeader('Retry-After', str(self.parse_queue.retry_after))
+
     @app.route("/", methods=['GET', 'OPTIONS'])
     @check_cors
     def hello(self, request):
@@ -236,10 +554,12 @@ class RasaNLU(object):
             data = self.data_router.extract(request_params)
             try:
                 request.setResponseCode(200)
-                response = yield (self.data_router.parse(data) if self._testing
-                                  else threads.deferToThread(
-                                  self.data_router.parse, data))
+                response = yield self.parse_queue.run(self.data_router.parse,
+                                                      data)
                 returnValue(json_to_string(response))
+            except ServerOverloadedError as e:
+                self._reject_overloaded(request)
+                returnValue(json_to_string({"error": "{}".format(e)}))
             except InvalidProjectError as e:
                 request.setResponseCode(404)
                 returnValue(json_to_string({"error": "{}".format(e)}))
@@ -248,6 +568,48 @@ class RasaNLU(object):
                 logger.exception(e)
                 returnValue(json_to_string({"error": "{}".format(e)}))
 
+    @app.route("/parse/batch", methods=['POST', 'OPTIONS'])
+    @requires_auth
+    @check_cors
+    @inlineCallbacks
+    def parse_batch(self, request):
+        request.setHeader('Content-Type', 'application/json')
+        request_params = simplejson.loads(
+                request.content.read().decode('utf-8', 'strict'))
+
+        if not isinstance(request_params, list):
+            request.setResponseCode(400)
+            dumped = json_to_string(
+                    {"error": "Expected a list of parse queries"})
+            returnValue(dumped)
+
+        responses = [None] * len(request_params)
+        indices, queries = [], []
+        for idx, params in enumerate(request_params):
+            if isinstance(params, dict) and 'query' in params:
+                params['q'] = params.pop('query')
+
+            if not isinstance(params, dict) or 'q' not in params:
+                responses[idx] = {"error": "Invalid parse parameter specified"}
+            else:
+                indices.append(idx)
+                queries.append(self.data_router.extract(params))
+
+        try:
+            request.setResponseCode(200)
+            parsed = yield self.parse_queue.run(self.data_router.parse_batch,
+                                                queries)
+            for idx, response in zip(indices, parsed):
+                responses[idx] = response
+            returnValue(json_to_string(responses))
+        except ServerOverloadedError as e:
+            self._reject_overloaded(request)
+            returnValue(json_to_string({"error": "{}".format(e)}))
+        except Exception as e:
+            request.setResponseCode(500)
+            logger.exception(e)
+            returnValue(json_to_string({"error": "{}".format(e)}))
+
     @app.route("/version", methods=['GET', 'OPTIONS'])
     @requires_auth
     @check_cors
@@ -275,7 +637,23 @@ class RasaNLU(object):
     @check_cors
     def status(self, request):
         request.setHeader('Content-Type', 'application/json')
-        return json_to_string(self.data_router.get_status())
+        status = self.data_router.get_status()
+        status["parse_queue"] = self.parse_queue.as_dict()
+        return json_to_string(status)
+
+    @app.route("/metrics", methods=['GET', 'OPTIONS'])
+    @requires_auth
+    @check_cors
+    def get_metrics(self, request):
+        """Returns the server's metrics in the Prometheus text format."""
+
+        request.setHeader('Content-Type',
+                          'text/plain; version=0.0.4; charset=utf-8')
+        metrics.registry.set(metrics.PARSE_QUEUE_IN_FLIGHT,
+                             self.parse_queue.in_flight)
+        metrics.registry.set(metrics.PARSE_QUEUE_QUEUED,
+                             self.parse_queue.queued)
+        return metrics.registry.exposition()
 
     @app.route("/train", methods=['POST', 'OPTIONS'])
     @requires_auth
@@ -308,6 +686,13 @@ class RasaNLU(object):
         try:
             request.setResponseCode(200)
 
+            if is_async_request(request):
+                job = self.data_router.start_train_job(
+                        data_file, project,
+                        RasaNLUModelConfig(model_config), model_name)
+                request.setResponseCode(202)
+                returnValue(json_to_string(job.as_dict()))
+
             response = yield self.data_router.start_train_process(
                     data_file, project,
                     RasaNLUModelConfig(model_config), model_name)
@@ -324,6 +709,15 @@ class RasaNLU(object):
             request.setResponseCode(500)
             returnValue(json_to_string({"error": "{}".format(e)}))
 
+    def _run_in_thread(self, f, *args, **kwargs):
+        # type: (Callable, *Any, **Any) -> Deferred
+        """Run a blocking function without blocking the reactor."""
+
+        if self._testing:
+            return maybeDeferred(f, *args, **kwargs)
+        else:
+            return threads.deferToThread(f, *args, **kwargs)
+
     @app.route("/evaluate", methods=['POST', 'OPTIONS'])
     @requires_auth
     @check_cors
@@ -334,19 +728,62 @@ class RasaNLU(object):
             key.decode('utf-8', 'strict'): value[0].decode('utf-8', 'strict')
             for key, value in request.args.items()
         }
+        project = params.get('project')
+        model = params.get('model')
 
         request.setHeader('Content-Type', 'application/json')
 
+        if is_async_request(request):
+            job = self.data_router.jobs.create("evaluation", project=project,
+                                               model=model)
+
+            def run_evaluation():
+                job.start()
+                return self.data_router.evaluate(data_string, project, model)
+
+            self.data_router.jobs.track(job,
+                                        self._run_in_thread(run_evaluation))
+            request.setResponseCode(202)
+            returnValue(json_to_string(job.as_dict()))
+
         try:
             request.setResponseCode(200)
-            response = yield self.data_router.evaluate(data_string,
-                                                       params.get('project'),
-                                                       params.get('model'))
+            response = yield self._run_in_thread(self.data_router.evaluate,
+                                                 data_string, project, model)
             returnValue(json_to_string(response))
         except Exception as e:
             request.setResponseCode(500)
             returnValue(json_to_string({"error": "{}".format(e)}))
 
+    @app.route("/jobs", methods=['GET', 'OPTIONS'])
+    @requires_auth
+    @check_cors
+    def list_jobs(self, request):
+        request.setHeader('Content-Type', 'application/json')
+        return json_to_string([job.as_dict(include_result=False)
+                               for job in self.data_router.jobs.list()])
+
+    @app.route("/jobs/<string:job_id>",
+               methods=['GET', 'DELETE', 'OPTIONS'])
+    @requires_auth
+    @check_cors
+    def job(self, request, job_id):
+        request.setHeader('Content-Type', 'application/json')
+        job = self.data_router.jobs.get(job_id)
+        if job is None:
+            request.setResponseCode(404)
+            return json_to_string({"error": "No job found with id "
+                                            "'{}'.".format(job_id)})
+
+        if request.method.decode('utf-8', 'strict') == 'DELETE':
+            if not job.cancel():
+                request.setResponseCode(409)
+                return json_to_string({"error": "Job '{}' can't be cancelled."
+                                                "".format(job_id)})
+            request.setResponseCode(202)
+
+        return json_to_string(job.as_dict())
+
     @app.route("/models", methods=['DELETE', 'OPTIONS'])
     @requires_auth
     @check_cors
@@ -370,33 +807,196 @@ class RasaNLU(object):
             return simplejson.dumps({"error": "{}".format(e)})
 
 
-if __name__ == '__main__':
-    # Running as standalone python application
-    cmdline_args = create_argument_parser().parse_args()
-
-    utils.configure_colored_logging(cmdline_args.loglevel)
-    pre_load = cmdline_args.pre_load
-
+def create_data_router(cmdline_args, response_log):
     router = DataRouter(cmdline_args.path,
                         cmdline_args.max_training_processes,
-                        cmdline_args.response_log,
+                        response_log,
                         cmdline_args.emulate,
-                        cmdline_args.storage)
+                        cmdline_args.storage,
+                        max_batch_size=cmdline_args.max_batch_size,
+                        max_batch_wait=cmdline_args.max_batch_wait,
+                        parse_cache_size=cmdline_args.parse_cache_size,
+                        parse_cache_ttl=cmdline_args.parse_cache_ttl,
+                        parse_cache_time_bucket=(
+                            cmdline_args.parse_cache_time_bucket),
+                        response_log_buffer_size=(
+                            cmdline_args.response_log_buffer_size),
+                        response_log_flush_interval=(
+                            cmdline_args.response_log_flush_interval),
+                        response_log_max_bytes=(
+                            cmdline_args.response_log_max_bytes),
+                        response_log_rotate_interval=(
+                            cmdline_args.response_log_rotate_interval),
+                        response_log_compress=(
+                            cmdline_args.response_log_compress),
+                        max_loaded_models=cmdline_args.max_loaded_models,
+                        max_model_bytes=cmdline_args.max_model_bytes,
+                        unknown_name_ttl=cmdline_args.unknown_name_ttl,
+                        min_refresh_interval=(
+                            cmdline_args.min_refresh_interval),
+                        model_refresh_interval=(
+                            cmdline_args.model_refresh_interval),
+                        startup_threads=cmdline_args.startup_threads,
+                        prefetch_models=cmdline_args.prefetch_models,
+                        warm_up_prefetched=(
+                            cmdline_args.warm_up_prefetched),
+                        upload_workers=cmdline_args.upload_workers,
+                        upload_retries=cmdline_args.upload_retries,
+                        storage_timeout=cmdline_args.storage_timeout,
+                        storage_download_timeout=(
+                            cmdline_args.storage_download_timeout),
+                        storage_failure_threshold=(
+                            cmdline_args.storage_failure_threshold),
+                        storage_reset_timeout=(
+                            cmdline_args.storage_reset_timeout))
+
+    pre_load = cmdline_args.pre_load
     if pre_load:
         logger.debug('Preloading....')
         if 'all' in pre_load:
             pre_load = router.project_store.keys()
-        router._pre_load(pre_load)
+        router._pre_load(pre_load, cmdline_args.pre_load_max)
+
+    return router
+
 
-    rasa = RasaNLU(
+def create_server(router, cmdline_args):
+    return RasaNLU(
             router,
             cmdline_args.loglevel,
             cmdline_args.write,
             cmdline_args.num_threads,
             cmdline_args.token,
             cmdline_args.cors,
-            default_config_path=cmdline_args.config
+            default_config_path=cmdline_args.config,
+            max_parse_in_flight=cmdline_args.max_parse_in_flight,
+            max_parse_queue=cmdline_args.max_parse_queue,
+            retry_after=cmdline_args.retry_after
     )
 
-    logger.info('Started http server on port %s' % cmdline_args.port)
-    rasa.app.run('0.0.0.0', cmdline_args.port)
+
+def _create_listening_socket(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('0.0.0.0', port))
+    sock.listen(WORKER_LISTEN_BACKLOG)
+    sock.setblocking(False)
+    return sock
+
+
+def _install_worker_reactor():
+    """Install a fresh reactor in a forked worker process.
+
+    The master's reactor got installed when klein was imported. A forked
+    worker inherits its poller and waker file descriptors, so every worker
+    installs a reactor of its own before it serves any requests."""
+
+    from rasa_nlu import data_router
+
+    del sys.modules['twisted.internet.reactor']
+    default.install()
+    from twisted.internet import reactor as worker_reactor
+
+    # the modules that imported the master's reactor use the new one
+    global reactor
+    reactor = worker_reactor
+    data_router.reactor = worker_reactor
+    return worker_reactor
+
+
+def _run_worker(router, cmdline_args, listening_socket):
+    """Serve requests on the shared socket in a forked worker process."""
+
+    # the master forwards termination signals, the reactor installs
+    # its own handlers once it runs
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    reactor = _install_worker_reactor()
+
+    # every worker logs the responses into its own file
+    router.responses = router._create_query_logger(cmdline_args.response_log)
+    router.restart_after_fork()
+
+    rasa = create_server(router, cmdline_args)
+    reactor.adoptStreamPort(listening_socket.fileno(), socket.AF_INET,
+                            Site(rasa.app.resource()))
+    listening_socket.close()
+
+    logger.info('Worker {} started'.format(os.getpid()))
+    reactor.run()
+
+
+def run_workers(cmdline_args):
+    """Pre-fork multi process serving.
+
+    The master process loads the projects once and then forks the
+    workers, so they share the preloaded models copy-on-write. All workers
+    accept connections on the same listening socket. If a worker dies,
+    the master starts a new one."""
+
+    router = create_data_router(cmdline_args, response_log=None)
+    # the workers look for new models themselves
+    router.stop_model_refresh()
+    listening_socket = _create_listening_socket(cmdline_args.port)
+
+    workers = set()
+    stopping = []
+
+    def start_worker():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(router, cmdline_args, listening_socket)
+            except Exception:
+                logger.exception("Worker {} failed.".format(os.getpid()))
+            finally:
+                os._exit(0)
+        workers.add(pid)
+
+    def stop_workers(signum, frame):
+        stopping.append(signum)
+        for worker_pid in workers:
+            try:
+                os.kill(worker_pid, signal.SIGTERM)
+            except OSError:
+                pass  # worker is already gone
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    signal.signal(signal.SIGINT, stop_workers)
+
+    for _ in range(cmdline_args.workers):
+        start_worker()
+
+    logger.info('Started http server on port {} with {} worker processes'
+                ''.format(cmdline_args.port, cmdline_args.workers))
+
+    while workers:
+        pid, status = os.wait()
+        if pid not in workers:
+            continue
+
+        workers.remove(pid)
+        if not stopping:
+            logger.warning("Worker {} exited with status {}. Starting a new "
+                           "worker.".format(pid, status))
+            time.sleep(WORKER_RESTART_DELAY)
+            start_worker()
+
+    listening_socket.close()
+
+
+if __name__ == '__main__':
+    # Running as standalone python application
+    cmdline_args = create_argument_parser().parse_args()
+
+    utils.configure_colored_logging(cmdline_args.loglevel)
+
+    if cmdline_args.workers > 1:
+        run_workers(cmdline_args)
+    else:
+        router = create_data_router(cmdline_args, cmdline_args.response_log)
+        rasa = create_server(router, cmdline_args)
+
+        logger.info('Started http server on port %s' % cmdline_args.port)
+        rasa.app.run('0.0.0.0', cmdline_args.port)
@@ -4,10 +4,16 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import argparse
+import io
 import logging
+import os
+import shutil
+import time
 
+import simplejson
 import typing
-from typing import Optional, Any
+from builtins import object
+from typing import Optional, Any, Dict
 from typing import Text
 from typing import Tuple
 
@@ -91,6 +97,72 @@ class TrainingException(Exception):
         return self.message
 
 
+class TrainingCancelledError(Exception):
+    """Raised in a training worker if the training got cancelled."""
+
+
+class TrainingProgress(object):
+    """Shares the progress of a training running in a worker process.
+
+    The worker writes the component it is currently training to a file in
+    `job_dir`, the server reads it from there. To cancel the training, the
+    server creates a cancel file which the worker checks before it starts
+    training the next component."""
+
+    PROGRESS_FILE = "progress.json"
+    CANCEL_FILE = "cancel"
+
+    def __init__(self, job_dir):
+        # type: (Text) -> None
+
+        self.job_dir = job_dir
+        self.started_at = None  # type: Optional[float]
+        self._last_progress = None  # type: Optional[Dict[Text, Any]]
+
+    def component_started(self, index, component, total):
+        # type: (int, Any, int) -> None
+        """Called by the trainer before it trains a component."""
+
+        if os.path.exists(os.path.join(self.job_dir, self.CANCEL_FILE)):
+            raise TrainingCancelledError("The training got cancelled.")
+
+        if self.started_at is None:
+            self.started_at = time.time()
+
+        progress = {"component": component.name,
+                    "component_index": index + 1,
+                    "components": total,
+                    "started_at": self.started_at}
+        with io.open(os.path.join(self.job_dir, self.PROGRESS_FILE), 'w',
+                     encoding='utf8') as f:
+            f.write(simplejson.dumps(progress))
+
+    def read(self):
+        # type: () -> Optional[Dict[Text, Any]]
+        """Returns the last progress reported by the worker."""
+
+        try:
+            with io.open(os.path.join(self.job_dir, self.PROGRESS_FILE),
+                         encoding='utf8') as f:
+                self._last_progress = simplejson.loads(f.read())
+        except (IOError, OSError, ValueError):
+            # nothing reported yet, already cleaned up or partially written
+            pass
+        return self._last_progress
+
+    def request_cancel(self):
+        # type: () -> bool
+        """Asks the worker to stop before training the next component."""
+
+        io.open(os.path.join(self.job_dir, self.CANCEL_FILE), 'w').close()
+        return False
+
+    def cleanup(self):
+        # type: () -> None
+        self.read()
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+
 def create_persistor(persistor):
     # type: (Optional[Text]) -> Optional[Persistor]
     """Create a remote persistor to store the model if configured."""
@@ -108,16 +180,20 @@ def do_train_in_worker(cfg,  # type: RasaNLUModelConfig
                        project=None,  # type: Optional[Text]
                        fixed_model_name=None,  # type: Optional[Text]
                        storage=None,  # type: Text
-                       component_builder=None
+                       component_builder=None,
                        # type: Optional[ComponentBuilder]
+                       progress=None  # type: Optional[TrainingProgress]
                        ):
     # type: (...) -> Text
     """Loads the trainer and the data and runs the training in a worker."""
 
+    progress_callback = progress.component_started if progress else None
+
     try:
         _, _, persisted_path = do_train(cfg, data, path, project,
                                         fixed_model_name, storage,
-                                        component_builder)
+                                        component_builder,
+                                        progress_callback=progress_callback)
         return persisted_path
     except BaseException as e:
         logger.exception("Failed to train project '{}'.".format(project))
@@ -91,11 +91,14 @@ class SpacyNLP(Component):
 
         return {"spacy_nlp": self.nlp}
 
-    def doc_for_text(self, text):
+    def _preprocess_text(self, text):
         if self.component_config.get("case_sensitive"):
-            return self.nlp(text)
+            return text
         else:
-            return self.nlp(text.lower())
+            return text.lower()
+
+    def doc_for_text(self, text):
+        return self.nlp(self._preprocess_text(text))
 
     def train(self, training_data, config, **kwargs):
         # type: (TrainingData, RasaNLUModelConfig, **Any) -> None
@@ -108,6 +111,14 @@ class SpacyNLP(Component):
 
         message.set("spacy_doc", self.doc_for_text(message.text))
 
+    def process_batch(self, messages, **kwargs):
+        # type: (List[Message], **Any) -> None
+        """Creates the docs of all messages using spacy's `nlp.pipe`."""
+
+        texts = [self._preprocess_text(message.text) for message in messages]
+        for message, doc in zip(messages, self.nlp.pipe(texts)):
+            message.set("spacy_doc", doc)
+
     @classmethod
     def load(cls,
              model_dir=None,
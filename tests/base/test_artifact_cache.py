@@ -0,0 +1,91 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import os
+
+import pytest
+
+from rasa_nlu.artifact_cache import ArtifactCache, ChecksumMismatch
+
+
+def downloader(data, calls):
+    def download(f):
+        calls.append(len(data))
+        f.write(data)
+
+    return download
+
+
+def test_archives_are_only_downloaded_once(tmpdir):
+    cache = ArtifactCache(tmpdir.strpath)
+    data = b"archive"
+    checksum = hashlib.md5(data).hexdigest()
+    calls = []
+
+    for _ in range(2):
+        with cache.open("project", "model", checksum,
+                        downloader(data, calls)) as f:
+            assert f.read() == data
+
+    assert calls == [len(data)]
+
+
+def test_corrupted_archives_are_downloaded_again(tmpdir):
+    cache = ArtifactCache(tmpdir.strpath)
+    calls = []
+    cache.open("project", "model", None, downloader(b"archive", calls)).close()
+
+    path = cache._path("project", "model", None)
+    with open(path, "wb") as f:
+        f.write(b"garbage")
+
+    with cache.open("project", "model", None,
+                    downloader(b"archive", calls)) as f:
+        assert f.read() == b"archive"
+    assert len(calls) == 2
+
+
+def test_archives_not_matching_the_checksum_are_rejected(tmpdir):
+    cache = ArtifactCache(tmpdir.strpath)
+
+    with pytest.raises(ChecksumMismatch):
+        cache.open("project", "model", "0" * 32, downloader(b"archive", []))
+
+    assert cache.size() == 0
+    assert not [f for f in os.listdir(tmpdir.strpath)
+                if not f.endswith(".lock")]
+
+
+def test_least_recently_used_archives_are_evicted(tmpdir):
+    cache = ArtifactCache(tmpdir.strpath, max_bytes=250)
+    for model in ["a", "b"]:
+        cache.open("project", model, None, downloader(b"0" * 100, [])).close()
+    path_a = cache._path("project", "a", None)
+    os.utime(path_a, (1, 1))
+    os.utime(cache._path("project", "b", None), (2, 2))
+
+    cache.open("project", "c", None, downloader(b"0" * 100, [])).close()
+
+    assert not os.path.exists(path_a)
+    assert not os.path.exists(path_a + ".lock")
+    assert cache.size() == 200
+
+
+def test_locked_archives_are_not_evicted(tmpdir):
+    cache = ArtifactCache(tmpdir.strpath, max_bytes=250)
+    for model in ["a", "b"]:
+        cache.open("project", model, None, downloader(b"0" * 100, [])).close()
+    path_a = cache._path("project", "a", None)
+    path_b = cache._path("project", "b", None)
+    os.utime(path_a, (1, 1))
+    os.utime(path_b, (2, 2))
+
+    # e.g. another process verifying the archive
+    with cache._lock(path_a):
+        cache.open("project", "c", None, downloader(b"0" * 100, [])).close()
+
+    assert os.path.exists(path_a)
+    assert not os.path.exists(path_b)
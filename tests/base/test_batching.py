@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from threading import Thread
+
+import pytest
+
+from rasa_nlu.batching import MicroBatcher
+
+
+def _run_concurrently(batcher, items, key="key"):
+    results = [None] * len(items)
+
+    def target(idx, item):
+        try:
+            results[idx] = batcher.process(key, item)
+        except Exception as e:
+            results[idx] = e
+
+    threads = [Thread(target=target, args=(idx, item))
+               for idx, item in enumerate(items)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_items_are_processed_as_one_batch():
+    batches = []
+
+    def process_batch(key, items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(process_batch, max_batch_size=4, max_wait=5000)
+
+    results = _run_concurrently(batcher, [1, 2, 3, 4])
+
+    assert results == [2, 4, 6, 8]
+    assert len(batches) == 1
+    assert sorted(batches[0]) == [1, 2, 3, 4]
+
+
+def test_single_item_is_processed_after_max_wait():
+    batcher = MicroBatcher(lambda key, items: [key + item for item in items],
+                           max_batch_size=10, max_wait=1)
+
+    assert batcher.process("hello ", "world") == "hello world"
+
+
+def test_failing_item_does_not_fail_the_batch():
+    def process_batch(key, items):
+        if "bad" in items:
+            raise ValueError("bad item")
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(process_batch, max_batch_size=3, max_wait=5000)
+
+    results = _run_concurrently(batcher, ["a", "bad", "c"])
+
+    assert results[0] == "A"
+    assert isinstance(results[1], ValueError)
+    assert results[2] == "C"
+
+
+def test_error_of_single_item_is_raised():
+    def process_batch(key, items):
+        raise ValueError("bad item")
+
+    batcher = MicroBatcher(process_batch, max_batch_size=2, max_wait=1)
+
+    with pytest.raises(ValueError):
+        batcher.process("key", "item")
@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from rasa_nlu.cache import NegativeCache, ParseCache
+
+
+def test_cache_returns_copy_of_response():
+    cache = ParseCache(max_size=10)
+    cache.put("default", "model_1", "hello", {"intent": {"name": "greet"}})
+
+    response = cache.get("default", "model_1", "hello")
+    response["intent"]["name"] = "changed"
+
+    assert cache.get("default", "model_1", "hello") == {
+        "intent": {"name": "greet"}}
+    assert cache.get("default", "model_2", "hello") is None
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ParseCache(max_size=2)
+    cache.put("default", "model", "a", {"text": "a"})
+    cache.put("default", "model", "b", {"text": "b"})
+    cache.get("default", "model", "a")
+    cache.put("default", "model", "c", {"text": "c"})
+
+    assert cache.get("default", "model", "b") is None
+    assert cache.get("default", "model", "a") == {"text": "a"}
+    assert cache.get("default", "model", "c") == {"text": "c"}
+    assert cache.evictions == 1
+
+
+def test_cache_entries_expire():
+    cache = ParseCache(max_size=10, ttl=-1)
+    cache.put("default", "model", "hello", {"text": "hello"})
+
+    assert cache.get("default", "model", "hello") is None
+    assert cache.as_dict()["size"] == 0
+
+
+def test_time_dependent_responses_are_cached_per_time_bucket():
+    cache = ParseCache(max_size=10, time_bucket=60)
+    cache.put("default", "model", "tomorrow", {"text": "tomorrow"},
+              request_time=1000 * 1000, time_dependent=True)
+
+    assert cache.get("default", "model", "tomorrow",
+                     request_time=1000 * 1001, time_dependent=True)
+    assert cache.get("default", "model", "tomorrow",
+                     request_time=1000 * 1100, time_dependent=True) is None
+
+
+def test_invalidate_removes_entries_of_model():
+    cache = ParseCache(max_size=10)
+    cache.put("default", "model_1", "hello", {"text": "hello"})
+    cache.put("default", "model_2", "hello", {"text": "hello"})
+    cache.put("other", "model_1", "hello", {"text": "hello"})
+
+    cache.invalidate("default", "model_1")
+
+    assert cache.get("default", "model_1", "hello") is None
+    assert cache.get("default", "model_2", "hello") is not None
+    assert cache.get("other", "model_1", "hello") is not None
+
+
+def test_negative_cache_entries_expire():
+    cache = NegativeCache(ttl=60)
+    cache.add(("default", "model"))
+    expired = NegativeCache(ttl=-1)
+    expired.add(("default", "model"))
+
+    assert ("default", "model") in cache
+    assert ("default", "other") not in cache
+    assert ("default", "model") not in expired
@@ -0,0 +1,51 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+
+import pytest
+
+from rasa_nlu.circuit_breaker import (
+    CallTimeoutError, CircuitBreaker, CircuitOpenError)
+
+
+def fail():
+    raise IOError("storage unavailable")
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("storage", failure_threshold=2,
+                             reset_timeout=60)
+
+    for _ in range(2):
+        with pytest.raises(IOError):
+            breaker.call(fail)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "result")
+
+    status = breaker.as_dict()
+    assert status["state"] == "open"
+    assert status["rejected"] == 1
+
+
+def test_breaker_closes_after_successful_trial_call():
+    breaker = CircuitBreaker("storage", failure_threshold=1, reset_timeout=0)
+    with pytest.raises(IOError):
+        breaker.call(fail)
+
+    assert breaker.call(lambda: "result") == "result"
+    assert breaker.as_dict()["state"] == "closed"
+
+
+def test_slow_calls_time_out():
+    breaker = CircuitBreaker("storage", failure_threshold=1)
+    release = threading.Event()
+
+    with pytest.raises(CallTimeoutError):
+        breaker.call(release.wait, timeout=0.01)
+    release.set()
+
+    assert breaker.as_dict()["timeouts"] == 1
+    assert breaker.as_dict()["state"] == "open"
@@ -76,3 +76,19 @@ def test_builder_load_unknown(component_builder):
         component_builder.load_component("my_made_up_componment", "",
                                          Metadata({}, None))
     assert "Unknown component name" in str(excinfo.value)
+
+
+def test_default_process_batch_calls_process():
+    from rasa_nlu.components import Component
+    from rasa_nlu.training_data import Message
+
+    class UppercaseComponent(Component):
+        name = "uppercase"
+
+        def process(self, message, **kwargs):
+            message.set("upper", message.text.upper())
+
+    messages = [Message("hello"), Message("bye")]
+    UppercaseComponent().process_batch(messages)
+
+    assert [m.get("upper") for m in messages] == ["HELLO", "BYE"]
@@ -3,10 +3,17 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import datetime
+import os
+import shutil
+import time
+
 import mock
+import pytest
 
 from rasa_nlu import data_router
 from rasa_nlu import persistor
+from rasa_nlu.model import InvalidProjectError, Interpreter
 
 
 def test_list_projects_in_cloud_method():
@@ -30,3 +37,191 @@ def test_list_projects_in_cloud_method():
                            mocked_get_persistor):
         return_value = data_router.DataRouter()._list_projects_in_cloud()
     assert isinstance(return_value[0], UniqueValue)
+
+
+def test_parse_with_micro_batching(tmpdir):
+    router = data_router.DataRouter(tmpdir.strpath, max_batch_size=8)
+
+    response = router.parse({"text": "hello", "project": "default"})
+
+    assert response["intent"]["name"] == "greet"
+    assert response["model"] == "fallback"
+
+
+def test_parse_cache_is_invalidated_on_model_unload(tmpdir):
+    router = data_router.DataRouter(tmpdir.strpath, parse_cache_size=10)
+
+    router.parse({"text": "hello", "project": "default"})
+    router.parse({"text": "hello", "project": "default"})
+    assert router.get_status()["parse_cache"]["hits"] == 1
+
+    router.project_store["default"].unload("fallback")
+    assert router.get_status()["parse_cache"]["size"] == 0
+
+
+def test_unknown_projects_are_not_listed_again(tmpdir):
+    router = data_router.DataRouter(tmpdir.strpath)
+
+    with mock.patch.object(data_router.DataRouter, "_list_projects",
+                           return_value=[]) as list_projects:
+        for _ in range(3):
+            with pytest.raises(InvalidProjectError):
+                router.parse({"text": "hello", "project": "unknown"})
+        # other unknown projects reuse the recent listing
+        with pytest.raises(InvalidProjectError):
+            router.parse({"text": "hello", "project": "other"})
+
+    assert list_projects.call_count == 1
+    assert router.get_status()["unknown_names"]["hits"] == 2
+
+
+def test_models_are_refreshed_in_the_background(tmpdir):
+    router = data_router.DataRouter(tmpdir.strpath,
+                                    model_refresh_interval=0.01)
+    project = router.project_store["default"]
+    try:
+        with mock.patch.object(project, "_list_models_in_dir",
+                               return_value=["model_20180101-000000"]), \
+                mock.patch.object(project, "_interpreter_for_model",
+                                  return_value=Interpreter([], {})):
+            for _ in range(100):
+                if project.as_dict()["latest_model"] != "fallback":
+                    break
+                time.sleep(0.01)
+    finally:
+        router.stop_model_refresh()
+
+    assert project.as_dict()["latest_model"] == "model_20180101-000000"
+
+
+class DirectoryPersistor(object):
+    """Stands in for a cloud storage, models are stored in a directory."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def list_models(self, project, raise_errors=False):
+        project_dir = os.path.join(self.path, project)
+        return os.listdir(project_dir) if os.path.isdir(project_dir) else []
+
+    def list_models_by_project(self):
+        return {project: self.list_models(project)
+                for project in os.listdir(self.path)}
+
+    def retrieve(self, model_name, project, target_path):
+        shutil.copytree(os.path.join(self.path, project, model_name),
+                        target_path)
+
+
+def wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_new_models_are_prefetched_in_the_background(tmpdir):
+    remote = tmpdir.mkdir("remote")
+    remote.mkdir("default").mkdir("model_20170101-000000")
+    remote.join("default").mkdir("model_20180101-000000")
+    project_dir = tmpdir.mkdir("models").strpath
+
+    with mock.patch.object(persistor, "get_persistor",
+                           return_value=DirectoryPersistor(remote.strpath)):
+        router = data_router.DataRouter(project_dir, remote_storage="aws",
+                                        model_refresh_interval=0.01,
+                                        prefetch_models=True)
+        local_models = tmpdir.join("models", "default")
+        try:
+            # the latest model is downloaded right away
+            assert wait_for(
+                    local_models.join("model_20180101-000000").check)
+
+            remote.join("default").mkdir("model_20180102-000000")
+            assert wait_for(
+                    local_models.join("model_20180102-000000").check)
+        finally:
+            router.stop_model_refresh()
+
+    assert not local_models.join("model_20170101-000000").check()
+    assert (router.project_store["default"].as_dict()["latest_model"] ==
+            "model_20180102-000000")
+
+
+def test_startup_lists_cloud_storage_once(tmpdir):
+    class MockedPersistor(object):
+        calls = 0
+
+        def list_models_by_project(self):
+            MockedPersistor.calls += 1
+            return {"a": ["model_20180101-000000"],
+                    "b": ["model_20180102-000000"],
+                    "c": []}
+
+        def list_models(self, project, raise_errors=False):
+            raise AssertionError("Projects should not list the storage.")
+
+    tmpdir.mkdir("d")
+    with mock.patch.object(persistor, "get_persistor",
+                           return_value=MockedPersistor()):
+        router = data_router.DataRouter(tmpdir.strpath, remote_storage="aws",
+                                        startup_threads=4)
+
+    assert MockedPersistor.calls == 1
+    assert sorted(router.project_store) == ["a", "b", "c", "d"]
+    assert (router.project_store["b"].as_dict()["latest_model"] ==
+            "model_20180102-000000")
+
+
+def test_pre_load_most_recently_trained_projects(tmpdir):
+    for project in ["a", "b", "c"]:
+        tmpdir.mkdir(project)
+    router = data_router.DataRouter(tmpdir.strpath)
+    trained_at = {"a": datetime.datetime(2018, 1, 2),
+                  "b": None,
+                  "c": datetime.datetime(2018, 1, 3)}
+    loaded = []
+
+    for name, project in router.project_store.items():
+        project.latest_model_trained_at = mock.Mock(
+                return_value=trained_at[name])
+        project.load_model = mock.Mock(side_effect=lambda n=name:
+                                       loaded.append(n))
+
+    router._pre_load(["a", "b", "c"], max_projects=2)
+
+    assert sorted(loaded) == ["a", "c"]
+
+
+def test_unavailable_storage_is_not_listed_on_every_request(tmpdir):
+    class SlowPersistor(object):
+        calls = 0
+
+        def list_models_by_project(self):
+            return {}
+
+        def list_models(self, project, raise_errors=False):
+            return []
+
+        def list_projects(self, raise_errors=False):
+            SlowPersistor.calls += 1
+            time.sleep(0.1)
+            return []
+
+    with mock.patch.object(persistor, "get_persistor",
+                           return_value=SlowPersistor()):
+        router = data_router.DataRouter(tmpdir.strpath, remote_storage="aws",
+                                        min_refresh_interval=0,
+                                        storage_timeout=0.01,
+                                        storage_failure_threshold=1)
+        for i in range(3):
+            with pytest.raises(InvalidProjectError):
+                router.parse({"text": "hello",
+                              "project": "unknown_{}".format(i)})
+
+    assert SlowPersistor.calls == 1
+    status = router.get_status()["storage"]
+    assert status["state"] == "open"
+    assert status["timeouts"] == 1
+    assert status["rejected"] == 2
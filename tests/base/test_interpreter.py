@@ -57,3 +57,49 @@ def test_model_not_compatible(metadata):
 def test_model_is_compatible(metadata):
     # should not raise an exception
     assert Interpreter.ensure_model_compatibility(metadata) is None
+
+
+def test_parse_batch_matches_parse(component_builder, tmpdir):
+    _conf = utilities.base_test_conf("keyword")
+    interpreter = utilities.interpreter_for(component_builder,
+                                            "data/examples/rasa/demo-rasa.json",
+                                            tmpdir.strpath,
+                                            _conf)
+
+    texts = ["hello", "", "good bye", "i am looking for an indian spot"]
+
+    results = interpreter.parse_batch(texts)
+
+    assert results == [interpreter.parse(text) for text in texts]
+
+
+def test_parse_batch_with_mismatching_times(component_builder, tmpdir):
+    _conf = utilities.base_test_conf("keyword")
+    interpreter = utilities.interpreter_for(component_builder,
+                                            "data/examples/rasa/demo-rasa.json",
+                                            tmpdir.strpath,
+                                            _conf)
+
+    with pytest.raises(ValueError):
+        interpreter.parse_batch(["hello", "bye"], times=[None])
+
+
+@utilities.slowtest
+@pytest.mark.parametrize("pipeline", [
+    "spacy_sklearn",
+    "tensorflow_embedding",
+    [{"name": "tokenizer_whitespace"},
+     {"name": "intent_featurizer_count_vectors"},
+     {"name": "intent_classifier_sklearn"}]])
+def test_batched_pipelines_match_parse(pipeline, component_builder, tmpdir):
+    interpreter = utilities.interpreter_for(component_builder,
+                                            "data/examples/rasa/demo-rasa.json",
+                                            tmpdir.strpath,
+                                            utilities.base_test_conf(pipeline))
+
+    texts = ["hello", "", "good bye", "i am looking for an indian spot",
+             "show me chinese restaurants in the north"]
+
+    for batch in [texts, texts[:1], []]:
+        assert (interpreter.parse_batch(batch) ==
+                [interpreter.parse(text) for text in batch])
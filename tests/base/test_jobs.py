@@ -0,0 +1,81 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+from twisted.internet.defer import Deferred
+
+from rasa_nlu.classifiers.keyword_intent_classifier import \
+    KeywordIntentClassifier
+from rasa_nlu.jobs import JobStore
+from rasa_nlu.train import TrainingCancelledError, TrainingProgress
+
+
+def test_tracked_job_completes():
+    jobs = JobStore()
+    job = jobs.create("evaluation", project="default")
+    d = Deferred()
+    jobs.track(job, d)
+    assert job.as_dict()["status"] == "queued"
+
+    d.callback({"accuracy": 1.0})
+
+    assert jobs.get(job.id).as_dict()["result"] == {"accuracy": 1.0}
+    assert job.as_dict()["project"] == "default"
+
+
+def test_tracked_job_fails():
+    jobs = JobStore()
+    job = jobs.create("evaluation")
+    d = Deferred()
+    jobs.track(job, d)
+
+    d.errback(ValueError("invalid data"))
+
+    assert job.status == "failed"
+    assert job.as_dict()["error"] == "invalid data"
+
+
+def test_old_finished_jobs_are_forgotten():
+    jobs = JobStore(max_finished_jobs=1)
+    first = jobs.create("evaluation")
+    first.complete(None)
+    second = jobs.create("evaluation")
+    second.complete(None)
+    running = jobs.create("evaluation")
+
+    assert jobs.get(first.id) is None
+    assert jobs.get(second.id) is second
+    assert jobs.get(running.id) is running
+
+
+def test_cancel_job():
+    jobs = JobStore()
+    not_cancellable = jobs.create("evaluation")
+    queued = jobs.create("training")
+    queued.set_canceller(lambda: True)
+    running = jobs.create("training")
+    running.set_canceller(lambda: False)
+
+    assert not not_cancellable.cancel()
+    assert queued.cancel()
+    assert queued.status == "cancelled"
+
+    assert running.cancel()
+    assert running.status == "queued"
+    running.fail("The training got cancelled.")
+    assert running.status == "cancelled"
+
+
+def test_training_progress_stops_cancelled_training(tmpdir):
+    progress = TrainingProgress(tmpdir.strpath)
+    component = KeywordIntentClassifier()
+
+    progress.component_started(0, component, 2)
+    assert progress.read()["component"] == "intent_classifier_keyword"
+    assert progress.read()["component_index"] == 1
+
+    progress.request_cancel()
+    with pytest.raises(TrainingCancelledError):
+        progress.component_started(1, component, 2)
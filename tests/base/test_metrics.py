@@ -0,0 +1,69 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+
+from rasa_nlu import metrics
+from rasa_nlu.classifiers.keyword_intent_classifier import \
+    KeywordIntentClassifier
+from rasa_nlu.metrics import MetricsRegistry
+from rasa_nlu.model import Interpreter
+from rasa_nlu.project import Project
+
+
+def test_histogram_exposition():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.observe("latency_seconds", 0.05, {"component": "a"})
+    registry.observe("latency_seconds", 0.5, {"component": "a"})
+
+    lines = registry.exposition().splitlines()
+
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{component="a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{component="a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{component="a",le="+Inf"} 2' in lines
+    assert 'latency_seconds_count{component="a"} 2' in lines
+
+
+def test_counters_and_gauges():
+    registry = MetricsRegistry()
+    registry.inc("requests_total")
+    registry.inc("requests_total", 2)
+    registry.set("queue_size", 3, {"project": 'say "hi"'})
+
+    lines = registry.exposition().splitlines()
+
+    assert "requests_total 3.0" in lines
+    assert 'queue_size{project="say \\"hi\\""} 3.0' in lines
+
+    with pytest.raises(ValueError):
+        registry.set("requests_total", 1)
+
+
+def test_interpreter_records_component_durations():
+    interpreter = Interpreter([KeywordIntentClassifier()], {})
+    interpreter.metric_labels = {"project": "metrics_test", "model": "m"}
+    interpreter.parse("hello")
+
+    histogram = metrics.registry.get(
+            metrics.COMPONENT_DURATION,
+            {"project": "metrics_test", "model": "m",
+             "component": "intent_classifier_keyword"})
+    assert histogram.count == 1
+
+
+def test_unknown_names_share_a_label():
+    assert metrics.known_label("default", ["default"]) == "default"
+    assert metrics.known_label("made_up", ["default"]) == "unknown"
+
+
+def test_project_only_labels_known_models(tmpdir):
+    project = Project(project="default", project_dir=tmpdir.strpath)
+    project._set_models({"model_20180101-000000": None})
+
+    assert project._metric_labels("model_20180101-000000") == {
+        "project": "default", "model": "model_20180101-000000"}
+    assert project._metric_labels("/some/path") == {
+        "project": "default", "model": "unknown"}
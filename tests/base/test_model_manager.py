@@ -0,0 +1,97 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+
+import mock
+
+from rasa_nlu.classifiers.keyword_intent_classifier import \
+    KeywordIntentClassifier
+from rasa_nlu.model import Interpreter, Metadata
+from rasa_nlu.model_manager import ModelManager, estimate_interpreter_size
+from rasa_nlu.project import Project
+
+MODEL_NAME = "model_20180101-000000"
+
+
+def mocked_interpreter_for_model(self, model_name):
+    model_dir = os.path.join(self._path, model_name)
+    return Interpreter([KeywordIntentClassifier()], {},
+                       Metadata({}, model_dir))
+
+
+def create_model_dir(project_dir, project, model_name, size):
+    model_dir = os.path.join(project_dir, project, model_name)
+    os.makedirs(model_dir)
+    with io.open(os.path.join(model_dir, "weights.bin"), "wb") as f:
+        f.write(b"0" * size)
+
+
+def test_estimate_interpreter_size(tmpdir):
+    create_model_dir(tmpdir.strpath, "default", MODEL_NAME, 100)
+    model_dir = os.path.join(tmpdir.strpath, "default", MODEL_NAME)
+    interpreter = Interpreter([], {}, Metadata({}, model_dir))
+
+    assert estimate_interpreter_size(interpreter) == 100
+    assert estimate_interpreter_size(Interpreter([], {})) == 0
+
+
+def test_least_recently_used_models_are_evicted(tmpdir):
+    manager = ModelManager(max_models=2)
+    for project in ["a", "b", "c"]:
+        create_model_dir(tmpdir.strpath, project, MODEL_NAME, 10)
+    projects = {name: Project(project=name, project_dir=tmpdir.strpath,
+                              model_manager=manager)
+                for name in ["a", "b", "c"]}
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           mocked_interpreter_for_model):
+        projects["a"].parse("hello")
+        projects["b"].parse("hello")
+        projects["a"].parse("hello")
+        projects["c"].parse("hello")
+
+        assert projects["b"].as_dict()["loaded_models"] == []
+        assert manager.evictions == 1
+        status = manager.as_dict()
+        assert status["loaded_models"] == 2
+        assert [r["project"] for r in status["residents"]] == ["c", "a"]
+
+        # evicted models are loaded again on demand
+        assert projects["b"].parse("hello")["model"] == MODEL_NAME
+        assert projects["b"].as_dict()["loaded_models"] == [MODEL_NAME]
+        assert manager.evictions == 2
+
+
+def test_models_are_evicted_when_over_memory_budget(tmpdir):
+    manager = ModelManager(max_bytes=150)
+    create_model_dir(tmpdir.strpath, "default", MODEL_NAME, 100)
+    create_model_dir(tmpdir.strpath, "default", "model_20180102-000000", 100)
+    project = Project(project="default", project_dir=tmpdir.strpath,
+                      model_manager=manager)
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           mocked_interpreter_for_model):
+        project.parse("hello", None, MODEL_NAME)
+        project.parse("hello", None, "model_20180102-000000")
+
+    assert project.as_dict()["loaded_models"] == ["model_20180102-000000"]
+    assert manager.as_dict()["used_bytes"] == 100
+
+
+def test_unloaded_models_are_forgotten(tmpdir):
+    manager = ModelManager(max_models=10)
+    create_model_dir(tmpdir.strpath, "default", MODEL_NAME, 10)
+    project = Project(project="default", project_dir=tmpdir.strpath,
+                      model_manager=manager)
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           mocked_interpreter_for_model):
+        project.parse("hello")
+    project.unload(MODEL_NAME)
+
+    assert manager.as_dict()["loaded_models"] == 0
+    assert manager.evictions == 0
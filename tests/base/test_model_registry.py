@@ -0,0 +1,36 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from rasa_nlu.model_registry import ModelRegistry
+
+
+def test_registry_keeps_latest_model():
+    registry = ModelRegistry(["fallback", "model_20180102-000000",
+                              "model_20180101-000000", "model_invalid"])
+
+    assert registry.latest == "model_20180102-000000"
+    assert [name for _, name in registry.entries] == [
+        "model_20180101-000000", "model_20180102-000000"]
+    assert "model_invalid" in registry
+    assert ModelRegistry(["fallback"]).latest is None
+
+
+def test_adding_models_returns_new_registry():
+    registry = ModelRegistry(["model_20180101-000000"])
+    updated = registry.with_models(["model_20180103-000000"])
+
+    assert registry.latest == "model_20180101-000000"
+    assert updated.latest == "model_20180103-000000"
+    assert len(updated) == 2
+    assert updated.with_models(["model_20180101-000000"]) is updated
+
+
+def test_is_newer():
+    assert ModelRegistry.is_newer("model_20180102-000000",
+                                  "model_20180101-000000")
+    assert not ModelRegistry.is_newer("model_20180101-000000",
+                                      "model_20180102-000000")
+    assert ModelRegistry.is_newer("model_20180101-000000", "fallback")
+    assert not ModelRegistry.is_newer("fallback", "model_20180101-000000")
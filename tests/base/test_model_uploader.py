@@ -0,0 +1,48 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import mock
+
+from rasa_nlu import persistor
+from rasa_nlu.model_uploader import ModelUploader
+
+
+class FlakyPersistor(object):
+    def __init__(self, failures):
+        self.failures = failures
+        self.persisted = []
+
+    def persist(self, model_dir, model_name, project):
+        if self.failures > 0:
+            self.failures -= 1
+            raise IOError("connection reset")
+        self.persisted.append((model_dir, model_name, project))
+
+
+def test_failed_uploads_are_retried():
+    storage = FlakyPersistor(failures=2)
+    uploader = ModelUploader("aws", max_retries=2, retry_delay=0)
+
+    with mock.patch.object(persistor, "get_persistor",
+                           return_value=storage):
+        uploader.submit("project", "model_1", "/models/model_1").result()
+
+    assert storage.persisted == [("/models/model_1", "model_1", "project")]
+    status = uploader.as_dict()
+    assert status["completed"] == 1
+    assert status["uploads"] == []
+
+
+def test_uploads_fail_after_max_retries():
+    uploader = ModelUploader("aws", max_retries=1, retry_delay=0)
+
+    with mock.patch.object(persistor, "get_persistor",
+                           return_value=FlakyPersistor(failures=5)):
+        uploader.submit("project", "model_1", "/models/model_1").result()
+
+    status = uploader.as_dict()
+    assert status["failed"] == 1
+    assert status["uploads"][0]["attempts"] == 2
+    assert status["uploads"][0]["error"] == "connection reset"
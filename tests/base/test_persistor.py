@@ -3,7 +3,12 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import io
+import json
 import os
+import shutil
+import time
+from threading import Thread
 
 import mock
 import pytest
@@ -11,6 +16,8 @@ from moto import mock_s3
 
 from tests import utilities
 from rasa_nlu import persistor, train
+from rasa_nlu.artifact_cache import ArtifactCache
+from rasa_nlu.circuit_breaker import CircuitOpenError
 
 
 class Object(object):
@@ -128,3 +135,350 @@ def test_list_projects_method_raise_exeception_in_AzurePersistor():
         result = persistor.AzurePersistor("").list_projects()
 
     assert result == []
+
+
+def test_get_persistor_reuses_instances():
+    def mocked_init(self, *args, **kwargs):
+        pass
+
+    with mock.patch.object(persistor.AWSPersistor, "__init__", mocked_init):
+        aws = persistor.get_persistor("aws")
+
+        assert persistor.get_persistor("aws") is aws
+        assert persistor.get_persistor(None) is None
+
+
+def test_listings_are_cached():
+    listings = []
+
+    def mocked_init(self, *args, **kwargs):
+        self.bucket = Object()
+
+        def mocked_list_blobs(prefix=None):
+            listings.append(prefix)
+            blob = Object()
+            blob.name = 'project___model_20180101-000000.tar.gz'
+            return blob,
+
+        self.bucket.list_blobs = mocked_list_blobs
+
+    with mock.patch.object(persistor.GCSPersistor, "__init__", mocked_init):
+        gcs = persistor.GCSPersistor("")
+        assert gcs.list_models("project") == ['model_20180101-000000']
+        assert gcs.list_models("project") == ['model_20180101-000000']
+        assert gcs.list_projects() == ['project']
+
+    assert listings == ['project___', None]
+
+
+class InMemoryPersistor(persistor.Persistor):
+    def __init__(self, files, fail_after=None, artifact_cache=None):
+        super(InMemoryPersistor, self).__init__()
+        self.artifact_cache = artifact_cache
+        self.files = files
+        self.fail_after = fail_after
+        self.ranges = []
+
+    def _object_size(self, filename):
+        return len(self.files[filename])
+
+    def _read_range(self, filename, start, end):
+        if self.fail_after is not None and start >= self.fail_after:
+            raise IOError("connection lost")
+        self.ranges.append((start, end))
+        return self.files[filename][start:end + 1]
+
+    def _list_filenames(self):
+        self.scans = getattr(self, "scans", 0) + 1
+        return list(self.files)
+
+    def _persist_tar(self, file_key, tar_path):
+        with io.open(tar_path, "rb") as f:
+            self.files[file_key] = f.read()
+
+    def _read_object(self, filename):
+        return self.files.get(filename)
+
+    def _write_object(self, filename, data):
+        self.files[filename] = data
+
+    def _object_exists(self, filename):
+        return filename in self.files
+
+
+def create_model_archive(tmpdir, model_name, project):
+    model_dir = tmpdir.mkdir("model")
+    model_dir.join("metadata.json").write("{}")
+    model_dir.join("weights.bin").write_binary(os.urandom(5000))
+    storage = InMemoryPersistor({})
+    _, tar_path = storage._compress(model_dir.strpath, model_name, project)
+    with io.open(tar_path, "rb") as f:
+        data = f.read()
+    shutil.rmtree(os.path.dirname(tar_path))
+    return {storage._tar_name(model_name, project): data}, model_dir
+
+
+def test_retrieve_streams_model_in_chunks(tmpdir):
+    files, model_dir = create_model_archive(tmpdir, "model_1", "project")
+    storage = InMemoryPersistor(files)
+    storage.download_chunk_size = 100
+    target = os.path.join(tmpdir.strpath, "models", "project", "model_1")
+
+    storage.retrieve("model_1", "project", target)
+
+    assert (io.open(os.path.join(target, "weights.bin"), "rb").read() ==
+            model_dir.join("weights.bin").read_binary())
+    assert sorted(storage.ranges)[0] == (0, 99)
+    assert len(storage.ranges) > 1
+    assert os.listdir(os.path.dirname(target)) == ["model_1"]
+
+
+def test_failed_retrieve_leaves_no_partial_model(tmpdir):
+    files, _ = create_model_archive(tmpdir, "model_1", "project")
+    storage = InMemoryPersistor(files, fail_after=200)
+    storage.download_chunk_size = 100
+    target_dir = os.path.join(tmpdir.strpath, "models")
+
+    with pytest.raises(IOError):
+        storage.retrieve("model_1", "project",
+                         os.path.join(target_dir, "model_1"))
+
+    assert os.listdir(target_dir) == []
+
+
+def test_range_reader_returns_chunks_in_order():
+    data = os.urandom(1000)
+    reader = persistor.RangeReader(lambda s, e: data[s:e + 1], len(data),
+                                   chunk_size=64, workers=4)
+
+    assert reader.read(10) == data[:10]
+    assert reader.read(100) == data[10:110]
+    assert reader.read() == data[110:]
+    assert reader.read() == b""
+
+
+def test_persist_adds_model_to_manifest(tmpdir):
+    files, model_dir = create_model_archive(tmpdir, "model_1", "project")
+    storage = InMemoryPersistor(files)
+
+    storage.persist(model_dir.strpath, "model_20180101-000000", "project")
+
+    manifest = json.loads(files[persistor.MANIFEST_NAME].decode("utf-8"))
+    models = manifest["projects"]["project"]
+    # the model stored before there was a manifest is found by the scan
+    assert sorted(models) == ["model_1", "model_20180101-000000"]
+    entry = models["model_20180101-000000"]
+    assert entry["trained_at"] == "2018-01-01T00:00:00"
+    assert entry["size"] == len(
+            files["project___model_20180101-000000.tar.gz"])
+    assert entry["checksum"] is not None
+
+
+def test_listings_use_manifest(tmpdir):
+    files, model_dir = create_model_archive(tmpdir, "model_1", "project")
+    storage = InMemoryPersistor(files)
+    storage.persist(model_dir.strpath, "model_2", "other")
+    storage.scans = 0
+
+    assert storage.list_projects() == ["other", "project"]
+    assert storage.list_models("project") == ["model_1"]
+    assert storage.list_models_by_project() == {"other": ["model_2"],
+                                                "project": ["model_1"]}
+    assert storage.scans == 0
+
+
+def test_broken_manifest_is_rebuilt(tmpdir):
+    files, _ = create_model_archive(tmpdir, "model_1", "project")
+    files[persistor.MANIFEST_NAME] = b"not json"
+    storage = InMemoryPersistor(files)
+
+    storage.rebuild_manifest()
+
+    manifest = json.loads(files[persistor.MANIFEST_NAME].decode("utf-8"))
+    assert list(manifest["projects"]) == ["project"]
+
+
+def test_listings_without_manifest_do_not_write(tmpdir):
+    files, _ = create_model_archive(tmpdir, "model_1", "project")
+
+    class ReadOnlyPersistor(InMemoryPersistor):
+        def _write_object(self, filename, data):
+            raise IOError("403 access denied")
+
+    storage = ReadOnlyPersistor(files)
+
+    assert storage.list_projects() == ["project"]
+    assert storage.list_models("project") == ["model_1"]
+    # the scan is cached like a manifest
+    assert storage.scans == 1
+    assert persistor.MANIFEST_NAME not in files
+
+
+def test_concurrent_persists_keep_all_models_in_manifest(tmpdir):
+    model_dir = tmpdir.mkdir("model")
+    model_dir.join("metadata.json").write("{}")
+
+    class SlowPersistor(InMemoryPersistor):
+        def _read_object(self, filename):
+            time.sleep(0.01)
+            return super(SlowPersistor, self)._read_object(filename)
+
+    storage = SlowPersistor({})
+    storage._write_manifest({})
+    threads = [Thread(target=storage.persist,
+                      args=(model_dir.strpath, "model_{}".format(i),
+                            "project"))
+               for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    manifest = json.loads(
+            storage.files[persistor.MANIFEST_NAME].decode("utf-8"))
+    assert sorted(manifest["projects"]["project"]) == [
+        "model_{}".format(i) for i in range(8)]
+
+
+def test_model_missing_from_manifest_is_found(tmpdir):
+    files, model_dir = create_model_archive(tmpdir, "model_1", "project")
+    storage = InMemoryPersistor(files)
+    storage.persist(model_dir.strpath, "model_2", "project")
+    # another host overwrote the manifest without model_2
+    other_host = InMemoryPersistor(dict(files))
+    other_host._write_manifest({"project": {"model_1": {}}})
+    files[persistor.MANIFEST_NAME] = other_host.files[persistor.MANIFEST_NAME]
+    storage._invalidate_listings()
+
+    assert storage.list_models("project") == ["model_1"]
+    assert storage.has_model("model_2", "project")
+    assert not storage.has_model("model_3", "project")
+    assert storage.list_models("project") == ["model_1", "model_2"]
+
+
+def test_retrieve_uses_local_cache(tmpdir):
+    files, model_dir = create_model_archive(tmpdir, "model_1", "project")
+    cache = ArtifactCache(tmpdir.join("cache").strpath)
+    storage = InMemoryPersistor(files, artifact_cache=cache)
+    storage.persist(model_dir.strpath, "model_2", "project")
+    models_dir = tmpdir.join("models")
+
+    storage.retrieve("model_2", "project", models_dir.join("a").strpath)
+    downloaded = len(storage.ranges)
+    storage.retrieve("model_2", "project", models_dir.join("b").strpath)
+
+    assert downloaded > 0
+    assert len(storage.ranges) == downloaded
+    assert (models_dir.join("b", "weights.bin").read_binary() ==
+            model_dir.join("weights.bin").read_binary())
+
+
+def test_deduplicated_models_only_store_changed_files(tmpdir):
+    model_dir = tmpdir.mkdir("model")
+    model_dir.join("training_data.json").write("{}")
+    model_dir.mkdir("sub").join("weights.bin").write_binary(b"1" * 1000)
+    storage = InMemoryPersistor({})
+    storage.deduplicate = True
+
+    storage.persist(model_dir.strpath, "model_20180101-000000", "project")
+    model_dir.join("sub", "weights.bin").write_binary(b"2" * 1000)
+    storage.persist(model_dir.strpath, "model_20180102-000000", "project")
+
+    blobs = [f for f in storage.files if f.startswith(persistor.BLOB_PREFIX)]
+    assert len(blobs) == 3
+    assert storage.list_models("project") == ["model_20180101-000000",
+                                              "model_20180102-000000"]
+
+    cache = ArtifactCache(tmpdir.join("cache").strpath)
+    storage.artifact_cache = cache
+    target = tmpdir.join("models", "first")
+    storage.retrieve("model_20180101-000000", "project", target.strpath)
+    downloaded = len(storage.ranges)
+    storage.retrieve("model_20180102-000000", "project",
+                     tmpdir.join("models", "second").strpath)
+
+    assert target.join("sub", "weights.bin").read_binary() == b"1" * 1000
+    assert target.join("training_data.json").read() == "{}"
+    # only the changed file is downloaded for the second model
+    assert len(storage.ranges) == downloaded + 1
+
+
+def test_retrieve_only_reads_model_manifest_if_deduplicating(tmpdir):
+    files, model_dir = create_model_archive(tmpdir, "model_1", "project")
+    reads = []
+
+    class AccessDeniedPersistor(InMemoryPersistor):
+        def _read_object(self, filename):
+            reads.append(filename)
+            if filename.endswith(persistor.MODEL_MANIFEST_EXTENSION):
+                raise IOError("403 access denied")
+            return super(AccessDeniedPersistor, self)._read_object(filename)
+
+    storage = AccessDeniedPersistor(files)
+    storage.retrieve("model_1", "project", tmpdir.join("a").strpath)
+
+    assert not [r for r in reads
+                if r.endswith(persistor.MODEL_MANIFEST_EXTENSION)]
+
+    storage.deduplicate = True
+    storage.retrieve("model_1", "project", tmpdir.join("b").strpath)
+
+    # denied access is treated like a missing manifest
+    assert (tmpdir.join("b", "weights.bin").read_binary() ==
+            model_dir.join("weights.bin").read_binary())
+
+
+class UnreachablePersistor(InMemoryPersistor):
+    def _read_object(self, filename):
+        raise IOError("connection refused")
+
+    def _list_filenames(self):
+        raise IOError("connection refused")
+
+
+def test_listing_errors_open_the_circuit_breaker():
+    guarded = persistor.GuardedPersistor("aws", failure_threshold=2,
+                                         reset_timeout=60)
+
+    with mock.patch.object(persistor, "get_persistor",
+                           return_value=UnreachablePersistor({})):
+        for _ in range(2):
+            with pytest.raises(IOError):
+                guarded.list_projects()
+        with pytest.raises(CircuitOpenError):
+            guarded.list_projects()
+
+    assert guarded.as_dict()["state"] == "open"
+    # unguarded listings still treat the storage as empty
+    assert UnreachablePersistor({}).list_projects() == []
+
+
+def test_artifact_cache_is_opt_in(tmpdir):
+    with mock.patch.dict(os.environ, {}, clear=True):
+        assert InMemoryPersistor({})._create_artifact_cache() is None
+
+    cache_dir = tmpdir.join("cache").strpath
+    with mock.patch.dict(os.environ, {"PERSISTOR_CACHE_DIR": cache_dir}):
+        cache = InMemoryPersistor({})._create_artifact_cache()
+
+    assert cache.cache_dir == cache_dir
+
+
+def test_persist_removes_the_temporary_archive(tmpdir):
+    _, model_dir = create_model_archive(tmpdir, "model_1", "project")
+    archives = []
+
+    class FailingPersistor(InMemoryPersistor):
+        def _persist_tar(self, file_key, tar_path):
+            archives.append(tar_path)
+            if len(archives) == 1:
+                raise IOError("connection reset")
+            super(FailingPersistor, self)._persist_tar(file_key, tar_path)
+
+    storage = FailingPersistor({})
+    with pytest.raises(IOError):
+        storage.persist(model_dir.strpath, "model_1", "project")
+    storage.persist(model_dir.strpath, "model_1", "project")
+
+    assert len(archives) == 2
+    assert not [a for a in archives if os.path.exists(os.path.dirname(a))]
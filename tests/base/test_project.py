@@ -3,8 +3,19 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import mock
+import os
+import time
+from threading import Event, Thread
 
+import mock
+import pytest
+
+from rasa_nlu.classifiers.keyword_intent_classifier import \
+    KeywordIntentClassifier
+from rasa_nlu import metrics
+from rasa_nlu.cache import NegativeCache
+from rasa_nlu.circuit_breaker import CircuitOpenError
+from rasa_nlu.model import Interpreter
 from rasa_nlu.project import Project
 
 
@@ -90,3 +101,244 @@ def test_dynamic_load_model_with_model_is_none():
                 result = project._dynamic_load_model(None)
 
                 assert result == LATEST_MODEL_NAME
+
+
+def test_update_switches_to_new_model_once_it_is_loaded(tmpdir):
+    new_model = "model_20180101-000000"
+    loading = Event()
+
+    def mocked_interpreter_for_model(self, model_name):
+        loading.wait()
+        return Interpreter([KeywordIntentClassifier()], {})
+
+    project = Project(project="default", project_dir=tmpdir.strpath)
+    assert project.parse("hello")["model"] == "fallback"
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           mocked_interpreter_for_model):
+        project.update(new_model)
+
+        # the previous model is used until the new one is loaded
+        assert project.parse("hello")["model"] == "fallback"
+        assert project.as_dict()["loading_models"] == [new_model]
+
+        loading.set()
+        for _ in range(100):
+            if not project.as_dict()["loading_models"]:
+                break
+            time.sleep(0.01)
+
+    assert project.parse("hello")["model"] == new_model
+
+
+def test_concurrent_requests_load_a_model_once(tmpdir):
+    model_name = "model_20180101-000000"
+    loads = []
+
+    def mocked_interpreter_for_model(self, model_name):
+        loads.append(model_name)
+        time.sleep(0.1)
+        return Interpreter([KeywordIntentClassifier()], {})
+
+    project = Project(project="default", project_dir=tmpdir.strpath)
+    project._set_models({model_name: None})
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           mocked_interpreter_for_model):
+        threads = [Thread(target=project.parse, args=("hello", None,
+                                                      model_name))
+                   for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert loads == [model_name]
+
+
+def test_loading_a_model_does_not_block_loaded_models(tmpdir):
+    model_name = "model_20180101-000000"
+    loading = Event()
+
+    def mocked_interpreter_for_model(self, model_name):
+        loading.wait()
+        return Interpreter([KeywordIntentClassifier()], {})
+
+    project = Project(project="default", project_dir=tmpdir.strpath)
+    project._set_models({model_name: None})
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           mocked_interpreter_for_model):
+        slow = Thread(target=project.parse, args=("hello", None, model_name))
+        slow.start()
+
+        response = project.parse("hello", None, "fallback")
+        assert response["model"] == "fallback"
+
+        loading.set()
+        slow.join()
+
+
+def test_unloading_a_model_replaces_the_model_map(tmpdir):
+    project = Project(project="default", project_dir=tmpdir.strpath)
+    project.parse("hello")
+    models = project._models
+
+    project.unload("fallback")
+
+    # requests that already read the old map keep using it unchanged
+    assert models["fallback"] is not None
+    assert project._models["fallback"] is None
+
+
+def test_unloading_an_unknown_model_raises(tmpdir):
+    project = Project(project="default", project_dir=tmpdir.strpath)
+
+    with pytest.raises(KeyError):
+        project.unload("model_20180101-000000")
+
+
+def test_unknown_models_are_only_searched_once(tmpdir):
+    unknown_models = NegativeCache(ttl=60)
+    project = Project(project="default", project_dir=tmpdir.strpath,
+                      unknown_models=unknown_models)
+
+    with mock.patch.object(Project, "_search_for_models") as search:
+        for _ in range(3):
+            response = project.parse("hello", None, "model_unknown")
+            assert response["model"] == "fallback"
+
+    assert search.call_count == 1
+
+
+def test_local_model_is_used_if_storage_is_unavailable(tmpdir):
+    class UnavailableStorage(object):
+        def list_models(self, project):
+            return ["model_20180102-000000"]
+
+        def retrieve(self, model_name, project, target_path):
+            raise CircuitOpenError("storage is unavailable")
+
+    def mocked_interpreter_for_model(self, model_name):
+        path = os.path.join(self._path, model_name)
+        if not os.path.isdir(path):
+            self._load_model_from_cloud(model_name, path)
+        return Interpreter([KeywordIntentClassifier()], {})
+
+    tmpdir.mkdir("default").mkdir("model_20180101-000000")
+    project = Project(project="default", project_dir=tmpdir.strpath,
+                      remote_storage="aws",
+                      guarded_persistor=UnavailableStorage())
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           mocked_interpreter_for_model):
+        response = project.parse("hello")
+
+    assert response["model"] == "model_20180101-000000"
+
+
+def test_model_not_listed_by_storage_is_looked_up(tmpdir):
+    class Storage(object):
+        def list_models(self, project):
+            return []
+
+        def has_model(self, model_name, project):
+            return model_name == "model_20180101-000000"
+
+    project = Project(project="default", project_dir=tmpdir.strpath,
+                      remote_storage="aws", guarded_persistor=Storage())
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           return_value=Interpreter(
+                                   [KeywordIntentClassifier()], {})):
+        response = project.parse("hello", None, "model_20180101-000000")
+
+    assert response["model"] == "model_20180101-000000"
+
+
+def test_failed_prefetches_are_counted_and_retried(tmpdir):
+    class FlakyStorage(object):
+        retrieved = []
+
+        def list_models(self, project):
+            return ["model_20180101-000000"]
+
+        def retrieve(self, model_name, project, target_path):
+            FlakyStorage.retrieved.append(model_name)
+            if len(FlakyStorage.retrieved) == 1:
+                raise IOError("connection reset")
+            os.makedirs(target_path)
+
+    labels = {"status": "failed"}
+    failed = metrics.registry.get(metrics.MODEL_PREFETCHES, labels) or 0
+    project = Project(project="default", project_dir=tmpdir.strpath,
+                      remote_storage="aws",
+                      guarded_persistor=FlakyStorage())
+
+    assert project.sync_models() == []
+    assert (metrics.registry.get(metrics.MODEL_PREFETCHES, labels) ==
+            failed + 1)
+    assert project.sync_models() == ["model_20180101-000000"]
+    assert FlakyStorage.retrieved == ["model_20180101-000000"] * 2
+
+
+def test_request_during_warm_up_waits_for_it(tmpdir):
+    model_name = "model_20180101-000000"
+    loading = Event()
+    loads = []
+
+    def mocked_interpreter_for_model(self, model_name):
+        loads.append(model_name)
+        loading.wait()
+        return Interpreter([KeywordIntentClassifier()], {})
+
+    project = Project(project="default", project_dir=tmpdir.strpath)
+    project._set_models({model_name: None})
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           mocked_interpreter_for_model):
+        project._warm_up_in_background(model_name)
+        for _ in range(100):
+            if loads:
+                break
+            time.sleep(0.01)
+
+        request = Thread(target=project.parse,
+                         args=("hello", None, model_name))
+        request.start()
+        time.sleep(0.05)
+        loading.set()
+        request.join()
+
+    assert loads == [model_name]
+    assert project.parse("hello", None, model_name)["model"] == model_name
+
+
+def test_new_model_can_be_requested_while_it_warms_up(tmpdir):
+    new_model = "model_20180101-000000"
+    loading = Event()
+    loads = []
+
+    def mocked_interpreter_for_model(self, model_name):
+        loads.append(model_name)
+        loading.wait()
+        return Interpreter([KeywordIntentClassifier()], {})
+
+    unknown_models = NegativeCache(ttl=60)
+    project = Project(project="default", project_dir=tmpdir.strpath,
+                      unknown_models=unknown_models)
+    responses = []
+
+    with mock.patch.object(Project, "_interpreter_for_model",
+                           mocked_interpreter_for_model):
+        project.update(new_model)
+        request = Thread(target=lambda: responses.append(
+                project.parse("hello", None, new_model)))
+        request.start()
+        time.sleep(0.05)
+        loading.set()
+        request.join()
+
+    assert responses[0]["model"] == new_model
+    assert loads == [new_model]
+    assert ("default", new_model) not in unknown_models
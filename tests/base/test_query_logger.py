@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import glob
+import gzip
+import io
+import json
+import os
+
+from rasa_nlu.data_router import DataRouter
+from rasa_nlu.query_logger import QueryLogger
+
+
+def _read_records(path):
+    with io.open(path, encoding="utf8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_on_flush(tmpdir):
+    log_file = os.path.join(tmpdir.strpath, "queries.log")
+    query_logger = QueryLogger(log_file, flush_interval=60)
+
+    query_logger.log({"text": "hello"}, "default", "model_1")
+    query_logger.flush()
+
+    records = _read_records(log_file)
+    assert len(records) == 1
+    assert records[0]["user_input"] == {"text": "hello"}
+    assert records[0]["project"] == "default"
+    assert records[0]["model"] == "model_1"
+    query_logger.close()
+
+
+def test_records_are_dropped_if_buffer_is_full(tmpdir):
+    log_file = os.path.join(tmpdir.strpath, "queries.log")
+    query_logger = QueryLogger(log_file, buffer_size=2, flush_interval=60)
+
+    results = [query_logger.log({"text": "hello"}, "default", None)
+               for _ in range(3)]
+    query_logger.close()
+
+    assert results == [True, True, False]
+    assert query_logger.dropped == 1
+    assert len(_read_records(log_file)) == 2
+
+
+def test_log_is_rotated_and_compressed(tmpdir):
+    log_file = os.path.join(tmpdir.strpath, "queries.log")
+    query_logger = QueryLogger(log_file, flush_interval=60, max_bytes=1,
+                               compress=True)
+
+    query_logger.log({"text": "first"}, "default", None)
+    query_logger.flush()
+    query_logger.log({"text": "second"}, "default", None)
+    query_logger.close()
+
+    rotated = sorted(glob.glob(log_file + ".*.gz"))
+    assert len(rotated) == 2
+    assert query_logger.rotations == 2
+    with gzip.open(rotated[0], 'rb') as f:
+        assert json.loads(f.read().decode("utf8"))["user_input"] == {
+            "text": "first"}
+
+
+def test_data_router_logs_responses(tmpdir):
+    router = DataRouter(tmpdir.join("projects").strpath,
+                        response_log=tmpdir.join("logs").strpath)
+
+    router.parse({"text": "hello", "project": "default"})
+    router.responses.flush()
+
+    records = _read_records(router.responses.log_file)
+    assert records[0]["user_input"]["intent"]["name"] == "greet"
+    assert records[0]["model"] == "fallback"
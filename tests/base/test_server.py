@@ -6,17 +6,24 @@ from __future__ import unicode_literals
 
 import io
 import json
+import os
+import select
+import signal
+import socket
 import tempfile
 import time
 
+import mock
 import pytest
+import requests
 import yaml
 from treq.testing import StubTreq
+from twisted.internet.defer import Deferred
 
-from rasa_nlu import utils
+from rasa_nlu import data_router, persistor, server, utils
 from rasa_nlu.config import RasaNLUModelConfig
 from rasa_nlu.data_router import DataRouter
-from rasa_nlu.server import RasaNLU
+from rasa_nlu.server import ParseQueue, RasaNLU, ServerOverloadedError
 from tests import utilities
 from tests.utilities import ResponseTest
 
@@ -142,6 +149,81 @@ def test_post_parse(app, response_test):
                 'text', 'model'])
 
 
+@pytest.inlineCallbacks
+def test_post_parse_batch(app):
+    payload = [{"q": "hello"},
+               {"query": "bye", "project": "default"},
+               {"text": "missing query parameter"},
+               {"q": "hello", "project": "unknown_project"}]
+    response = yield app.post("http://dummy-uri/parse/batch", json=payload)
+    rjs = yield response.json()
+    assert response.code == 200
+    assert len(rjs) == len(payload)
+    assert rjs[0] == {'project': 'default', 'entities': [],
+                      'model': 'fallback', 'text': 'hello',
+                      'intent': {'confidence': 1.0, 'name': 'greet'}}
+    assert rjs[1]['text'] == 'bye'
+    assert rjs[1]['intent']['name'] == 'goodbye'
+    assert rjs[2] == {"error": "Invalid parse parameter specified"}
+    assert rjs[3] == {"error": "No project found with name "
+                               "'unknown_project'."}
+
+
+@pytest.inlineCallbacks
+def test_post_parse_batch_requires_list(app):
+    response = yield app.post("http://dummy-uri/parse/batch",
+                              json={"q": "hello"})
+    rjs = yield response.json()
+    assert response.code == 400
+    assert "error" in rjs
+
+
+def test_parse_queue_rejects_if_full():
+    queue = ParseQueue(max_in_flight=1, max_queued=1, run_in_thread=False)
+    blocker = Deferred()
+
+    first = queue.run(lambda: blocker)
+    second = queue.run(lambda: "second")
+    assert queue.in_flight == 1
+    assert queue.queued == 1
+
+    with pytest.raises(ServerOverloadedError):
+        queue.run(lambda: "third")
+    assert queue.rejected == 1
+
+    results = []
+    first.addCallback(results.append)
+    second.addCallback(results.append)
+    blocker.callback("first")
+
+    assert sorted(results) == ["first", "second"]
+    assert queue.in_flight == 0
+    assert queue.queued == 0
+
+
+@pytest.inlineCallbacks
+def test_status_contains_parse_queue(app):
+    response = yield app.get("http://dummy-uri/status")
+    rjs = yield response.json()
+    assert response.code == 200
+    assert rjs["parse_queue"]["in_flight"] == 0
+    assert rjs["parse_queue"]["queued"] == 0
+    assert rjs["parse_queue"]["rejected"] == 0
+
+
+@pytest.inlineCallbacks
+def test_metrics(app):
+    response = yield app.get("http://dummy-uri/parse?q=hello")
+    assert response.code == 200
+
+    response = yield app.get("http://dummy-uri/metrics")
+    content = yield response.text()
+    assert response.code == 200
+    assert "# TYPE rasa_nlu_component_duration_seconds histogram" in content
+    assert 'component="intent_classifier_keyword"' in content
+    assert "rasa_nlu_parse_queue_in_flight" in content
+
+
 @utilities.slowtest
 @pytest.inlineCallbacks
 def test_post_train(app, rasa_default_train_data):
@@ -187,6 +269,19 @@ def test_model_hot_reloading(app, rasa_default_train_data):
     assert response.code == 200, "Project should now exist after it got trained"
 
 
+@pytest.inlineCallbacks
+def test_post_train_async(app, rasa_default_train_data):
+    response = yield app.post("http://dummy-uri/train?project=test_async&"
+                              "async=true", json=rasa_default_train_data)
+    rjs = yield response.json()
+    assert response.code == 202
+    assert rjs["type"] == "training"
+    assert rjs["project"] == "test_async"
+
+    response = yield app.get("http://dummy-uri/jobs/{}".format(rjs["id"]))
+    assert response.code == 200
+
+
 @pytest.inlineCallbacks
 def test_evaluate_invalid_project_error(app, rasa_default_train_data):
     response = app.post("http://dummy-uri/evaluate",
@@ -231,6 +326,29 @@ def test_evaluate(app, rasa_default_train_data):
                                                              "accuracy"])
 
 
+@pytest.inlineCallbacks
+def test_evaluate_async(app, rasa_default_train_data):
+    response = yield app.post("http://dummy-uri/evaluate?async=true",
+                              json=rasa_default_train_data)
+    rjs = yield response.json()
+    assert response.code == 202
+    assert rjs["type"] == "evaluation"
+
+    response = yield app.get("http://dummy-uri/jobs/{}".format(rjs["id"]))
+    rjs = yield response.json()
+    assert response.code == 200
+    assert rjs["status"] == "completed"
+    assert "intent_evaluation" in rjs["result"]
+
+
+@pytest.inlineCallbacks
+def test_get_unknown_job(app):
+    response = yield app.get("http://dummy-uri/jobs/unknown")
+    rjs = yield response.json()
+    assert response.code == 404
+    assert "error" in rjs
+
+
 @pytest.inlineCallbacks
 def test_unload_model_error(app):
     project_err = "http://dummy-uri/models?project=my_project&model=my_model"
@@ -253,3 +371,111 @@ def test_unload_fallback(app):
     rjs = yield response.json()
     assert response.code == 200, "Fallback model unloaded"
     assert rjs == "fallback"
+
+
+def test_worker_restarts_background_tasks(tmpdir):
+    class EmptyStorage(object):
+        def list_models_by_project(self):
+            return {}
+
+    args = server.create_argument_parser().parse_args(
+            ["--path", tmpdir.strpath, "--workers", "2", "--storage", "aws",
+             "--model_refresh_interval", "60"])
+    reactor = mock.Mock()
+
+    with mock.patch.object(persistor, "get_persistor",
+                           return_value=EmptyStorage()):
+        router = server.create_data_router(args, response_log=None)
+    router.stop_model_refresh()
+
+    with mock.patch.object(server, "_install_worker_reactor",
+                           return_value=reactor), \
+            mock.patch.object(server, "reactor", reactor), \
+            mock.patch.object(data_router, "reactor", reactor), \
+            mock.patch.object(server.signal, "signal"):
+        server._run_worker(router, args, mock.Mock())
+
+    try:
+        assert not router._refresh_stopped.is_set()
+        reactor.addSystemEventTrigger.assert_any_call(
+                'before', 'shutdown', router.stop_model_refresh)
+        reactor.addSystemEventTrigger.assert_any_call(
+                'before', 'shutdown', router.uploader.shutdown)
+        assert reactor.run.called
+    finally:
+        router.stop_model_refresh()
+
+
+def test_forked_worker_looks_for_new_models(tmpdir):
+    router = DataRouter(tmpdir.strpath, model_refresh_interval=0.01)
+    # like the master, which only forks the workers
+    router.stop_model_refresh()
+    read_end, write_end = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            project = router.project_store["default"]
+            project.refresh_models = lambda: os.write(write_end, b"x")
+            router.restart_after_fork()
+            time.sleep(1)
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    readable, _, _ = select.select([read_end], [], [], 5)
+    refreshed = os.read(read_end, 1) if readable else b""
+    os.close(read_end)
+    os.waitpid(pid, 0)
+
+    assert refreshed == b"x"
+
+
+def _free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _worker_log_file(url):
+    # every worker logs the responses into a file named after its pid
+    for _ in range(100):
+        try:
+            status = requests.get(url, timeout=1).json()
+            return status["response_log"]["file"]
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise AssertionError("No worker answered the request.")
+
+
+def test_workers_serve_requests_with_their_own_reactor(tmpdir):
+    port = _free_port()
+    args = server.create_argument_parser().parse_args(
+            ["--path", tmpdir.mkdir("projects").strpath,
+             "--workers", "2", "--port", str(port),
+             "--response_log", tmpdir.mkdir("logs").strpath])
+
+    master = os.fork()
+    if master == 0:
+        try:
+            server.run_workers(args)
+        finally:
+            os._exit(0)
+
+    url = "http://127.0.0.1:{}/status".format(port)
+    try:
+        first = _worker_log_file(url)
+        first_worker = int(first.rsplit("-", 1)[1].split(".")[0])
+        # only the other worker can accept the next connection
+        os.kill(first_worker, signal.SIGSTOP)
+        try:
+            second = _worker_log_file(url)
+        finally:
+            os.kill(first_worker, signal.SIGCONT)
+    finally:
+        os.kill(master, signal.SIGTERM)
+        os.waitpid(master, 0)
+
+    assert first != second